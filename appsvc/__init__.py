@@ -7,6 +7,12 @@ from appsvc.biz import (
     errors,
     log,
 )
+from appsvc.biz.app import (
+    DC_RANKING_WARMUP_SIZE,
+    STANDBY_POOL_ENABLED,
+    start_standby_pool,
+    warmup_dc_rankings_async,
+)
 from appsvc.biz.sqldb import sqldb
 
 
@@ -24,6 +30,11 @@ def create_app() -> Flask:
     log.init_app(app)
     errors.init_app(app)
 
+    if DC_RANKING_WARMUP_SIZE:
+        warmup_dc_rankings_async(app)
+    if STANDBY_POOL_ENABLED:
+        start_standby_pool(app)
+
     app.logger.info("app init completed")
 
     return app
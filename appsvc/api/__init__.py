@@ -2,21 +2,35 @@ from flask_restful import Api
 
 from appsvc.api.app import (
     GetAppRelease,
+    GetAppReleases,
     PauseApp,
+    PauseApps,
     ResumeApp,
     RunApp,
+    RunAppLaunch,
+    RunAppLaunchEvents,
     SearchApps,
     SearchAppsAcl,
+    SearchAppsBatch,
+    Stats,
     StopApp,
+    StopApps,
 )
 
 api = Api()
 
 # setup routing
 api.add_resource(GetAppRelease, "/apps/<app_release_uuid>")  # GET
+api.add_resource(GetAppReleases, "/apps/batch")  # POST
 api.add_resource(SearchApps, "/apps/search")  # POST
 api.add_resource(SearchAppsAcl, "/apps/search/acl")  # POST
+api.add_resource(SearchAppsBatch, "/apps/search/batch")  # POST
 api.add_resource(PauseApp, "/apps/pause")  # POST
+api.add_resource(PauseApps, "/apps/pause/batch")  # POST
 api.add_resource(ResumeApp, "/apps/resume")  # POST
 api.add_resource(RunApp, "/apps/run")  # POST
+api.add_resource(RunAppLaunch, "/apps/run/<launch_id>")  # GET
+api.add_resource(RunAppLaunchEvents, "/apps/run/<launch_id>/events")  # GET
 api.add_resource(StopApp, "/apps/stop")  # POST
+api.add_resource(StopApps, "/apps/stop/batch")  # POST
+api.add_resource(Stats, "/apps/stats")  # GET; static route takes precedence over /apps/<app_release_uuid>
@@ -1,62 +1,174 @@
+import hashlib
+import itertools
+import json
+import os
+import typing as t
+
 from flask import (
     Response,
     request,
 )
 from flask_restful import Resource
 
+from appsvc.biz import stats
 from appsvc.biz.app import (
+    APP_RELEASE_CACHE_SIZE,
+    APP_RELEASE_CACHE_TTL,
     get_app_release,
+    get_app_releases,
+    get_launch,
     pause_app,
+    pause_apps,
     resume_app,
     run_app,
+    run_app_async,
     search_apps,
     search_apps_acl,
+    search_apps_batch,
     stop_app,
+    stop_apps,
+    watch_launch,
 )
+from appsvc.biz.cache import TTLCache
+from appsvc.biz.codec import codec_for
 from appsvc.biz.dto import (
+    ContainersOpRequestDTO,
+    ContainersOpResponseDTO,
     GetAppReleaseResponseDTO,
+    GetAppReleasesRequestDTO,
+    GetAppReleasesResponseDTO,
     PauseAppRequestDTO,
     ResumeAppRequestDTO,
+    RunAppLaunchDTO,
     RunAppRequestDTO,
     RunAppResponseDTO,
     SearchAppsAclRequestDTO,
     SearchAppsAclResponseDTO,
+    SearchAppsBatchRequestDTO,
+    SearchAppsBatchResponseDTO,
     SearchAppsRequestDTO,
     SearchAppsResponseDTO,
     StopAppRequestDTO,
 )
+from appsvc.biz.errors import ERROR_APP_RELEASE_NOT_FOUND
+
+# launch event streams hold a worker thread: they end early and EventSource clients reconnect after the retry delay
+RUN_APP_ASYNC_SSE_TIMEOUT = int(os.environ.get("RUN_APP_ASYNC_SSE_TIMEOUT", 5))  # seconds
+RUN_APP_ASYNC_SSE_RETRY = int(os.environ.get("RUN_APP_ASYNC_SSE_RETRY", 1000))  # milliseconds
+APP_RELEASE_CACHE_CONTROL = os.environ.get("APP_RELEASE_CACHE_CONTROL", f"public, max-age={APP_RELEASE_CACHE_TTL}")
+
+# encoded GET /apps/<app_release_uuid> response bodies and their etags (keyed the same way as app_release_cache)
+app_release_body_cache: TTLCache[str, tuple[bytes, str]] = TTLCache(APP_RELEASE_CACHE_SIZE, APP_RELEASE_CACHE_TTL)
+stats.register("app_release_body_cache", app_release_body_cache.stats)
 
 
 class GetAppRelease(Resource):
     def get(self, app_release_uuid: str) -> Response:
-        """Gets app release details."""
-        res = get_app_release(app_release_uuid)
-        return GetAppReleaseResponseDTO.Schema().dump(res), 200
+        """Gets app release details.
+
+        Responds with 304 when If-None-Match matches the cached body etag (no DB or serializer involved).
+        """
+        cached = app_release_body_cache.get(app_release_uuid)
+        if cached is None:
+            release = get_app_release(app_release_uuid)
+            body = json.dumps(codec_for(GetAppReleaseResponseDTO).dump(release)).encode()
+            cached = (body, hashlib.sha256(body).hexdigest())
+            app_release_body_cache.put(str(release.id), cached, aliases=[release.uuid])
+        body, etag = cached
+        if request.if_none_match.contains_weak(etag):
+            res = Response(status=304)
+        else:
+            res = Response(body, mimetype="application/json", status=200)
+        res.set_etag(etag)
+        res.headers["Cache-Control"] = APP_RELEASE_CACHE_CONTROL
+        return res
+
+
+class GetAppReleases(Resource):
+    def post(self) -> Response:
+        """Gets details of several app releases (by ids or uuids) at once.
+
+        Releases are returned in the order of the requested ids, missing (or invisible) ones are reported per item.
+        """
+        req: GetAppReleasesRequestDTO = codec_for(GetAppReleasesRequestDTO).load(request.get_json())
+        not_found = GetAppReleasesResponseDTO.Error(*ERROR_APP_RELEASE_NOT_FOUND)
+        res = GetAppReleasesResponseDTO(
+            app_releases=[
+                GetAppReleasesResponseDTO.Item(id=release_id, app_release=release, error=None if release else not_found)
+                for release_id, release in zip(req.ids, get_app_releases(req.ids))
+            ]
+        )
+        return codec_for(GetAppReleasesResponseDTO).dump(res), 200
 
 
 class RunApp(Resource):
     def post(self) -> Response:
-        """Runs a new app."""
-        req: RunAppRequestDTO = RunAppRequestDTO.Schema().load(data=request.get_json())
-        res = run_app(req)
-        return RunAppResponseDTO.Schema().dump(res), 200
+        """Runs a new app.
+
+        With `Prefer: respond-async` responds with 202 and the launch right away: the result is to be fetched from
+        /apps/run/<launch_id> (or its /events stream) then.
+
+        Requests with the same `Idempotency-Key` (or, by default, of the same user, release and ws connection) share
+        a single launch while it's in flight and get its result for a short while after.
+        """
+        req: RunAppRequestDTO = codec_for(RunAppRequestDTO).load(request.get_json())
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if "respond-async" in request.headers.get("Prefer", ""):
+            launch = run_app_async(req, idempotency_key)
+            return codec_for(RunAppLaunchDTO).dump(launch), 202, {"Location": f"/apps/run/{launch.id}"}
+        res = run_app(req, idempotency_key)
+        return codec_for(RunAppResponseDTO).dump(res), 200
+
+
+class RunAppLaunch(Resource):
+    def get(self, launch_id: str) -> Response:
+        """Gets an asynchronous app launch."""
+        return codec_for(RunAppLaunchDTO).dump(get_launch(launch_id)), 200
+
+
+class RunAppLaunchEvents(Resource):
+    def get(self, launch_id: str) -> Response:
+        """Streams an asynchronous app launch (server-sent events): an event per status change until it's completed.
+
+        The stream ends after RUN_APP_ASYNC_SSE_TIMEOUT even if the launch is still pending, so it doesn't hold a worker
+        thread for the whole launch: clients are to reconnect (EventSource does it on its own after the announced retry
+        delay) or poll /apps/run/<launch_id>.
+        """
+        launch_events = watch_launch(launch_id, RUN_APP_ASYNC_SSE_TIMEOUT)
+        # unknown launch: regular error response
+        first = next(launch_events)
+
+        def stream() -> t.Iterator[str]:
+            yield f"retry: {RUN_APP_ASYNC_SSE_RETRY}\n\n"
+            for launch in itertools.chain([first], launch_events):
+                yield f"event: {launch.status}\ndata: {json.dumps(codec_for(RunAppLaunchDTO).dump(launch))}\n\n"
+
+        return Response(stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 class PauseApp(Resource):
     def post(self) -> Response:
         """Pauses a running app."""
-        req: PauseAppRequestDTO = PauseAppRequestDTO.Schema().load(data=request.get_json())
+        req: PauseAppRequestDTO = codec_for(PauseAppRequestDTO).load(request.get_json())
         pause_app(req)
         return "", 200
 
 
+class PauseApps(Resource):
+    def post(self) -> Response:
+        """Pauses several running apps at once, results (errors) are reported per container."""
+        req: ContainersOpRequestDTO = codec_for(ContainersOpRequestDTO).load(request.get_json())
+        res = pause_apps(req)
+        return codec_for(ContainersOpResponseDTO).dump(res), 200
+
+
 class ResumeApp(Resource):
     def post(self) -> Response:
         """Resumes a paused app.
 
         May require a context switch (sigsvc server change) so it accepts a new set of ws_conn parameters.
         """
-        req: ResumeAppRequestDTO = ResumeAppRequestDTO.Schema().load(data=request.get_json())
+        req: ResumeAppRequestDTO = codec_for(ResumeAppRequestDTO).load(request.get_json())
         resume_app(req)
         return "", 200
 
@@ -64,22 +176,47 @@ class ResumeApp(Resource):
 class StopApp(Resource):
     def post(self) -> Response:
         """Stops a running app."""
-        req: StopAppRequestDTO = StopAppRequestDTO.Schema().load(data=request.get_json())
+        req: StopAppRequestDTO = codec_for(StopAppRequestDTO).load(request.get_json())
         stop_app(req)
         return "", 200
 
 
+class StopApps(Resource):
+    def post(self) -> Response:
+        """Stops several apps at once (e.g. of a drained node), containers not found are considered stopped.
+
+        Results (errors) are reported per container.
+        """
+        req: ContainersOpRequestDTO = codec_for(ContainersOpRequestDTO).load(request.get_json())
+        res = stop_apps(req)
+        return codec_for(ContainersOpResponseDTO).dump(res), 200
+
+
 class SearchAppsAcl(Resource):
     def post(self) -> Response:
         """Search apps helper: auto-complete lists."""
-        req: SearchAppsAclRequestDTO = SearchAppsAclRequestDTO.Schema().load(data=request.get_json())
+        req: SearchAppsAclRequestDTO = codec_for(SearchAppsAclRequestDTO).load(request.get_json())
         res = search_apps_acl(req)
-        return SearchAppsAclResponseDTO.Schema().dump({"acl": res}), 200
+        return codec_for(SearchAppsAclResponseDTO).dump({"acl": res}), 200
 
 
 class SearchApps(Resource):
     def post(self) -> Response:
         """Search apps."""
-        req: SearchAppsRequestDTO = SearchAppsRequestDTO.Schema().load(data=request.get_json())
+        req: SearchAppsRequestDTO = codec_for(SearchAppsRequestDTO).load(request.get_json())
         res = search_apps(req)
-        return SearchAppsResponseDTO.Schema().dump({"apps": res}), 200
+        return codec_for(SearchAppsResponseDTO).dump(res), 200
+
+
+class SearchAppsBatch(Resource):
+    def post(self) -> Response:
+        """Search apps: several result sections (e.g. of a landing page) at once."""
+        req: SearchAppsBatchRequestDTO = codec_for(SearchAppsBatchRequestDTO).load(request.get_json())
+        res = search_apps_batch(req)
+        return codec_for(SearchAppsBatchResponseDTO).dump({"sections": res}), 200
+
+
+class Stats(Resource):
+    def get(self) -> Response:
+        """Runtime stats (caches etc.) of the worker serving the request."""
+        return {"pid": os.getpid(), **stats.collect()}, 200
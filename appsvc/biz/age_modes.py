@@ -0,0 +1,117 @@
+"""Age mode classification of games.
+
+This is the single definition of the rules: they are SQL expressions over the game columns, used as is by searches
+(AGE_MODES_PRECOMPUTED=false), compiled into the games.age_modes generated column (AGE_MODES_PRECOMPUTED=true) and
+recomputed by the consistency checker (see appsvc.biz.age_modes_tool).
+"""
+
+import typing as t
+
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Row,
+    String,
+    Text,
+    case,
+    cast,
+    false,
+    func,
+    literal,
+    literal_column,
+    null,
+    select,
+    true,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from appsvc.biz.dto import AgeMode
+from appsvc.biz.models import AppDAO
+from appsvc.biz.sqldb import sqldb
+
+ESRB_RATING_T_ID = 10
+ESRB_RATING_M_ID = 11
+
+GENRE_EDUCATIONAL_ID = 1000000  # custom genre for educational games (suitable for kids)
+TAG_KIDS = "kids"
+TAG_ADULTS = "adults"
+TAG_MATURE = "mature"
+
+
+def age_mode_rule_expr(
+    age_mode: AgeMode, esrb_rating: ColumnElement, tags: ColumnElement, genres: ColumnElement
+) -> ColumnElement[bool]:
+    """Whether a game with the given esrb_rating (int), tags (text[]) and genres (int[]) is allowed in age_mode."""
+    if age_mode == AgeMode.KID:
+        return (
+            (esrb_rating < ESRB_RATING_T_ID)
+            | tags.contains(cast([TAG_KIDS], ARRAY(Text())))
+            | (
+                genres.contains([GENRE_EDUCATIONAL_ID])
+                & ~tags.contains(cast([TAG_ADULTS], ARRAY(Text())))
+                & ~tags.contains(cast([TAG_MATURE], ARRAY(Text())))
+            )
+        )
+    elif age_mode == AgeMode.TEEN:
+        return (esrb_rating < ESRB_RATING_M_ID) | (
+            esrb_rating.is_(None)
+            & ~tags.contains(cast([TAG_ADULTS], ARRAY(Text())))
+            & ~tags.contains(cast([TAG_MATURE], ARRAY(Text())))
+        )
+    elif age_mode == AgeMode.ADULT:
+        return true()
+    else:
+        return false()
+
+
+def age_modes_expr(esrb_rating: ColumnElement, tags: ColumnElement, genres: ColumnElement) -> ColumnElement:
+    """Age modes (text[] of AgeMode values) a game is allowed in (null rule results count as not allowed)."""
+    return func.array_remove(
+        postgresql.array(
+            [
+                case((age_mode_rule_expr(age_mode, esrb_rating, tags, genres), literal(age_mode.value)))
+                for age_mode in AgeMode
+            ]
+        ),
+        null(),
+        type_=ARRAY(Text()),
+    )
+
+
+def age_modes_ddl() -> str:
+    """games.age_modes generated column (the rules compiled over the unqualified columns) and its index."""
+    expr = age_modes_expr(
+        literal_column("esrb_rating", Integer()),
+        literal_column("tags", ARRAY(String())),
+        literal_column("genres", ARRAY(Integer())),
+    )
+    expr_sql = expr.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return f"""-- GENERATED by `python -m appsvc.biz.age_modes_tool ddl` from appsvc/biz/age_modes.py, do not edit
+-- required by AGE_MODES_PRECOMPUTED=true
+-- re-applying it (e.g. after the rules change) recomputes the column for all games: the table is rewritten under an
+-- ACCESS EXCLUSIVE lock (searches wait, never see the column missing), so apply it off-peak
+-- run outside of a transaction block (CREATE INDEX CONCURRENTLY)
+
+BEGIN;
+
+ALTER TABLE games.games DROP COLUMN IF EXISTS age_modes;
+
+ALTER TABLE games.games ADD COLUMN age_modes text[] GENERATED ALWAYS AS (
+    {expr_sql}
+) STORED;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS games_age_modes_idx ON games.games USING gin (age_modes);
+"""
+
+
+def find_mismatches() -> t.Sequence[Row]:
+    """Games with stored age modes differing from the ones computed by the current rules."""
+    expected = age_modes_expr(AppDAO.esrb_rating, AppDAO.tags, AppDAO.genres)
+    return sqldb.session.execute(
+        select(AppDAO.id, AppDAO.name, AppDAO.age_modes.label("stored"), expected.label("expected"))
+        .where(AppDAO.age_modes.is_distinct_from(expected))
+        .order_by(AppDAO.id)
+    ).all()
@@ -0,0 +1,33 @@
+"""games.age_modes maintenance.
+
+Usage:
+    python -m appsvc.biz.age_modes_tool ddl > migrations/0003_games_age_modes.sql  # after changing the rules
+    python -m appsvc.biz.age_modes_tool check  # reports games with stored age modes differing from the rules
+"""
+
+import sys
+
+from appsvc import create_app
+from appsvc.biz.age_modes import (
+    age_modes_ddl,
+    find_mismatches,
+)
+
+
+def main(argv: list[str]) -> int:
+    if argv == ["ddl"]:
+        sys.stdout.write(age_modes_ddl())
+        return 0
+    if argv == ["check"]:
+        with create_app().app_context():
+            mismatches = find_mismatches()
+        for r in mismatches:
+            sys.stdout.write(f"game {r.id} ({r.name}): stored {r.stored}, expected {r.expected}\n")
+        sys.stdout.write(f"{len(mismatches)} mismatches\n")
+        return 1 if mismatches else 0
+    sys.stderr.write(__doc__ or "")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,24 +1,76 @@
+import atexit
+import base64
+import dataclasses
 import datetime
 import json
 import logging
 import os
+import tempfile
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from statistics import median
+from uuid import uuid4
 
 from dateutil.relativedelta import relativedelta
+from flask import (
+    Flask,
+    g,
+    has_app_context,
+)
+from marshmallow import ValidationError
 from sqlalchemy import (
     ARRAY,
     BigInteger,
     ColumnElement,
     Integer,
+    Row,
+    ScalarSelect,
+    Select,
     Text,
+    any_,
     cast,
     exists,
     func,
     lateral,
+    literal,
+    literal_column,
+    or_,
     select,
+    true,
+    tuple_,
+    type_coerce,
+    union,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import (
+    JSONB,
+    aggregate_order_by,
 )
-from sqlalchemy.orm import contains_eager
+from sqlalchemy.orm import joinedload
 
+from appsvc.biz import (
+    dto,
+    stats,
+)
+from appsvc.biz.age_modes import age_mode_rule_expr
+from appsvc.biz.autocomplete import (
+    Autocomplete,
+    AutocompleteEntry,
+    Completions,
+)
+from appsvc.biz.cache import (
+    SingleFlight,
+    TTLCache,
+)
+from appsvc.biz.catalog import (
+    Catalog,
+    CatalogEngine,
+    PublisherIndex,
+)
+from appsvc.biz.codec import codec_for
 from appsvc.biz.dto import (
     DEFAULT_AGE_MODE,
     AgeMode,
@@ -26,32 +78,48 @@ from appsvc.biz.dto import (
     AppsLib,
     ContainerDescr,
     ContainerOpDescr,
+    ContainersOpRequestDTO,
+    ContainersOpResponseDTO,
     MyStuffType,
     PauseAppRequestDTO,
     ResumeAppRequestDTO,
+    RunAppLaunchDTO,
+    RunAppLaunchStatus,
     RunAppRequestDTO,
     RunAppResponseDTO,
     SearchAppsAclRequestDTO,
+    SearchAppsBatchRequestDTO,
     SearchAppsOrderBy,
     SearchAppsRequestDTO,
+    SearchAppsResponseDTO,
     SearchAppsResponseItem,
+    SearchFacets,
     StopAppRequestDTO,
 )
 from appsvc.biz.errors import (
+    ERROR_APP_OP,
+    ERROR_UNKNOWN,
+    AppLaunchesLimitException,
+    AppLaunchNotFoundException,
     AppOpException,
     AppReleaseNotFoundException,
+    BizException,
     ContainerNotFoundException,
     JukeboxSvcException,
 )
+from appsvc.biz.hedge import Hedger
+from appsvc.biz.kvstore import KVStore
 from appsvc.biz.misc import log_input_output
 from appsvc.biz.models import (
     AppCompanyDAO,
     AppDAO,
+    AppPlatformDAO,
     AppReleaseDAO,
     UserDAO,
     UsersDcsDAO,
 )
 from appsvc.biz.sqldb import sqldb
+from appsvc.biz.standby import StandbyPool
 from appsvc.services import jukeboxsvc
 from appsvc.services.dto.jukeboxsvc import (
     AppPlatform,
@@ -81,74 +149,177 @@ DATA_CENTERS: list[str] = json.loads(os.environ["DATA_CENTERS"])
 RUNNERS_CONF: dict = json.loads(os.environ["RUNNERS_CONF"])
 STREAMD_REQS: dict = json.loads(os.environ["STREAMD_REQS"])
 
-ESRB_RATING_T_ID = 10
-ESRB_RATING_M_ID = 11
-MAX_GOOD_RTT = 0.05  # 50 ms
+# name search backed by trigram indexes (requires migrations/0001_search_trgm.sql)
+SEARCH_TRGM_ENABLED = os.environ.get("SEARCH_TRGM_ENABLED", "false").lower() == "true"
+
+# search engine: "sql" or "memory" (in-process catalog snapshot, see appsvc.biz.catalog)
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "sql")
+CATALOG_REFRESH_INTERVAL = int(os.environ.get("CATALOG_REFRESH_INTERVAL", 60))  # seconds
+# favorites counts (autocomplete popularity) scan all the users: refreshed less often than the catalog
+FAVORITES_COUNTS_TTL = int(os.environ.get("FAVORITES_COUNTS_TTL", 300))  # seconds
+# autocomplete (search_apps_acl) engine: "sql" or "memory" (see appsvc.biz.autocomplete)
+SEARCH_ACL_ENGINE = os.environ.get("SEARCH_ACL_ENGINE", "sql")
+# publisher search resolves publisher names to release ids with an in-process index (see appsvc.biz.catalog)
+SEARCH_PUBLISHER_INDEX_ENABLED = os.environ.get("SEARCH_PUBLISHER_INDEX_ENABLED", "true").lower() == "true"
+
+APP_RELEASE_CACHE_SIZE = int(os.environ.get("APP_RELEASE_CACHE_SIZE", 1024))
+APP_RELEASE_CACHE_TTL = int(os.environ.get("APP_RELEASE_CACHE_TTL", 300))  # seconds
+USER_PROFILE_CACHE_SIZE = int(os.environ.get("USER_PROFILE_CACHE_SIZE", 4096))
+USER_PROFILE_CACHE_TTL = int(os.environ.get("USER_PROFILE_CACHE_TTL", 30))  # seconds
+SEARCH_RESULT_CACHE_SIZE = int(os.environ.get("SEARCH_RESULT_CACHE_SIZE", 1024))
+SEARCH_RESULT_CACHE_TTL = int(os.environ.get("SEARCH_RESULT_CACHE_TTL", 10))  # seconds
+DC_RANKING_CACHE_SIZE = int(os.environ.get("DC_RANKING_CACHE_SIZE", 4096))
+DC_RANKING_CACHE_TTL = int(os.environ.get("DC_RANKING_CACHE_TTL", 300))  # seconds
+# number of users to rank DCs of on worker start (0: no warmup, requires migrations/0004_users_dcs_updated_at.sql)
+DC_RANKING_WARMUP_SIZE = int(os.environ.get("DC_RANKING_WARMUP_SIZE", 0))
+# asynchronous /apps/run: jukeboxsvc calls running at a time and pending (incl. running) launches per worker
+RUN_APP_ASYNC_MAX_WORKERS = int(os.environ.get("RUN_APP_ASYNC_MAX_WORKERS", 4))
+RUN_APP_ASYNC_MAX_PENDING = int(os.environ.get("RUN_APP_ASYNC_MAX_PENDING", 32))
+# launches are kept for RUN_APP_ASYNC_TTL in a database shared by the workers of the pod (see appsvc.biz.kvstore)
+RUN_APP_ASYNC_STORE_PATH = os.environ.get(
+    "RUN_APP_ASYNC_STORE_PATH", os.path.join(tempfile.gettempdir(), "appsvc.sqlite3")
+)
+RUN_APP_ASYNC_TTL = int(os.environ.get("RUN_APP_ASYNC_TTL", 600))  # seconds
+# idempotent launches: identical launches (same Idempotency-Key, or user, release and ws connection if enabled) are
+# coalesced while in flight and get the same result for RUN_APP_IDEMPOTENCY_TTL after (kept next to the launches)
+RUN_APP_IDEMPOTENCY_ENABLED = os.environ.get("RUN_APP_IDEMPOTENCY_ENABLED", "false").lower() == "true"
+RUN_APP_IDEMPOTENCY_TTL = int(os.environ.get("RUN_APP_IDEMPOTENCY_TTL", 30))  # seconds
+# longer than a launch may take (see jukeboxsvc.run_client)
+RUN_APP_IDEMPOTENCY_WAIT = int(os.environ.get("RUN_APP_IDEMPOTENCY_WAIT", 60))  # seconds
+# hedged launches: a launch slower than RUN_APP_HEDGE_PERCENTILE of recent ones is raced by a launch in the next
+# preferred DC (see appsvc.biz.hedge), the delay is RUN_APP_HEDGE_DEFAULT_DELAY until there are enough samples
+RUN_APP_HEDGE_ENABLED = os.environ.get("RUN_APP_HEDGE_ENABLED", "false").lower() == "true"
+RUN_APP_HEDGE_PERCENTILE = float(os.environ.get("RUN_APP_HEDGE_PERCENTILE", 90))
+RUN_APP_HEDGE_WINDOW = int(os.environ.get("RUN_APP_HEDGE_WINDOW", 200))  # launches
+RUN_APP_HEDGE_MIN_SAMPLES = int(os.environ.get("RUN_APP_HEDGE_MIN_SAMPLES", 20))
+RUN_APP_HEDGE_MIN_DELAY = float(os.environ.get("RUN_APP_HEDGE_MIN_DELAY", 2))  # seconds
+RUN_APP_HEDGE_DEFAULT_DELAY = float(os.environ.get("RUN_APP_HEDGE_DEFAULT_DELAY", 10))  # seconds
+# jukeboxsvc calls of hedged launches running at a time (primaries and hedges) per worker
+RUN_APP_HEDGE_MAX_WORKERS = int(os.environ.get("RUN_APP_HEDGE_MAX_WORKERS", 16))
+# warm standby containers (see appsvc.biz.standby): STANDBY_POOL_PER_RELEASE paused containers of each of the
+# STANDBY_POOL_HOT_RELEASES most launched releases of every DC; every worker has its own pool
+STANDBY_POOL_ENABLED = os.environ.get("STANDBY_POOL_ENABLED", "false").lower() == "true"
+# not available yet: a container belongs to the user it's run for and jukeboxsvc can't hand it over to another one, so
+# standby containers (run on behalf of no one) can't be given to users. Once it can: pass the user on resume (see
+# claim_standby_container) and drop this
+STANDBY_POOL_SUPPORTED = False
+STANDBY_POOL_HOT_RELEASES = int(os.environ.get("STANDBY_POOL_HOT_RELEASES", 5))
+STANDBY_POOL_PER_RELEASE = int(os.environ.get("STANDBY_POOL_PER_RELEASE", 1))
+# decayed launch count a release needs to be pooled, launch counts decay by half every STANDBY_POOL_HALF_LIFE
+STANDBY_POOL_MIN_LAUNCHES = float(os.environ.get("STANDBY_POOL_MIN_LAUNCHES", 3))
+STANDBY_POOL_HALF_LIFE = int(os.environ.get("STANDBY_POOL_HALF_LIFE", 3600))  # seconds
+STANDBY_POOL_TTL = int(os.environ.get("STANDBY_POOL_TTL", 900))  # seconds
+# bytes per pod (appsvc instance): shared evenly by the pools of its GUNICORN_NUM_WORKERS workers
+STANDBY_POOL_MEMORY_BUDGET = int(os.environ.get("STANDBY_POOL_MEMORY_BUDGET", 8 * 1024 * 1024 * 1024))
+GUNICORN_NUM_WORKERS = int(os.environ.get("GUNICORN_NUM_WORKERS", 2))  # same default as runtime/bin/cmd.sh
+# bulk pause/stop: jukeboxsvc calls running at a time per worker and per node
+CONTAINERS_OP_MAX_WORKERS = int(os.environ.get("CONTAINERS_OP_MAX_WORKERS", 32))
+CONTAINERS_OP_NODE_CONCURRENCY = int(os.environ.get("CONTAINERS_OP_NODE_CONCURRENCY", 4))
+STANDBY_POOL_REFILL_INTERVAL = int(os.environ.get("STANDBY_POOL_REFILL_INTERVAL", 30))  # seconds
+# facets of searches matching more results are estimated from a sample of the catalog
+SEARCH_FACETS_EXACT_LIMIT = int(os.environ.get("SEARCH_FACETS_EXACT_LIMIT", 20000))
+
+# age mode filters on the precomputed games.age_modes column (requires migrations/0003_games_age_modes.sql)
+AGE_MODES_PRECOMPUTED = os.environ.get("AGE_MODES_PRECOMPUTED", "false").lower() == "true"
 
-GENRE_EDUCATIONAL_ID = 1000000  # custom genre for educational games (suitable for kids)
-TAG_KIDS = "kids"
-TAG_ADULTS = "adults"
-TAG_MATURE = "mature"
+MAX_GOOD_RTT = 0.05  # 50 ms
 
 log = logging.getLogger("appsvc")
 
+# per-worker cache of app release details, keyed by release id with release uuid as an alias
+app_release_cache: TTLCache[str, AppReleaseDetails] = TTLCache(APP_RELEASE_CACHE_SIZE, APP_RELEASE_CACHE_TTL)
+stats.register("app_release_cache", app_release_cache.stats)
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """What searches need to know about a user, derived from accounts.users."""
+
+    age_mode: AgeMode
+    apps_lib: AppsLib
+
+
+# per-worker cache of user profiles, keyed by user id (see get_user_profile)
+user_profile_cache: TTLCache[int, UserProfile] = TTLCache(USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL)
+stats.register("user_profile_cache", user_profile_cache.stats)
+
+# per-worker cache of users' DC rankings keyed by user id (see get_user_preferred_dcs)
+dc_ranking_cache: TTLCache[int, list[str]] = TTLCache(DC_RANKING_CACHE_SIZE, DC_RANKING_CACHE_TTL)
+stats.register("dc_ranking_cache", dc_ranking_cache.stats)
+
+# per-worker cache of search results keyed by search_cache_key, misses of identical searches are coalesced
+search_result_cache: TTLCache[tuple, SearchAppsResponseDTO] = TTLCache(
+    SEARCH_RESULT_CACHE_SIZE, SEARCH_RESULT_CACHE_TTL
+)
+search_flight: SingleFlight[tuple, SearchAppsResponseDTO] = SingleFlight()
+stats.register("search_result_cache", lambda: {**search_result_cache.stats(), **search_flight.stats()})
+
 
 def age_mode_filter_expr(age_mode: AgeMode) -> ColumnElement[bool]:
-    if age_mode == AgeMode.KID:
-        return (
-            (AppDAO.esrb_rating < ESRB_RATING_T_ID)
-            | AppDAO.tags.contains(cast([TAG_KIDS], ARRAY(Text())))
-            | (
-                AppDAO.genres.contains([GENRE_EDUCATIONAL_ID])
-                & ~AppDAO.tags.contains(cast([TAG_ADULTS], ARRAY(Text())))
-                & ~AppDAO.tags.contains(cast([TAG_MATURE], ARRAY(Text())))
-            )
-        )
-    elif age_mode == AgeMode.TEEN:
-        return (AppDAO.esrb_rating < ESRB_RATING_M_ID) | (
-            AppDAO.esrb_rating.is_(None)
-            & ~AppDAO.tags.contains(cast([TAG_ADULTS], ARRAY(Text())))
-            & ~AppDAO.tags.contains(cast([TAG_MATURE], ARRAY(Text())))
+    if AGE_MODES_PRECOMPUTED and age_mode in (AgeMode.KID, AgeMode.TEEN):
+        # served by games_age_modes_idx
+        return AppDAO.age_modes.contains(cast([age_mode.value], ARRAY(Text())))
+    return age_mode_rule_expr(age_mode, AppDAO.esrb_rating, AppDAO.tags, AppDAO.genres)
+
+
+def app_release_companies_expr() -> ScalarSelect:
+    """Release companies (jsonb array) with company names resolved from games.companies.
+
+    Correlated to the outer releases row, so names of all companies are fetched along with the release itself.
+    """
+    elem = (
+        func.jsonb_array_elements(AppReleaseDAO.companies)
+        .table_valued("value", with_ordinality="ordinality")
+        .alias("elem")
+    )
+    company = elem.c.value.op("||")(func.jsonb_build_object("name", AppCompanyDAO.name))
+    return (
+        select(
+            func.coalesce(func.jsonb_agg(aggregate_order_by(company, elem.c.ordinality)), cast("[]", JSONB)),
         )
-    elif age_mode == AgeMode.ADULT:
-        return True
-    else:
-        return False
+        .select_from(elem)
+        .outerjoin(AppCompanyDAO, AppCompanyDAO.id == cast(elem.c.value.op("->>")("id"), Integer))
+        .correlate(AppReleaseDAO)
+        .scalar_subquery()
+    )
 
 
-def get_app_release(release_uuid: str) -> AppReleaseDetails:
-    # support "human-readable" urls (using games.releases.id instead of uuid)
-    filter_by_field = AppReleaseDAO.uuid if len(release_uuid) == 36 else AppReleaseDAO.id
-    filter_by = [filter_by_field == release_uuid, AppReleaseDAO.is_visible.is_(True)]
-    r = AppReleaseDAO.query.filter(*filter_by).first()
-    if not r:
-        raise AppReleaseNotFoundException
-    # fetch company name
-    for c in r.companies:
-        company_dao = AppCompanyDAO.query.filter_by(id=c["id"]).first()
-        c["name"] = company_dao.name
+def app_release_details_query() -> Select:
+    """Release, game, platform and company names in a single statement."""
+    return select(AppReleaseDAO, type_coerce(app_release_companies_expr(), JSONB).label("companies")).options(
+        joinedload(AppReleaseDAO.game), joinedload(AppReleaseDAO.platform)
+    )
+
+
+def make_app_release_details(r: AppReleaseDAO, companies: list[dict]) -> AppReleaseDetails:
     # norm refs
-    for k, v in r.game.refs.items():
-        if v in {-1, ""}:
-            r.game.refs[k] = None
+    refs = {k: None if v in {-1, ""} else v for k, v in r.game.refs.items()}
     return AppReleaseDetails(
         addl_artifacts=r.game.addl_artifacts,
         alternative_names=r.game.alternative_names,
-        app_reqs=AppReleaseDetails.AppReqs.Schema().load(r.app_reqs),
-        companies=r.companies,
-        distro=AppReleaseDetails.Distro.Schema().load(r.distro),
+        app_reqs=codec_for(AppReleaseDetails.AppReqs).load(r.app_reqs),
+        companies=companies,
+        distro=codec_for(AppReleaseDetails.Distro).load(r.distro),
         esrb_rating=r.game.esrb_rating,
         id=r.id,
-        igdb=AppReleaseDetails.IgdbDescr.Schema().load(r.game.igdb),
+        igdb=codec_for(AppReleaseDetails.IgdbDescr).load(r.game.igdb),
         is_visible=r.is_visible,
         lang=r.lang,
         long_descr=r.game.long_descr,
-        media_assets=AppReleaseDetails.MediaAssets.Schema().load(r.game.media_assets),
-        media_assets_localized=AppReleaseDetails.MediaAssets.Schema().load(r.media_assets) if r.media_assets else None,
+        media_assets=codec_for(AppReleaseDetails.MediaAssets).load(r.game.media_assets),
+        media_assets_localized=(
+            codec_for(AppReleaseDetails.MediaAssets).load(r.media_assets) if r.media_assets else None
+        ),
         name=r.name,
-        platform=r.platform,
-        refs=AppReleaseDetails.GameRefs.Schema().load(r.game.refs),
-        runner=AppReleaseDetails.Runner.Schema().load(r.runner),
+        platform=AppReleaseDetails.AppPlatform(
+            id=r.platform.id,
+            name=r.platform.name,
+            abbreviation=r.platform.abbreviation,
+            alternative_name=r.platform.alternative_name,
+            slug=r.platform.slug,
+        ),
+        refs=codec_for(AppReleaseDetails.GameRefs).load(refs),
+        runner=codec_for(AppReleaseDetails.Runner).load(r.runner),
         short_descr=r.game.short_descr,
         uuid=r.uuid,
         year_released=r.year_released,
@@ -157,6 +328,66 @@ def get_app_release(release_uuid: str) -> AppReleaseDetails:
     )
 
 
+def get_app_release(release_uuid: str) -> AppReleaseDetails:
+    """Gets app release details (cached).
+
+    Returned object is shared between requests and must not be modified.
+    """
+    res = app_release_cache.get(release_uuid)
+    if res is None:
+        res = load_app_release(release_uuid)
+        app_release_cache.put(str(res.id), res, aliases=[res.uuid])
+    return res
+
+
+def load_app_release(release_uuid: str) -> AppReleaseDetails:
+    """Loads app release details using a single DB round trip (regardless of the number of release companies)."""
+    # support "human-readable" urls (using games.releases.id instead of uuid)
+    filter_by_field = AppReleaseDAO.uuid if len(release_uuid) == 36 else AppReleaseDAO.id
+    q = app_release_details_query().where(filter_by_field == release_uuid, AppReleaseDAO.is_visible.is_(True))
+    row = sqldb.session.execute(q.limit(1)).first()
+    if not row:
+        raise AppReleaseNotFoundException
+    r, companies = row
+    return make_app_release_details(r, companies)
+
+
+def get_app_releases(release_ids: list[str]) -> list[AppReleaseDetails | None]:
+    """Gets details of several app releases (cached), in the order of release_ids (release ids or uuids).
+
+    Releases not found (or not visible) are None. Cache misses are loaded with a single DB round trip.
+    """
+    res: dict[str, AppReleaseDetails | None] = {
+        release_id: app_release_cache.get(release_id) for release_id in release_ids
+    }
+    missing = [release_id for release_id, r in res.items() if r is None]
+    if missing:
+        loaded = {}
+        for r in load_app_releases(missing):
+            app_release_cache.put(str(r.id), r, aliases=[r.uuid])
+            loaded[str(r.id)] = loaded[r.uuid] = r
+        for release_id in missing:
+            res[release_id] = loaded.get(release_id)
+    return [res[release_id] for release_id in release_ids]
+
+
+def load_app_releases(release_ids: list[str]) -> list[AppReleaseDetails]:
+    """Loads details of the visible app releases with the given ids or uuids (any order, ignoring the missing ones)."""
+    # same id/uuid distinction as load_app_release, malformed ids can't match anything
+    uuids = [release_id for release_id in release_ids if len(release_id) == 36]
+    ids = [int(release_id) for release_id in release_ids if release_id.isdigit() and len(release_id) <= 18]
+    if not uuids and not ids:
+        return []
+    q = app_release_details_query().where(
+        or_(
+            AppReleaseDAO.id == any_(cast(ids, ARRAY(BigInteger))),
+            AppReleaseDAO.uuid == any_(cast(uuids, ARRAY(Text()))),
+        ),
+        AppReleaseDAO.is_visible.is_(True),
+    )
+    return [make_app_release_details(r, companies) for r, companies in sqldb.session.execute(q).all()]
+
+
 def get_hw_reqs(
     app_release: AppReleaseDetails, runner_conf: dict
 ) -> RunContainerRequestDTO.Requirements.HardwareRequirements:
@@ -212,10 +443,10 @@ def get_streamd_video_enc(streamd_reqs: dict) -> VideoEnc:
         return VideoEnc.CPU
 
 
-@log_input_output
-def get_preferred_dcs(user_id: int, known_dcs: list[str]) -> list[str]:
+def rank_dcs(dcs: dict[str, list[float]] | None, known_dcs: list[str]) -> list[str]:
     """Returns DCs sorted in preferred order (fastest first)
 
+    dcs: RTT samples per DC (stats.users_dcs.dcs), None for a new user
     known_dcs: DCs sorted from West to East (geographically)
 
     When there is a DC with a known max good rtt - return this DC as preferred,
@@ -223,26 +454,84 @@ def get_preferred_dcs(user_id: int, known_dcs: list[str]) -> list[str]:
 
     # TODO: do not go further to the East if current DC is slower than the previous DC
     """
-    user_dcs = sqldb.session.query(UsersDcsDAO).filter(UsersDcsDAO.user_id == user_id).first()
-    if not user_dcs:
+    if not dcs:
         # new user
         return known_dcs
     # make default preferred_dcs = {W: .05, E: .051, C: .052}
     preferred_dcs = {k: MAX_GOOD_RTT + (ix / 1000) for ix, k in enumerate(known_dcs)}
-    for k, v in user_dcs.dcs.items():
+    for k, v in dcs.items():
         preferred_dcs[k] = median(v)
     return sorted(preferred_dcs, key=lambda k: preferred_dcs[k])
 
 
 @log_input_output
-def run_app(req: RunAppRequestDTO) -> RunAppResponseDTO:
-    app_release: AppReleaseDetails = get_app_release(req.app_release_uuid)
+def get_preferred_dcs(user_id: int, known_dcs: list[str]) -> list[str]:
+    """Returns DCs sorted in preferred order (fastest first), see rank_dcs."""
+    user_dcs = sqldb.session.query(UsersDcsDAO).filter(UsersDcsDAO.user_id == user_id).first()
+    return rank_dcs(user_dcs.dcs if user_dcs else None, known_dcs)
+
+
+def get_user_preferred_dcs(user_id: int) -> list[str]:
+    """Same as get_preferred_dcs(user_id, DATA_CENTERS), cached.
+
+    Returned list is shared between requests and must not be modified.
+    """
+    res = dc_ranking_cache.get(user_id)
+    if res is None:
+        res = get_preferred_dcs(user_id, DATA_CENTERS)
+        dc_ranking_cache.put(user_id, res)
+    return res
+
+
+def update_dc_ranking(user_id: int, dcs: dict[str, list[float]] | None = None) -> None:
+    """Write-through hook for new RTT samples of the user.
+
+    dcs: all the samples of the user (as stored in stats.users_dcs) to re-rank with, None drops the cached ranking.
+    """
+    if dcs is None:
+        dc_ranking_cache.invalidate(user_id)
+    else:
+        dc_ranking_cache.put(user_id, rank_dcs(dcs, DATA_CENTERS))
+
+
+def warmup_dc_rankings(user_ids: list[int] | None = None) -> int:
+    """Ranks DCs of several users with a single query, returns the number of users ranked.
+
+    user_ids: defaults to DC_RANKING_WARMUP_SIZE users with the most recently updated samples (requires
+    migrations/0004_users_dcs_updated_at.sql).
+    """
+    q = sqldb.session.query(UsersDcsDAO.user_id, UsersDcsDAO.dcs)
+    if user_ids is None:
+        q = q.order_by(UsersDcsDAO.updated_at.desc(), UsersDcsDAO.id.desc()).limit(DC_RANKING_WARMUP_SIZE)
+    else:
+        q = q.filter(UsersDcsDAO.user_id == any_(cast(user_ids, ARRAY(BigInteger))))
+    ranked = {r.user_id: rank_dcs(r.dcs, DATA_CENTERS) for r in q.all()}
+    for user_id in user_ids or ():
+        # users without samples
+        ranked.setdefault(user_id, DATA_CENTERS)
+    for user_id, dcs in ranked.items():
+        dc_ranking_cache.put(user_id, dcs)
+    return len(ranked)
+
+
+def warmup_dc_rankings_async(app: Flask) -> None:
+    """Warms the DC ranking cache of the worker up in the background."""
+
+    def warmup() -> None:
+        try:
+            with app.app_context():
+                log.info("dc rankings warmed up: %d users", warmup_dc_rankings())
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception("dc rankings warmup failed")
+
+    threading.Thread(target=warmup, name="dc-rankings-warmup", daemon=True).start()
+
+
+def make_run_container_request(
+    app_release: AppReleaseDetails, user_id: int, preferred_dcs: list[str], ws_conn: WsConnDC
+) -> RunContainerRequestDTO:
     runner_name = app_release.runner.name
     runner_conf = RUNNERS_CONF[runner_name]
-
-    # preferred_dcs may come directly from the UA (TODO: not supported)
-    # or be picked based on the collected webrtc stats
-    preferred_dcs: list[str] = req.preferred_dcs or get_preferred_dcs(req.user_id, DATA_CENTERS)
     runner_ver = app_release.runner.ver or runner_conf["ver"]
     runner_window_system = app_release.runner.window_system or WindowSystem(runner_conf["window_system"])
 
@@ -264,7 +553,7 @@ def run_app(req: RunAppRequestDTO) -> RunAppResponseDTO:
         if color_bits == 16:
             color_bits = 24
 
-    run_container_req: RunContainerRequestDTO = RunContainerRequestDTO(
+    return RunContainerRequestDTO(
         app_descr=RunContainerRequestDTO.AppDescr(
             slug=app_release.igdb.slug,
             release_uuid=app_release.uuid,
@@ -287,15 +576,101 @@ def run_app(req: RunAppRequestDTO) -> RunAppResponseDTO:
             ),
             hw=get_hw_reqs(app_release, runner_conf),
         ),
-        user_id=req.user_id,
+        user_id=user_id,
         preferred_dcs=preferred_dcs,
         ws_conn=WsConnDC(
-            id=req.ws_conn.id,
-            consumer_id=req.ws_conn.consumer_id,
+            id=ws_conn.id,
+            consumer_id=ws_conn.consumer_id,
         ),
     )
+
+
+@dataclass(frozen=True)
+class LaunchPlan:
+    """Container request of a release serialized ahead of time, without the per-launch fields."""
+
+    app_release: AppReleaseDetails  # the plan is built from (reloaded releases get new plans)
+    # configuration the plan is built from: compared by identity, config is replaced rather than modified
+    runner_conf: dict
+    streamd_reqs: dict
+    body_prefix: str  # JSON object of the request without the per-launch fields and the closing brace
+
+    def request_body(self, user_id: int, preferred_dcs: list[str], ws_conn: dto.WsConnDC) -> str:
+        """JSON of make_run_container_request(self.app_release, user_id, preferred_dcs, ws_conn)."""
+        ws_conn_body = codec_for(WsConnDC).dump(WsConnDC(id=ws_conn.id, consumer_id=ws_conn.consumer_id))
+        return (
+            f'{self.body_prefix}, "preferred_dcs": {json.dumps(preferred_dcs)}, "user_id": {json.dumps(user_id)}, '
+            f'"ws_conn": {json.dumps(ws_conn_body)}}}'
+        )
+
+
+LAUNCH_PLAN_PER_LAUNCH_FIELDS = ("preferred_dcs", "user_id", "ws_conn")
+
+# per-worker cache of launch plans keyed by release id (see get_launch_plan)
+launch_plan_cache: TTLCache[int, LaunchPlan] = TTLCache(APP_RELEASE_CACHE_SIZE, APP_RELEASE_CACHE_TTL)
+stats.register("launch_plan_cache", launch_plan_cache.stats)
+
+
+def make_launch_plan(app_release: AppReleaseDetails) -> LaunchPlan:
+    body = codec_for(RunContainerRequestDTO).dump(
+        make_run_container_request(app_release, 0, [], WsConnDC(consumer_id="", id=""))
+    )
+    for f in LAUNCH_PLAN_PER_LAUNCH_FIELDS:
+        del body[f]
+    return LaunchPlan(
+        app_release=app_release,
+        runner_conf=RUNNERS_CONF[app_release.runner.name],
+        streamd_reqs=STREAMD_REQS,
+        body_prefix=json.dumps(body)[:-1],
+    )
+
+
+def get_launch_plan(app_release: AppReleaseDetails) -> LaunchPlan:
+    """Launch plan of the release (cached).
+
+    Plans are rebuilt once the release is reloaded (app_release_cache returns the same object until then) or the
+    configuration of its runner changes.
+    """
+    plan = launch_plan_cache.get(app_release.id)
+    if (
+        plan is None
+        or plan.app_release is not app_release
+        or plan.runner_conf is not RUNNERS_CONF.get(app_release.runner.name)
+        or plan.streamd_reqs is not STREAMD_REQS
+    ):
+        plan = make_launch_plan(app_release)
+        launch_plan_cache.put(app_release.id, plan)
+    return plan
+
+
+def get_launch_dcs(req: RunAppRequestDTO) -> list[str]:
+    # preferred_dcs may come directly from the UA (TODO: not supported)
+    # or be picked based on the collected webrtc stats
+    return req.preferred_dcs or get_user_preferred_dcs(req.user_id)
+
+
+class LaunchRequest(t.NamedTuple):
+    """Everything run_app resolves before calling jukeboxsvc (in the request: DB lookups need the app context)."""
+
+    body: str
+    hedge_body: str | None  # None: the launch is not to be hedged
+    dcs: list[str]  # in order of preference
+
+
+def make_launch_request(req: RunAppRequestDTO) -> LaunchRequest:
+    """Request bodies of the launch and of its hedge, DCs of the launch."""
+    plan = get_launch_plan(get_app_release(req.app_release_uuid))
+    preferred_dcs = get_launch_dcs(req)
+    body = plan.request_body(req.user_id, preferred_dcs, req.ws_conn)
+    if not RUN_APP_HEDGE_ENABLED or len(preferred_dcs) < 2:
+        return LaunchRequest(body, None, preferred_dcs)
+    # the hedge is restricted to the next DC
+    return LaunchRequest(body, plan.request_body(req.user_id, preferred_dcs[1:2], req.ws_conn), preferred_dcs)
+
+
+def run_container(body: str) -> RunAppResponseDTO:
     try:
-        run_container_res: RunContainerResponseDTO = jukeboxsvc.run_container(run_container_req)
+        run_container_res: RunContainerResponseDTO = jukeboxsvc.run_container_json(body)
     except JukeboxSvcException as e:
         raise AppOpException(e.message) from e
     return RunAppResponseDTO(
@@ -308,6 +683,336 @@ def run_app(req: RunAppRequestDTO) -> RunAppResponseDTO:
     )
 
 
+hedger = Hedger(
+    ThreadPoolExecutor(max_workers=RUN_APP_HEDGE_MAX_WORKERS, thread_name_prefix="hedge"),
+    percentile=RUN_APP_HEDGE_PERCENTILE,
+    window=RUN_APP_HEDGE_WINDOW,
+    min_samples=RUN_APP_HEDGE_MIN_SAMPLES,
+    min_delay=RUN_APP_HEDGE_MIN_DELAY,
+    default_delay=RUN_APP_HEDGE_DEFAULT_DELAY,
+)
+stats.register("launch_hedging", hedger.stats)
+# executor threads keep their jukeboxsvc connections alive too: launches, stops of the losers
+jukeboxsvc.run_client.add_callers(RUN_APP_HEDGE_MAX_WORKERS)
+jukeboxsvc.ops_client.add_callers(RUN_APP_HEDGE_MAX_WORKERS)
+
+
+def stop_lost_container(res: RunAppResponseDTO) -> None:
+    """Stops the container of a launch which lost the race to its hedge (or vice versa)."""
+    log.info("stopping container %s of a lost launch", res.container.id)
+    try:
+        jukeboxsvc.stop_container(ContainerOpDescr(id=res.container.id, node_id=res.container.node_id))
+    except ContainerNotFoundException:
+        pass
+
+
+def launch_container(body: str, hedge_body: str | None) -> RunAppResponseDTO:
+    if hedge_body is None:
+        return run_container(body)
+    return hedger.call(lambda: run_container(body), lambda: run_container(hedge_body), stop_lost_container)
+
+
+def stop_standby_container(container: ContainerDescr) -> None:
+    log.info("stopping standby container %s", container.id)
+    try:
+        jukeboxsvc.stop_container(ContainerOpDescr(id=container.id, node_id=container.node_id))
+    except ContainerNotFoundException:
+        pass
+
+
+def start_standby_container(release_uuid: str, dc: str) -> ContainerDescr:
+    """Starts a paused container of the release in the DC (on behalf of no user: user id 0)."""
+    plan = get_launch_plan(get_app_release(release_uuid))
+    res = run_container(plan.request_body(0, [dc], dto.WsConnDC(id=f"standby-{uuid4()}", consumer_id="")))
+    try:
+        jukeboxsvc.pause_container(ContainerOpDescr(id=res.container.id, node_id=res.container.node_id))
+    except JukeboxSvcException:
+        stop_standby_container(res.container)
+        raise
+    return res.container
+
+
+def standby_container_memory(release_uuid: str) -> int:
+    app_release = get_app_release(release_uuid)
+    return get_hw_reqs(app_release, RUNNERS_CONF[app_release.runner.name]).memory
+
+
+standby_pool = StandbyPool(
+    hot=STANDBY_POOL_HOT_RELEASES,
+    per_release=STANDBY_POOL_PER_RELEASE,
+    min_launches=STANDBY_POOL_MIN_LAUNCHES,
+    ttl=STANDBY_POOL_TTL,
+    memory_budget=STANDBY_POOL_MEMORY_BUDGET // GUNICORN_NUM_WORKERS,
+    half_life=STANDBY_POOL_HALF_LIFE,
+    start=start_standby_container,
+    memory=standby_container_memory,
+    stop=stop_standby_container,
+)
+stats.register("standby_pool", standby_pool.stats)
+
+
+def start_standby_pool(app: Flask) -> None:
+    """Refills the standby pool of the worker every STANDBY_POOL_REFILL_INTERVAL in the background.
+
+    The pool is emptied on (graceful) worker exit, containers of killed workers are left running.
+    """
+    if not STANDBY_POOL_SUPPORTED:
+        log.warning("standby pool not started: jukeboxsvc can't hand standby containers over to users yet")
+        return
+
+    def refill() -> None:
+        while True:
+            try:
+                with app.app_context():
+                    standby_pool.refill()
+            except Exception:  # pylint: disable=broad-exception-caught
+                log.exception("standby pool refill failed")
+            time.sleep(STANDBY_POOL_REFILL_INTERVAL)
+
+    atexit.register(standby_pool.clear)
+    threading.Thread(target=refill, name="standby-pool-refill", daemon=True).start()
+
+
+def claim_standby_container(req: RunAppRequestDTO, dcs: list[str]) -> RunAppResponseDTO | None:
+    """Resumes a standby container of the release in one of the DCs for the user, None if there's none."""
+    if not STANDBY_POOL_ENABLED or not STANDBY_POOL_SUPPORTED:
+        return None
+    c = standby_pool.claim(req.app_release_uuid, dcs)
+    if c is None:
+        return None
+    try:
+        jukeboxsvc.resume_container(
+            ResumeAppRequestDTO(
+                container=ContainerOpDescr(id=c.container.id, node_id=c.container.node_id), ws_conn=req.ws_conn
+            )
+        )
+    except JukeboxSvcException:
+        log.exception("standby container %s failed to resume", c.container.id)
+        try:
+            stop_standby_container(c.container)
+        except JukeboxSvcException:
+            log.exception("standby container %s failed to stop", c.container.id)
+        return None
+    return RunAppResponseDTO(container=c.container)
+
+
+def launch_app(req: RunAppRequestDTO, launch_req: LaunchRequest) -> RunAppResponseDTO:
+    """Launches the app in a standby container if there's one, in a new one otherwise."""
+    return claim_standby_container(req, launch_req.dcs) or launch_container(launch_req.body, launch_req.hedge_body)
+
+
+def run_app_key(req: RunAppRequestDTO, idempotency_key: str | None) -> str | None:
+    """Key identical launches share (None: the launch is not deduplicated), client keys are scoped by user."""
+    if idempotency_key:
+        return f"{req.user_id}:key:{idempotency_key}"
+    if RUN_APP_IDEMPOTENCY_ENABLED:
+        return f"{req.user_id}:{req.app_release_uuid}:{req.ws_conn.id}"
+    return None
+
+
+class RunAppKeyStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.launched = 0
+        self.coalesced = 0  # waited for an identical launch in flight
+        self.replayed = 0  # got the result of a completed identical launch
+
+    def count(self, event: str) -> None:
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def stats(self) -> dict:
+        return {
+            "launched": self.launched,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+            **run_app_keys.stats(),
+        }
+
+
+RUN_APP_KEY_PENDING = "pending"
+
+
+def index_run_app_key(container_id: str, key: str) -> None:
+    """Remembers the key the container was launched with (see forget_run_app_key)."""
+    run_app_keys.put(f"container:{container_id}", key)
+
+
+def forget_run_app_key(container_id: str) -> None:
+    """Makes launches identical to the one of the (stopped) container launch again, instead of getting it."""
+    index = f"container:{container_id}"
+    key = run_app_keys.get(index)
+    if key is not None:
+        run_app_keys.delete(key)
+        run_app_keys.delete(index)
+
+
+# launch key -> RUN_APP_KEY_PENDING / launch result JSON (synchronous launches), "async:" + launch key -> launch id
+run_app_keys = KVStore(RUN_APP_ASYNC_STORE_PATH, "run_app_keys", RUN_APP_IDEMPOTENCY_TTL)
+run_app_key_stats = RunAppKeyStats()
+stats.register("run_app_keys", run_app_key_stats.stats)
+
+
+def run_app_once(key: str, launch: t.Callable[[], RunAppResponseDTO], interval: float = 0.1) -> RunAppResponseDTO:
+    """Result of the launch, or of an identical one (in flight or completed within RUN_APP_IDEMPOTENCY_TTL).
+
+    The first of identical launches marks the key pending (shared by the workers through the launch store), the
+    others poll for its result. Failed launches are forgotten (their retries launch again).
+    """
+    deadline = time.monotonic() + RUN_APP_IDEMPOTENCY_WAIT
+    waited = False
+    while True:
+        if run_app_keys.add(key, RUN_APP_KEY_PENDING, ttl=RUN_APP_IDEMPOTENCY_WAIT):
+            run_app_key_stats.count("launched")
+            try:
+                res = launch()
+            except Exception:
+                run_app_keys.delete(key)
+                raise
+            run_app_keys.put(key, json.dumps(codec_for(RunAppResponseDTO).dump(res)))
+            index_run_app_key(res.container.id, key)
+            return res
+        data = run_app_keys.get(key)
+        if data is not None and data != RUN_APP_KEY_PENDING:
+            run_app_key_stats.count("coalesced" if waited else "replayed")
+            return codec_for(RunAppResponseDTO).load(json.loads(data))
+        if time.monotonic() >= deadline:
+            raise AppOpException("an identical launch is still in progress")
+        waited = True
+        time.sleep(interval)
+
+
+@log_input_output
+def run_app(req: RunAppRequestDTO, idempotency_key: str | None = None) -> RunAppResponseDTO:
+    launch_req = make_launch_request(req)
+    key = run_app_key(req, idempotency_key)
+    if key is None:
+        return launch_app(req, launch_req)
+    return run_app_once(key, lambda: launch_app(req, launch_req))
+
+
+class LaunchStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def count(self, event: str) -> None:
+        with self._lock:
+            setattr(self, event, getattr(self, event) + 1)
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "running": self.started - self.succeeded - self.failed,
+        }
+
+
+# asynchronous launches: jukeboxsvc calls run in a bounded pool, launches are visible to all workers of the pod
+launches = KVStore(RUN_APP_ASYNC_STORE_PATH, "launches", RUN_APP_ASYNC_TTL)
+launch_executor = ThreadPoolExecutor(max_workers=RUN_APP_ASYNC_MAX_WORKERS, thread_name_prefix="launch")
+jukeboxsvc.run_client.add_callers(RUN_APP_ASYNC_MAX_WORKERS)
+jukeboxsvc.ops_client.add_callers(RUN_APP_ASYNC_MAX_WORKERS)  # standby containers are resumed
+launch_slots = threading.BoundedSemaphore(RUN_APP_ASYNC_MAX_PENDING)
+launch_stats = LaunchStats()
+stats.register("launches", launch_stats.stats)
+
+
+def save_launch(launch: RunAppLaunchDTO) -> None:
+    launches.put(launch.id, json.dumps(codec_for(RunAppLaunchDTO).dump(launch)))
+
+
+def get_launch(launch_id: str) -> RunAppLaunchDTO:
+    data = launches.get(launch_id)
+    if data is None:
+        raise AppLaunchNotFoundException
+    return codec_for(RunAppLaunchDTO).load(json.loads(data))
+
+
+@log_input_output
+def run_app_async(req: RunAppRequestDTO, idempotency_key: str | None = None) -> RunAppLaunchDTO:
+    """Same as run_app, but only starts the launch: its result is to be fetched with get_launch / watch_launch.
+
+    Releases, DCs etc. are resolved right away (so are their errors), just the jukeboxsvc call is left to the launch
+    executor. At most RUN_APP_ASYNC_MAX_PENDING launches of a worker may be pending at a time. Identical launches
+    (see run_app_key) started within RUN_APP_IDEMPOTENCY_TTL get the launch of the first one unless it failed.
+    """
+    launch_req = make_launch_request(req)
+    key = run_app_key(req, idempotency_key)
+    key = None if key is None else f"async:{key}"
+    if not launch_slots.acquire(blocking=False):  # pylint: disable=consider-using-with  # released by complete_launch
+        launch_stats.count("rejected")
+        raise AppLaunchesLimitException
+    try:
+        launch = RunAppLaunchDTO(id=str(uuid4()), status=RunAppLaunchStatus.PENDING)
+        save_launch(launch)
+        if key is None or run_app_keys.add(key, launch.id):
+            launch_executor.submit(complete_launch, launch.id, req, launch_req, key)
+            if key is not None:
+                run_app_key_stats.count("launched")
+            return launch
+    except Exception:
+        launch_slots.release()
+        raise
+
+    # an identical launch was started already
+    launch_slots.release()
+    launches.delete(launch.id)
+    run_app_key_stats.count("replayed")
+    existing_id = run_app_keys.get(key)
+    if existing_id is None:  # expired in the meantime
+        raise AppOpException("an identical launch has just expired, retry")
+    return get_launch(existing_id)
+
+
+def complete_launch(launch_id: str, req: RunAppRequestDTO, launch_req: LaunchRequest, key: str | None = None) -> None:
+    launch_stats.count("started")
+    try:
+        launch = RunAppLaunchDTO(id=launch_id, status=RunAppLaunchStatus.SUCCEEDED, result=launch_app(req, launch_req))
+        launch_stats.count("succeeded")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        if isinstance(e, BizException):
+            error = RunAppLaunchDTO.Error(code=e.code or ERROR_UNKNOWN[0], message=str(e.message))
+        else:
+            log.exception("launch %s failed", launch_id)
+            error = RunAppLaunchDTO.Error(*ERROR_UNKNOWN)
+        launch = RunAppLaunchDTO(id=launch_id, status=RunAppLaunchStatus.FAILED, error=error)
+        launch_stats.count("failed")
+    try:
+        save_launch(launch)
+        if key is not None and launch.status == RunAppLaunchStatus.FAILED:
+            # retries launch again
+            run_app_keys.delete(key)
+        elif key is not None and launch.result is not None:
+            index_run_app_key(launch.result.container.id, key)
+    except Exception:  # pylint: disable=broad-exception-caught
+        log.exception("launch %s: saving failed", launch_id)
+    finally:
+        launch_slots.release()
+
+
+def watch_launch(launch_id: str, timeout: float, interval: float = 0.2) -> t.Iterator[RunAppLaunchDTO]:
+    """Yields the launch on every status change until it's completed or timeout expires.
+
+    The launch store is polled: the launch may be run by another worker.
+    """
+    deadline = time.monotonic() + timeout
+    status = None
+    while True:
+        launch = get_launch(launch_id)
+        if launch.status != status:
+            status = launch.status
+            yield launch
+        if status != RunAppLaunchStatus.PENDING or time.monotonic() >= deadline:
+            return
+        time.sleep(interval)
+
+
 @log_input_output
 def pause_app(req: PauseAppRequestDTO) -> None:
     try:
@@ -327,27 +1032,124 @@ def resume_app(req: ResumeAppRequestDTO) -> None:
 @log_input_output
 def stop_app(req: StopAppRequestDTO) -> None:
     try:
-        jukeboxsvc.stop_container(ContainerOpDescr(id=req.container.id, node_id=req.container.node_id))
-    except ContainerNotFoundException:
-        log.warning("container %s was already stopped", req.container.id)
+        stop_container(ContainerOpDescr(id=req.container.id, node_id=req.container.node_id))
     except JukeboxSvcException as e:
         raise AppOpException(e.message) from e
 
 
-def get_age_mode(user_id: int | None) -> AgeMode:
-    age_mode = DEFAULT_AGE_MODE
-    if not user_id:
-        return age_mode
-    now_date = datetime.datetime.now().date()
-    current_user = sqldb.session.query(UserDAO).filter(UserDAO.id == user_id).first()
-    age = relativedelta(now_date, current_user.dob).years
+def stop_container(container: ContainerOpDescr) -> None:
+    try:
+        jukeboxsvc.stop_container(container)
+    except ContainerNotFoundException:
+        log.warning("container %s was already stopped", container.id)
+    # a relaunch (e.g. on the same ws connection) must not get the stopped container
+    forget_run_app_key(container.id)
+
+
+containers_op_executor = ThreadPoolExecutor(max_workers=CONTAINERS_OP_MAX_WORKERS, thread_name_prefix="containers-op")
+jukeboxsvc.ops_client.add_callers(CONTAINERS_OP_MAX_WORKERS)
+
+
+def run_containers_op(
+    op: t.Callable[[ContainerOpDescr], None], containers: list[ContainerOpDescr]
+) -> ContainersOpResponseDTO:
+    """Runs the jukeboxsvc op on every container, each container gets its own result.
+
+    Containers are grouped by node, the containers of a node are split into CONTAINERS_OP_NODE_CONCURRENCY lanes run
+    one container after another: nodes are worked on concurrently (at most CONTAINERS_OP_MAX_WORKERS calls at a time)
+    without being flooded.
+    """
+    errors: list[ContainersOpResponseDTO.Error | None] = [None] * len(containers)
+
+    def run_lane(ixs: list[int]) -> None:
+        for ix in ixs:
+            try:
+                op(containers[ix])
+            except BizException as e:
+                errors[ix] = ContainersOpResponseDTO.Error(code=ERROR_APP_OP[0], message=str(e.message))
+            except Exception:  # pylint: disable=broad-exception-caught
+                log.exception("%s of container %s failed", op.__name__, containers[ix].id)
+                errors[ix] = ContainersOpResponseDTO.Error(*ERROR_UNKNOWN)
+
+    nodes: dict[str, list[int]] = {}
+    for ix, container in enumerate(containers):
+        nodes.setdefault(container.node_id, []).append(ix)
+    # first lanes of all the nodes, then their second lanes etc. (the executor's queue is worked on in this order)
+    lanes = [
+        lane
+        for k in range(CONTAINERS_OP_NODE_CONCURRENCY)
+        for ixs in nodes.values()
+        if (lane := ixs[k::CONTAINERS_OP_NODE_CONCURRENCY])
+    ]
+    for f in [containers_op_executor.submit(run_lane, lane) for lane in lanes]:
+        f.result()
+    return ContainersOpResponseDTO(
+        containers=[
+            ContainersOpResponseDTO.Item(container=container, error=error)
+            for container, error in zip(containers, errors)
+        ]
+    )
+
+
+@log_input_output
+def pause_apps(req: ContainersOpRequestDTO) -> ContainersOpResponseDTO:
+    return run_containers_op(jukeboxsvc.pause_container, req.containers)
+
+
+@log_input_output
+def stop_apps(req: ContainersOpRequestDTO) -> ContainersOpResponseDTO:
+    """Stops the containers, the ones not found are considered stopped already."""
+    return run_containers_op(stop_container, req.containers)
+
+
+def age_mode_of(dob: datetime.date) -> AgeMode:
+    age = relativedelta(datetime.datetime.now().date(), dob).years
     if age < 13:
-        age_mode = AgeMode.KID
+        return AgeMode.KID
     elif age < 18:
-        age_mode = AgeMode.TEEN
+        return AgeMode.TEEN
     else:
-        age_mode = AgeMode.ADULT
-    return age_mode
+        return AgeMode.ADULT
+
+
+def load_user_profile(user_id: int) -> UserProfile | None:
+    user = sqldb.session.query(UserDAO.dob, UserDAO.apps_lib).filter(UserDAO.id == user_id).first()
+    if not user:
+        return None
+    return UserProfile(
+        age_mode=age_mode_of(user.dob),
+        apps_lib=codec_for(AppsLib).load(user.apps_lib) if user.apps_lib else AppsLib(),
+    )
+
+
+def get_user_profile(user_id: int) -> UserProfile | None:
+    """User profile: memoized for the current request (the user row is fetched at most once per request) and cached
+    per worker for USER_PROFILE_CACHE_TTL seconds (see invalidate_user_profile)."""
+    memo: dict[int, UserProfile | None] | None = g.setdefault("user_profiles", {}) if has_app_context() else None
+    if memo is not None and user_id in memo:
+        return memo[user_id]
+    profile = user_profile_cache.get(user_id)
+    if profile is None:
+        profile = load_user_profile(user_id)
+        if profile is not None:
+            user_profile_cache.put(user_id, profile)
+    if memo is not None:
+        memo[user_id] = profile
+    return profile
+
+
+def invalidate_user_profile(user_id: int) -> None:
+    """To be called once the user's dob or apps library changes."""
+    user_profile_cache.invalidate(user_id)
+    if has_app_context():
+        g.setdefault("user_profiles", {}).pop(user_id, None)
+
+
+def get_age_mode(user_id: int | None) -> AgeMode:
+    if not user_id:
+        return DEFAULT_AGE_MODE
+    profile = get_user_profile(user_id)
+    return profile.age_mode if profile else DEFAULT_AGE_MODE
 
 
 def get_order_by(order_by: SearchAppsOrderBy | None) -> list:
@@ -356,127 +1158,607 @@ def get_order_by(order_by: SearchAppsOrderBy | None) -> list:
     elif order_by == SearchAppsOrderBy.YEAR_RELEASED:
         return [AppReleaseDAO.year_released.desc(), AppReleaseDAO.uuid.desc()]
     else:
-        return [AppReleaseDAO.name.asc()]
+        # uuid makes the order deterministic for releases sharing the same name
+        return [AppReleaseDAO.name.asc(), AppReleaseDAO.uuid.desc()]
 
 
 def search_apps_acl(req: SearchAppsAclRequestDTO) -> list[str]:
-    q_base = AppReleaseDAO.query
-    q_base = (
-        q_base.join(AppReleaseDAO.game)
-        .options(contains_eager(AppReleaseDAO.game))
-        .filter(age_mode_filter_expr(get_age_mode(req.user_id)))
-        .filter(AppReleaseDAO.is_visible.is_(True))
+    if SEARCH_ACL_ENGINE == "memory":
+        completions = completions_engine.get()
+        age_mode = get_age_mode(req.user_id)
+        if req.publisher_name:
+            return completions.publishers.complete(req.publisher_name, age_mode, APPS_ACL_SEARCH_LIMIT)
+        return completions.apps.complete(req.app_name or "", age_mode, APPS_ACL_SEARCH_LIMIT)
+    return list(sqldb.session.execute(search_apps_acl_query(req, get_age_mode(req.user_id))).scalars())
+
+
+def search_apps_acl_query(req: SearchAppsAclRequestDTO, age_mode: AgeMode) -> Select:
+    """Autocomplete statement of the "sql" engine: publisher names if requested, release names otherwise."""
+    if req.publisher_name:
+        elem = lateral(func.jsonb_array_elements(AppReleaseDAO.companies).table_valued("value")).alias("elem")
+        return (
+            select(AppCompanyDAO.name)
+            .distinct()
+            .select_from(AppReleaseDAO)
+            .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+            .join(elem, true())
+            .join(AppCompanyDAO, AppCompanyDAO.id == cast(elem.c.value.op("->>")("id"), Integer))
+            .where(
+                AppReleaseDAO.is_visible.is_(True),
+                age_mode_filter_expr(age_mode),
+                elem.c.value.op("->>")("publisher") == "true",
+                AppCompanyDAO.name.ilike(f"%{req.publisher_name}%"),
+            )
+            .order_by(AppCompanyDAO.name)
+            .limit(APPS_ACL_SEARCH_LIMIT)
+        )
+    q = (
+        select(AppReleaseDAO.name)
+        .select_from(AppReleaseDAO)
+        .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+        .where(age_mode_filter_expr(age_mode), AppReleaseDAO.is_visible.is_(True))
     )
     if req.app_name:
-        q_base = q_base.filter(AppReleaseDAO.name.ilike(f"%{req.app_name}%"))
-    res = [ar[0] for ar in q_base.with_entities(AppReleaseDAO.name).limit(APPS_ACL_SEARCH_LIMIT).all()]
-    return res
+        # uses releases_name_trgm_idx when available
+        q = q.where(AppReleaseDAO.name.ilike(f"%{req.app_name}%"))
+    return q.limit(APPS_ACL_SEARCH_LIMIT)
+
+
+def app_name_filter_expr(app_name: str) -> ColumnElement[bool]:
+    """Matches releases by release name, game name or game alternative names (case-insensitive substring)."""
+    app_name_mask = f"%{app_name}%"
+    if not SEARCH_TRGM_ENABLED:
+        return (
+            AppReleaseDAO.name.ilike(app_name_mask)
+            | AppDAO.name.ilike(app_name_mask)
+            | func.array_to_string(AppDAO.alternative_names, ",").ilike(app_name_mask)
+        )
+    # an OR spanning two joined tables can't be served by indexes, so match each table on its own trigram indexes
+    # (expressions must be the same as in migrations/0001_search_trgm.sql) and combine the resulting release ids
+    release_ids = union(
+        select(AppReleaseDAO.id).where(AppReleaseDAO.name.ilike(app_name_mask)),
+        select(AppReleaseDAO.id)
+        .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+        .where(
+            AppDAO.name.ilike(app_name_mask)
+            | func.games.immutable_array_to_string(AppDAO.alternative_names, ",").ilike(app_name_mask)
+        ),
+    )
+    return AppReleaseDAO.id.in_(release_ids)
+
+
+def search_query() -> Select:
+    """Base search query.
+
+    Selects only the columns SearchAppsResponseItem needs (jsonb values are extracted by the DB) and returns plain
+    rows instead of identity-mapped ORM entities.
+    """
+    return (
+        select(
+            func.coalesce(
+                AppReleaseDAO.media_assets["cover"]["image_id"].astext,
+                AppDAO.media_assets["cover"]["image_id"].astext,
+            ).label("cover_image_id"),
+            AppDAO.esrb_rating.label("esrb_rating"),
+            AppReleaseDAO.id.label("id"),
+            AppReleaseDAO.lang.label("lang"),
+            AppReleaseDAO.name.label("name"),
+            AppDAO.igdb["slug"].astext.label("slug"),
+            AppReleaseDAO.year_released.label("year_released"),
+            AppPlatformDAO.slug.label("platform"),
+            AppReleaseDAO.distro["format"].astext.label("distro_format"),
+            AppDAO.tags.label("tags"),
+        )
+        .select_from(AppReleaseDAO)
+        .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+        .join(AppPlatformDAO, AppReleaseDAO.platform_id == AppPlatformDAO.id)
+    )
+
+
+def encode_cursor(mode: str, keys: list) -> str:
+    """Opaque pagination cursor: sort keys of the last row of a page (or the next offset) along with the mode
+    (order_by or my_stuff type) they belong to."""
+    return base64.urlsafe_b64encode(json.dumps([mode, *keys], separators=(",", ":")).encode()).decode()
+
 
+def decode_cursor(cursor: str, mode: str, key_types: tuple[tuple[type, ...], ...]) -> list:
+    try:
+        cursor_mode, *keys = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        cursor_mode, keys = None, []
+    if (
+        cursor_mode != mode
+        or len(keys) != len(key_types)
+        or not all(isinstance(k, kt) and not isinstance(k, bool) for k, kt in zip(keys, key_types))
+    ):
+        raise ValidationError({"cursor": ["Invalid cursor."]})
+    return keys
+
+
+# order_by -> types of the sort keys kept in the cursor (see get_order_by)
+CURSOR_KEY_TYPES: dict[SearchAppsOrderBy, tuple[tuple[type, ...], ...]] = {
+    SearchAppsOrderBy.TS_ADDED: ((str,),),
+    SearchAppsOrderBy.YEAR_RELEASED: ((int, type(None)), (str,)),
+    SearchAppsOrderBy.NAME: ((str, type(None)), (str,)),
+}
+OFFSET_CURSOR_KEY_TYPES = ((int,),)
+
+
+def keyset_cursor(order_by: SearchAppsOrderBy, last: SearchAppsResponseItem | Row, uuid: str) -> str:
+    if order_by == SearchAppsOrderBy.TS_ADDED:
+        keys = [uuid]
+    elif order_by == SearchAppsOrderBy.YEAR_RELEASED:
+        keys = [last.year_released, uuid]
+    else:
+        keys = [last.name, uuid]
+    return encode_cursor(order_by.value, keys)
+
+
+def keyset_filter_expr(order_by: SearchAppsOrderBy, keys: list) -> ColumnElement[bool]:
+    """Matches releases following the one with the given sort keys in get_order_by(order_by) order.
+
+    Postgres puts nulls first in descending and last in ascending order.
+    """
+    *sort_keys, uuid = keys
+    uuid_after = AppReleaseDAO.uuid < uuid
+    if order_by == SearchAppsOrderBy.TS_ADDED:
+        return uuid_after
+    if order_by == SearchAppsOrderBy.YEAR_RELEASED:
+        year_released = sort_keys[0]
+        if year_released is None:
+            return AppReleaseDAO.year_released.is_not(None) | (AppReleaseDAO.year_released.is_(None) & uuid_after)
+        # row comparison is served by the (year_released desc, uuid desc) index
+        return tuple_(AppReleaseDAO.year_released, AppReleaseDAO.uuid) < tuple_(year_released, uuid)
+    name = sort_keys[0]
+    if name is None:
+        return AppReleaseDAO.name.is_(None) & uuid_after
+    return (
+        (AppReleaseDAO.name >= name) & ((AppReleaseDAO.name > name) | uuid_after)  # name >= bounds the index scan
+    ) | AppReleaseDAO.name.is_(None)
+
+
+SEARCH_ITEM_FIELDS = tuple(SearchAppsResponseItem.__dataclass_fields__)
+
+
+def make_search_item(r: Row) -> SearchAppsResponseItem:
+    return SearchAppsResponseItem(**{f: getattr(r, f) for f in SEARCH_ITEM_FIELDS})
+
+
+class SearchPage(t.NamedTuple):
+    """Statement fetching a page of search results (None: nothing to fetch), its rows -> response conversion and the
+    order of its rows (ORDER BY clauses of the statement)."""
+
+    q: Select | None
+    make_response: t.Callable[[t.Sequence[Row]], SearchAppsResponseDTO]
+    order_by: t.Sequence = ()
+
+
+EMPTY_SEARCH_PAGE = SearchPage(None, lambda rows: SearchAppsResponseDTO())
+
+
+def page_query(q: Select, req: SearchAppsRequestDTO) -> SearchPage:
+    """Page in get_order_by(req.order_by) order.
+
+    Pages requested with a cursor are fetched by seeking past the last row of the previous page instead of skipping
+    over offset rows, so deep pages cost the same as the first one.
+    """
+    order_by = req.order_by or SearchAppsOrderBy.NAME
+    limit = min(APPS_SEARCH_LIMIT, req.limit)
+    order_by_clauses = get_order_by(order_by)
+    q = q.add_columns(AppReleaseDAO.uuid.label("uuid")).order_by(*order_by_clauses).limit(limit)
+    if req.cursor:
+        q = q.where(keyset_filter_expr(order_by, decode_cursor(req.cursor, order_by.value, CURSOR_KEY_TYPES[order_by])))
+    else:
+        q = q.offset(req.offset)
+
+    def make_response(rows: t.Sequence[Row]) -> SearchAppsResponseDTO:
+        return SearchAppsResponseDTO(
+            apps=[make_search_item(r) for r in rows],
+            next_cursor=keyset_cursor(order_by, rows[-1], rows[-1].uuid) if rows and len(rows) == limit else None,
+        )
 
-def search_by_app_name(req: SearchAppsRequestDTO) -> list[AppReleaseDAO]:
-    app_name_mask = f"%{req.app_name}%"
-    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
-    q = q.filter(
+    return SearchPage(q, make_response, order_by_clauses)
+
+
+def offset_page_query(q: Select, req: SearchAppsRequestDTO, order_by: list, mode: str) -> SearchPage:
+    """Page in an order not backed by sort keys (e.g. user's own lists): cursor just keeps the offset."""
+    limit = min(APPS_SEARCH_LIMIT, req.limit)
+    offset = decode_cursor(req.cursor, mode, OFFSET_CURSOR_KEY_TYPES)[0] if req.cursor else req.offset
+    q = q.add_columns(AppReleaseDAO.uuid.label("uuid")).order_by(*order_by).offset(offset).limit(limit)
+
+    def make_response(rows: t.Sequence[Row]) -> SearchAppsResponseDTO:
+        return SearchAppsResponseDTO(
+            apps=[make_search_item(r) for r in rows],
+            next_cursor=encode_cursor(mode, [offset + limit]) if len(rows) == limit else None,
+        )
+
+    return SearchPage(q, make_response, order_by)
+
+
+def fetch_page(page: SearchPage) -> SearchAppsResponseDTO:
+    return page.make_response(sqldb.session.execute(page.q).all() if page.q is not None else [])
+
+
+def fetch_pages(pages: t.Sequence[SearchPage]) -> list[SearchAppsResponseDTO]:
+    """Fetches several pages with a single statement: UNION ALL of the page statements, each row tagged with its
+    page index and its position in the page."""
+    queries = [(ix, page) for ix, page in enumerate(pages) if page.q is not None]
+    if len(queries) <= 1:
+        return [fetch_page(page) for page in pages]
+    members = []
+    for ix, page in queries:
+        # numbered in the page query itself: the order of a subquery is not kept by the outer select and UNION ALL
+        page_rows = page.q.add_columns(func.row_number().over(order_by=page.order_by).label("pos")).subquery()
+        members.append(select(literal(ix).label("section"), *page_rows.c).select_from(page_rows))
+    rows: dict[int, list[Row]] = {ix: [] for ix in range(len(pages))}
+    for r in sqldb.session.execute(union_all(*members).order_by(literal_column("section"), literal_column("pos"))):
+        rows[r.section].append(r)
+    return [page.make_response(rows[ix]) for ix, page in enumerate(pages)]
+
+
+def search_by_app_name(req: SearchAppsRequestDTO) -> SearchPage:
+    q = search_query().where(
         AppReleaseDAO.is_visible.is_(True),
         age_mode_filter_expr(get_age_mode(req.user_id)),
-        AppReleaseDAO.name.ilike(app_name_mask)
-        | AppDAO.name.ilike(app_name_mask)
-        | func.array_to_string(AppDAO.alternative_names, ",").ilike(app_name_mask),
+        app_name_filter_expr(req.app_name),
     )
-    return q.order_by(*get_order_by(req.order_by)).offset(req.offset).limit(min(APPS_SEARCH_LIMIT, req.limit)).all()
+    return page_query(q, req)
 
 
-def search_by_publisher(req: SearchAppsRequestDTO) -> list[AppReleaseDAO]:
-    company_mask = f"%{req.publisher_name}%"
+def publisher_index_query() -> Select:
+    """(release id, publisher name) pairs of the visible releases."""
     elem = lateral(func.jsonb_array_elements(AppReleaseDAO.companies).table_valued("value")).alias("elem")
-    elem_company_id_txt = elem.c.value.op("->>")("id")
-    elem_is_publisher_txt = elem.c.value.op("->>")("publisher")
-    publisher_exists = exists(
-        select(1)
-        .select_from(elem)
-        .join(AppCompanyDAO, AppCompanyDAO.id == cast(elem_company_id_txt, Integer))
-        .where(elem_is_publisher_txt == "true")
-        .where(AppCompanyDAO.name.ilike(company_mask))
-        .correlate(AppReleaseDAO)
+    return (
+        select(AppReleaseDAO.id, AppCompanyDAO.name)
+        .select_from(AppReleaseDAO)
+        .join(elem, true())
+        .join(AppCompanyDAO, AppCompanyDAO.id == cast(elem.c.value.op("->>")("id"), Integer))
+        .where(AppReleaseDAO.is_visible.is_(True), elem.c.value.op("->>")("publisher") == "true")
+    )
+
+
+def load_publisher_index() -> PublisherIndex:
+    return PublisherIndex([tuple(r) for r in sqldb.session.execute(publisher_index_query()).all()])
+
+
+# refreshed along with the catalog (same interval)
+publisher_index_engine = CatalogEngine(load_publisher_index, CATALOG_REFRESH_INTERVAL)
+stats.register("publisher_index", publisher_index_engine.stats)
+
+
+def favorites_counts_query() -> Select:
+    """(release id, number of users having it in favorites) pairs."""
+    fav = lateral(func.jsonb_array_elements_text(UserDAO.apps_lib["favorite_games"]).table_valued("value")).alias("fav")
+    release_id = cast(fav.c.value, BigInteger)
+    return (
+        select(release_id.label("release_id"), func.count().label("favorites"))  # pylint: disable=not-callable
+        .select_from(UserDAO)
+        .join(fav, true())
+        .where(func.jsonb_typeof(UserDAO.apps_lib["favorite_games"]) == "array")
+        .group_by(release_id)
     )
-    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
-    q = q.filter(AppReleaseDAO.is_visible.is_(True))
-    q = q.filter(publisher_exists)
-    q = q.filter(age_mode_filter_expr(get_age_mode(req.user_id)))
 
-    return q.order_by(*get_order_by(req.order_by)).offset(req.offset).limit(min(APPS_SEARCH_LIMIT, req.limit)).all()
+
+# per-worker, a single entry (see get_favorites_counts)
+favorites_counts_cache: TTLCache[str, dict[int, int]] = TTLCache(1, FAVORITES_COUNTS_TTL)
+stats.register("favorites_counts_cache", favorites_counts_cache.stats)
 
 
-def search_by_lang(req: SearchAppsRequestDTO) -> list[AppReleaseDAO]:
-    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
-    q = q.filter(
+def get_favorites_counts() -> dict[int, int]:
+    """Release id -> number of users having it in favorites (cached for FAVORITES_COUNTS_TTL)."""
+    counts = favorites_counts_cache.get("all")
+    if counts is None:
+        counts = {r.release_id: r.favorites for r in sqldb.session.execute(favorites_counts_query())}
+        favorites_counts_cache.put("all", counts)
+    return counts
+
+
+def completions_query() -> Select:
+    """Names of the visible releases (release, game and alternative names) along with their age modes."""
+    return (
+        select(
+            AppReleaseDAO.id,
+            AppReleaseDAO.name,
+            AppDAO.name.label("game_name"),
+            AppDAO.alternative_names,
+            func.coalesce(age_mode_filter_expr(AgeMode.KID), False).label("is_kid"),
+            func.coalesce(age_mode_filter_expr(AgeMode.TEEN), False).label("is_teen"),
+        )
+        .select_from(AppReleaseDAO)
+        .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+        .where(AppReleaseDAO.is_visible.is_(True))
+    )
+
+
+def load_completions() -> Completions:
+    favorites = get_favorites_counts()
+    release_age_modes: dict[int, set[AgeMode]] = {}
+    app_entries = []
+    for r in sqldb.session.execute(completions_query()):
+        age_modes = {AgeMode.ADULT, *([AgeMode.KID] if r.is_kid else []), *([AgeMode.TEEN] if r.is_teen else [])}
+        release_age_modes[r.id] = age_modes
+        for name in (r.name, r.game_name, *(r.alternative_names or [])):
+            if name:
+                app_entries.append(AutocompleteEntry(name, age_modes, favorites.get(r.id, 0)))
+    # publisher is allowed in the age modes of any of its releases, its popularity is the one of all its releases
+    publishers: dict[str, AutocompleteEntry] = {}
+    for release_id, name in sqldb.session.execute(publisher_index_query()):
+        if not name or release_id not in release_age_modes:
+            continue
+        entry = publishers.setdefault(name, AutocompleteEntry(name, set(), 0))
+        entry.age_modes |= release_age_modes[release_id]
+        entry.popularity += favorites.get(release_id, 0)
+    return Completions(apps=Autocomplete(app_entries), publishers=Autocomplete(publishers.values()))
+
+
+# rebuilt in the background along with the catalog (same interval)
+completions_engine = CatalogEngine(load_completions, CATALOG_REFRESH_INTERVAL)
+stats.register("completions", completions_engine.stats)
+
+
+def search_by_publisher(req: SearchAppsRequestDTO) -> SearchPage:
+    if SEARCH_PUBLISHER_INDEX_ENABLED:
+        # company names are matched in memory, the DB only filters and orders the matching releases
+        release_ids = publisher_index_engine.get().match(req.publisher_name)
+        if not release_ids:
+            return EMPTY_SEARCH_PAGE
+        publisher_filter = AppReleaseDAO.id == any_(cast(sorted(release_ids), ARRAY(BigInteger)))
+    else:
+        company_mask = f"%{req.publisher_name}%"
+        elem = lateral(func.jsonb_array_elements(AppReleaseDAO.companies).table_valued("value")).alias("elem")
+        elem_company_id_txt = elem.c.value.op("->>")("id")
+        elem_is_publisher_txt = elem.c.value.op("->>")("publisher")
+        publisher_filter = exists(
+            select(1)
+            .select_from(elem)
+            .join(AppCompanyDAO, AppCompanyDAO.id == cast(elem_company_id_txt, Integer))
+            .where(elem_is_publisher_txt == "true")
+            .where(AppCompanyDAO.name.ilike(company_mask))
+            .correlate(AppReleaseDAO)
+        )
+    q = search_query().where(
+        AppReleaseDAO.is_visible.is_(True),
+        publisher_filter,
+        age_mode_filter_expr(get_age_mode(req.user_id)),
+    )
+    return page_query(q, req)
+
+
+def search_by_lang(req: SearchAppsRequestDTO) -> SearchPage:
+    q = search_query().where(
         AppReleaseDAO.is_visible.is_(True),
         age_mode_filter_expr(get_age_mode(req.user_id)),
         AppReleaseDAO.lang == req.lang,
     )
-    return q.order_by(*get_order_by(req.order_by)).offset(req.offset).limit(min(APPS_SEARCH_LIMIT, req.limit)).all()
+    return page_query(q, req)
 
 
-def search_by_my_stuff(req: SearchAppsRequestDTO) -> list[AppReleaseDAO]:
-    user = sqldb.session.query(UserDAO).filter(UserDAO.id == req.user_id).first()
-    if not user or not user.apps_lib:
-        return []
-    apps_lib: AppsLib = AppsLib.Schema().load(user.apps_lib)
+def search_by_my_stuff(req: SearchAppsRequestDTO) -> SearchPage:
+    profile = get_user_profile(req.user_id) if req.user_id else None
+    if not profile:
+        return EMPTY_SEARCH_PAGE
+    apps_lib = profile.apps_lib
     if req.my_stuff == MyStuffType.FAVORITES:
         release_ids = apps_lib.favorite_games
     elif req.my_stuff == MyStuffType.RECENTLY_PLAYED:
         release_ids = apps_lib.recently_played_games
     else:
-        return []
+        return EMPTY_SEARCH_PAGE
     if not release_ids:
-        return []
-    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
-    q = q.filter(
+        return EMPTY_SEARCH_PAGE
+    q = search_query().where(
         AppReleaseDAO.is_visible.is_(True),
         age_mode_filter_expr(get_age_mode(req.user_id)),
         AppReleaseDAO.id.in_(release_ids),
     )
     if req.my_stuff == MyStuffType.FAVORITES:
-        order_by = [AppReleaseDAO.name.asc()]
+        order_by = [AppReleaseDAO.name.asc(), AppReleaseDAO.uuid.desc()]
     else:
         # preserve the order of ids in recently_played_games
         order_by = [func.array_position(cast(release_ids, ARRAY(BigInteger)), AppReleaseDAO.id)]
-    return q.order_by(*order_by).offset(req.offset).limit(min(APPS_SEARCH_LIMIT, req.limit)).all()
+    return offset_page_query(q, req, order_by, req.my_stuff.value)
+
+
+def search_all(req: SearchAppsRequestDTO) -> SearchPage:
+    q = search_query().where(
+        AppReleaseDAO.is_visible.is_(True),
+        age_mode_filter_expr(get_age_mode(req.user_id)),
+    )
+    return page_query(q, req)
+
 
+def catalog_query() -> Select:
+    """Visible releases along with everything the in-memory catalog filters and sorts on.
+
+    Age modes and orderings are computed by the DB with the same expressions the SQL search path uses.
+    """
+    return (
+        search_query()
+        .add_columns(
+            AppReleaseDAO.uuid.label("uuid"),
+            AppDAO.name.label("game_name"),
+            func.array_to_string(AppDAO.alternative_names, ",").label("alternative_names"),
+            AppDAO.genres.label("genres"),
+            func.coalesce(age_mode_filter_expr(AgeMode.KID), False).label("is_kid"),
+            func.coalesce(age_mode_filter_expr(AgeMode.TEEN), False).label("is_teen"),
+            *[
+                func.row_number().over(order_by=get_order_by(order_by)).label(f"rank_{order_by.value}")
+                for order_by in SearchAppsOrderBy
+            ],
+        )
+        .where(AppReleaseDAO.is_visible.is_(True))
+        .order_by(*get_order_by(SearchAppsOrderBy.TS_ADDED))
+    )
+
+
+def load_catalog() -> Catalog:
+    return Catalog(sqldb.session.execute(catalog_query()).all())
 
-def search_all(req: SearchAppsRequestDTO) -> list[AppReleaseDAO]:
-    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
-    q = q.filter(AppReleaseDAO.is_visible.is_(True))
-    q = q.filter(age_mode_filter_expr(get_age_mode(req.user_id)))
-    return q.order_by(*get_order_by(req.order_by)).offset(req.offset).limit(min(APPS_SEARCH_LIMIT, req.limit)).all()
 
+catalog_engine = CatalogEngine(load_catalog, CATALOG_REFRESH_INTERVAL)
+stats.register("catalog", catalog_engine.stats)
 
-def search_apps(req: SearchAppsRequestDTO) -> list[SearchAppsResponseItem]:
-    res: list[AppReleaseDAO]
+
+def is_catalog_search(req: SearchAppsRequestDTO) -> bool:
+    """Whether the request resolves to a search the in-memory catalog can serve (see search_apps)."""
     if req.app_name:
-        res = search_by_app_name(req)
+        return True
+    if req.publisher_name:
+        return SEARCH_PUBLISHER_INDEX_ENABLED
+    return bool(req.lang) or not req.my_stuff
+
+
+def search_catalog(req: SearchAppsRequestDTO) -> SearchAppsResponseDTO | None:
+    """Same as fetch_page(...) of search_by_app_name / search_by_publisher / search_by_lang / search_all, served by
+    the in-memory catalog.
+
+    Returns None when the cursor points at a release missing from the catalog snapshot (e.g. hidden since).
+    """
+    catalog = catalog_engine.get()
+    order_by = req.order_by or SearchAppsOrderBy.NAME
+    limit = min(APPS_SEARCH_LIMIT, req.limit)
+    offset, after = req.offset, 0
+    if req.cursor:
+        keys = decode_cursor(req.cursor, order_by.value, CURSOR_KEY_TYPES[order_by])
+        ix = catalog.uuid_ixs.get(keys[-1])
+        if ix is None:
+            return None
+        offset, after = 0, catalog.ranks[order_by][ix]
+    mask = search_mask(catalog, req)
+    ixs = catalog.page(mask, order_by=order_by, offset=offset, limit=limit, after=after)
+    res = SearchAppsResponseDTO(
+        apps=[catalog.items[ix] for ix in ixs],
+        next_cursor=(
+            keyset_cursor(order_by, catalog.items[ixs[-1]], catalog.uuids[ixs[-1]])
+            if ixs and len(ixs) == limit
+            else None
+        ),
+    )
+    if req.facets:
+        res.total, res.facets = mask.bit_count(), make_facets(catalog, mask)
+    return res
+
+
+def search_mask(catalog: Catalog, req: SearchAppsRequestDTO) -> int:
+    """Catalog rows matching the search (any search, see search_apps_uncached), regardless of pagination."""
+    release_ids: t.Iterable[int] | None = None
+    if req.publisher_name and not req.app_name:
+        release_ids = publisher_index_engine.get().match(req.publisher_name)
+    elif is_my_stuff_search(req):
+        profile = get_user_profile(req.user_id) if req.user_id else None
+        apps_lib = profile.apps_lib if profile else AppsLib()
+        if req.my_stuff == MyStuffType.FAVORITES:
+            release_ids = apps_lib.favorite_games
+        elif req.my_stuff == MyStuffType.RECENTLY_PLAYED:
+            release_ids = apps_lib.recently_played_games
+        else:
+            release_ids = []
+    return catalog.mask(get_age_mode(req.user_id), app_name=req.app_name, lang=req.lang, release_ids=release_ids)
+
+
+def make_facets(catalog: Catalog, mask: int) -> SearchFacets:
+    counts, approximate = catalog.facet_counts(mask, SEARCH_FACETS_EXACT_LIMIT)
+    return SearchFacets(**counts, approximate=approximate)
+
+
+def with_facets(req: SearchAppsRequestDTO, res: SearchAppsResponseDTO) -> SearchAppsResponseDTO:
+    """Adds total and facets (when requested) of a search served by the DB: they come from the in-memory catalog, so
+    the DB doesn't have to scan all the results again."""
+    if req.facets and res.facets is None:
+        catalog = catalog_engine.get()
+        mask = search_mask(catalog, req)
+        res.total, res.facets = mask.bit_count(), make_facets(catalog, mask)
+    return res
+
+
+def is_my_stuff_search(req: SearchAppsRequestDTO) -> bool:
+    """Whether the request resolves to search_by_my_stuff (see search_apps_uncached)."""
+    return bool(req.my_stuff) and not (req.app_name or req.publisher_name or req.lang)
+
+
+def search_cache_key(req: SearchAppsRequestDTO, age_mode: AgeMode) -> tuple:
+    """Normalized request: users in the same age mode share results, fields the search ignores are dropped."""
+    if req.app_name:
+        filters: tuple = ("app_name", req.app_name.lower())
+    elif req.publisher_name:
+        filters = ("publisher_name", req.publisher_name.lower())
+    elif req.lang:
+        filters = ("lang", req.lang)
+    else:
+        filters = ("all",)
+    return (
+        *filters,
+        age_mode,
+        req.order_by or SearchAppsOrderBy.NAME,
+        0 if req.cursor else max(req.offset, 0),
+        min(APPS_SEARCH_LIMIT, req.limit),
+        req.cursor,
+        req.facets,
+    )
+
+
+def search_page(req: SearchAppsRequestDTO) -> SearchPage:
+    if req.app_name:
+        return search_by_app_name(req)
     elif req.publisher_name:
-        res = search_by_publisher(req)
+        return search_by_publisher(req)
     elif req.lang:
-        res = search_by_lang(req)
+        return search_by_lang(req)
     elif req.my_stuff:
-        res = search_by_my_stuff(req)
+        return search_by_my_stuff(req)
     else:
-        res = search_all(req)
-    return [
-        SearchAppsResponseItem(
-            cover_image_id=(
-                r.media_assets["cover"]["image_id"] if r.media_assets else r.game.media_assets["cover"]["image_id"]
-            ),
-            esrb_rating=r.game.esrb_rating,
-            id=r.id,
-            lang=r.lang,
-            name=r.name,
-            slug=r.game.igdb["slug"],
-            year_released=r.year_released,
-            platform=r.platform.slug,
-            distro_format=r.distro["format"],
-            tags=r.game.tags,
-        )
-        for r in res
-    ]
+        return search_all(req)
+
+
+def search_apps_uncached(req: SearchAppsRequestDTO) -> SearchAppsResponseDTO:
+    if SEARCH_ENGINE == "memory" and is_catalog_search(req):
+        res = search_catalog(req)
+        if res is not None:
+            return res
+    return with_facets(req, fetch_page(search_page(req)))
+
+
+def search_apps(req: SearchAppsRequestDTO) -> SearchAppsResponseDTO:
+    """Search results are cached per age mode (but the user's own lists) and concurrent identical searches run once."""
+    if is_my_stuff_search(req):
+        return search_apps_uncached(req)
+    key = search_cache_key(req, get_age_mode(req.user_id))
+    res = search_result_cache.get(key)
+    if res is not None:
+        return res
+
+    def search() -> SearchAppsResponseDTO:
+        res = search_apps_uncached(req)
+        search_result_cache.put(key, res)
+        return res
+
+    return search_flight.do(key, search)
+
+
+def search_apps_batch(req: SearchAppsBatchRequestDTO) -> list[SearchAppsResponseDTO]:
+    """Searches all sections on behalf of req.user_id (user ids of the sections are ignored).
+
+    The user is resolved once, sections are served from the result cache or the in-memory catalog when possible and
+    the rest are fetched with a single statement.
+    """
+    sections = [dataclasses.replace(section, user_id=req.user_id) for section in req.sections]
+    age_mode = get_age_mode(req.user_id)
+    res: dict[int, SearchAppsResponseDTO] = {}
+    keys: dict[int, tuple] = {}
+    pending: list[int] = []
+    for ix, section in enumerate(sections):
+        found: SearchAppsResponseDTO | None = None
+        if not is_my_stuff_search(section):
+            keys[ix] = search_cache_key(section, age_mode)
+            found = search_result_cache.get(keys[ix])
+        if found is None and SEARCH_ENGINE == "memory" and is_catalog_search(section):
+            found = search_catalog(section)
+        if found is None:
+            pending.append(ix)
+        else:
+            res[ix] = found
+    for ix, page_res in zip(pending, fetch_pages([search_page(sections[ix]) for ix in pending])):
+        res[ix] = with_facets(sections[ix], page_res)
+    for ix, key in keys.items():
+        search_result_cache.put(key, res[ix])
+    return [res[ix] for ix in range(len(sections))]
@@ -0,0 +1,131 @@
+"""In-memory autocomplete over release and publisher names.
+
+Completions are ranked by match kind first (a word of the completion starts with the query, then the query is found
+anywhere inside of it) and by popularity second. Entries get their ids in rank order (most popular first), so every
+posting list below is sorted by rank and the best matches are found by walking postings from the start and stopping
+as soon as `limit` of them pass the age mode filter:
+
+- word prefixes: a trie of the first PREFIX_TRIE_DEPTH characters of every word (node -> postings), longer prefixes
+  are looked up in a sorted array of word suffixes (bisect);
+- infixes: n-gram (2-, 3-grams) postings, candidates are verified with a substring check.
+"""
+
+import re
+import time
+import typing as t
+from array import array
+from bisect import bisect_left
+from dataclasses import (
+    dataclass,
+    field,
+)
+
+from appsvc.biz.dto import AgeMode
+
+PREFIX_TRIE_DEPTH = 3
+WORD_START = re.compile(r"(?:^|(?<=[^\w']))\w", re.UNICODE)
+AGE_MODE_BITS = {AgeMode.KID: 1, AgeMode.TEEN: 2, AgeMode.ADULT: 4}
+
+
+@dataclass
+class AutocompleteEntry:
+    text: str
+    age_modes: set[AgeMode] = field(default_factory=lambda: {AgeMode.ADULT})
+    popularity: int = 0
+
+
+def word_starts(key: str) -> list[int]:
+    return [m.start() for m in WORD_START.finditer(key)]
+
+
+class Autocomplete:
+    def __init__(self, entries: t.Iterable[AutocompleteEntry]) -> None:
+        # merge entries differing in case only (e.g. same alternative name of several games)
+        merged: dict[str, AutocompleteEntry] = {}
+        for e in entries:
+            key = e.text.strip().lower()
+            if not key:
+                continue
+            m = merged.get(key)
+            if m is None:
+                merged[key] = AutocompleteEntry(e.text.strip(), set(e.age_modes), e.popularity)
+            else:
+                m.age_modes |= e.age_modes
+                m.popularity = max(m.popularity, e.popularity)
+        ranked = sorted(merged.items(), key=lambda kv: (-kv[1].popularity, len(kv[0]), kv[0]))
+        self.size = len(ranked)
+        self.keys = [key for key, _ in ranked]
+        self.texts = [e.text for _, e in ranked]
+        self.age_modes = bytes(sum(AGE_MODE_BITS[m] for m in e.age_modes) for _, e in ranked)
+
+        trie: dict[str, list[int]] = {}
+        suffixes: list[tuple[str, int]] = []
+        grams: dict[str, list[int]] = {}
+        for ix, key in enumerate(self.keys):
+            prefixes = set()
+            for start in word_starts(key):
+                suffix = key[start:]
+                suffixes.append((suffix, ix))
+                prefixes.update(suffix[:depth] for depth in range(1, PREFIX_TRIE_DEPTH + 1))
+            for prefix in prefixes:
+                trie.setdefault(prefix, []).append(ix)
+            for gram in {key[i : i + n] for n in (2, 3) for i in range(len(key) - n + 1)}:
+                grams.setdefault(gram, []).append(ix)
+        # ids are appended in ascending order, so postings are sorted by rank already
+        self.trie = {prefix: array("l", ixs) for prefix, ixs in trie.items()}
+        suffixes.sort()
+        self.suffixes = [s for s, _ in suffixes]
+        self.suffix_ixs = array("l", (ix for _, ix in suffixes))
+        self.grams = {gram: array("l", ixs) for gram, ixs in grams.items()}
+
+    def _prefix_matches(self, query: str) -> t.Iterable[int]:
+        """Ids (rank order, may repeat) of the entries with a word starting with query."""
+        if len(query) <= PREFIX_TRIE_DEPTH:
+            return self.trie.get(query, ())
+        lo = bisect_left(self.suffixes, query)
+        hi = bisect_left(self.suffixes, query + "\U0010ffff", lo)
+        return sorted(self.suffix_ixs[lo:hi])
+
+    def _infix_candidates(self, query: str) -> t.Iterable[int]:
+        """Ids (rank order) of the entries which may contain query (to be verified)."""
+        n = 3 if len(query) >= 3 else 2
+        postings = [self.grams.get(query[i : i + n], ()) for i in range(len(query) - n + 1)]
+        return min(postings, key=len) if postings else range(self.size)
+
+    def complete(self, query: str, age_mode: AgeMode, limit: int) -> list[str]:
+        query = query.strip().lower()
+        if limit <= 0:
+            return []
+        age_mode_bit = AGE_MODE_BITS[age_mode]
+        age_modes = self.age_modes
+        res: list[int] = []
+        seen: set[int] = set()
+        if not query:
+            candidates: t.Iterable[int] = range(self.size)
+        else:
+            candidates = self._prefix_matches(query)
+        for ix in candidates:
+            if age_modes[ix] & age_mode_bit and ix not in seen:
+                seen.add(ix)
+                res.append(ix)
+                if len(res) == limit:
+                    return [self.texts[ix] for ix in res]
+        if query:
+            keys = self.keys
+            for ix in self._infix_candidates(query):
+                if age_modes[ix] & age_mode_bit and ix not in seen and query in keys[ix]:
+                    seen.add(ix)
+                    res.append(ix)
+                    if len(res) == limit:
+                        break
+        return [self.texts[ix] for ix in res]
+
+
+class Completions:
+    """Snapshot of release name and publisher name completions (see CatalogEngine)."""
+
+    def __init__(self, apps: Autocomplete, publishers: Autocomplete) -> None:
+        self.apps = apps
+        self.publishers = publishers
+        self.size = apps.size + publishers.size
+        self.loaded_at = time.monotonic()
@@ -0,0 +1,142 @@
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+K = t.TypeVar("K", bound=t.Hashable)
+V = t.TypeVar("V")
+
+
+class TTLCache(t.Generic[K, V]):
+    """Thread-safe in-process LRU cache with per-entry TTL.
+
+    An entry may be reachable through several keys (e.g. release id and release uuid): the primary key is used for
+    LRU bookkeeping and size accounting, aliases just point at it and go away along with the entry.
+    """
+
+    def __init__(self, max_size: int, ttl: float, timer: t.Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float, V, tuple[K, ...]]] = OrderedDict()
+        self._aliases: dict[K, K] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: K) -> t.Optional[V]:
+        with self._lock:
+            key = self._aliases.get(key, key)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at <= self._timer():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V, aliases: t.Iterable[K] = ()) -> None:
+        if self.max_size <= 0:
+            return
+        aliases = tuple(a for a in aliases if a != key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            for alias in aliases:
+                # alias may point at a different (stale) entry
+                if alias in self._aliases:
+                    self._remove(self._aliases[alias])
+            self._entries[key] = (self._timer() + self.ttl, value, aliases)
+            for alias in aliases:
+                self._aliases[alias] = key
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        with self._lock:
+            key = self._aliases.get(key, key)
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key: K) -> None:
+        _, _, aliases = self._entries.pop(key)
+        for alias in aliases:
+            if self._aliases.get(alias) == key:
+                del self._aliases[alias]
+
+
+class _Call(t.Generic[V]):
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: V | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(t.Generic[K, V]):
+    """Coalesces concurrent calls with the same key: the first caller runs fn, the others wait for and share its
+    result (or exception)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[K, _Call[V]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: K, fn: t.Callable[[], V]) -> V:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return t.cast(V, call.result)
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,414 @@
+"""In-memory columnar catalog of visible app releases.
+
+Catalog is loaded from the DB as a snapshot: every visible release becomes a row index, filterable attributes are kept
+as bitsets (python ints, bit i == row i) and orderings as permutation arrays, so searches are answered with a few
+bitwise ANDs and a walk over the permutation, without any DB work.
+"""
+
+import logging
+import re
+import threading
+import time
+import typing as t
+from array import array
+from bisect import bisect_right
+from itertools import islice
+
+from flask import (
+    Flask,
+    current_app,
+)
+
+from appsvc.biz.dto import (
+    AgeMode,
+    SearchAppsOrderBy,
+    SearchAppsResponseItem,
+)
+
+# separates names of a release inside of the names blob (can't be a part of a search string)
+NAMES_SEP = "\x00"
+# separates releases inside of the names blob
+ROWS_SEP = "\n"
+NON_ZERO_BYTE = re.compile(b"[^\x00]")
+# approximate facet counts are estimated from every sample_stride-th row (about FACETS_SAMPLE_SIZE of them)
+FACETS_SAMPLE_SIZE = 4096
+# byte -> "1" if its lowest bit is set else "0"
+LOWEST_BIT_CHAR = bytes(ord("0") + (b & 1) for b in range(256))
+# facet -> values of a row
+FACET_VALUES: dict[str, t.Callable[["CatalogRow"], t.Iterable[str]]] = {
+    "lang": lambda r: [r.lang],
+    "platform": lambda r: [r.platform],
+    "decade": lambda r: [] if r.year_released is None else [str(r.year_released // 10 * 10)],
+    "distro_format": lambda r: [r.distro_format],
+    "tags": lambda r: r.tags or [],
+}
+
+log = logging.getLogger("appsvc")
+
+
+class CatalogRow(t.Protocol):
+    """Catalog row as loaded from the DB (see appsvc.biz.app.catalog_query)."""
+
+    cover_image_id: str
+    esrb_rating: int | None
+    id: int
+    lang: str
+    name: str
+    slug: str
+    year_released: int | None
+    platform: str
+    distro_format: str
+    tags: list[str] | None
+    uuid: str
+    game_name: str | None
+    alternative_names: str | None  # comma-separated
+    genres: list[int] | None
+    is_kid: bool
+    is_teen: bool
+    rank_ts_added: int
+    rank_year_released: int
+    rank_name: int
+
+
+def ilike_regex(pattern: str) -> re.Pattern:
+    """SQL (i)like pattern -> regex matching within a single name."""
+    res = []
+    for c in pattern:
+        if c == "%":
+            res.append(f"[^{ROWS_SEP}{NAMES_SEP}]*")
+        elif c == "_":
+            res.append(f"[^{ROWS_SEP}{NAMES_SEP}]")
+        else:
+            res.append(re.escape(c))
+    return re.compile("".join(res))
+
+
+def bitset(ixs: t.Iterable[int], size: int) -> int:
+    """Row indices -> bitset (built in a buffer: or-ing bits into a big int one by one is O(size) per bit)."""
+    buf = bytearray((size + 7) // 8)
+    for ix in ixs:
+        buf[ix >> 3] |= 1 << (ix & 7)
+    return int.from_bytes(buf, "little")
+
+
+class Catalog:
+    """Immutable snapshot of the visible catalog."""
+
+    def __init__(self, rows: t.Sequence[CatalogRow]) -> None:
+        self.size = len(rows)
+        self.loaded_at = time.monotonic()
+        self.items = [
+            SearchAppsResponseItem(
+                cover_image_id=r.cover_image_id,
+                esrb_rating=r.esrb_rating,
+                id=r.id,
+                lang=r.lang,
+                name=r.name,
+                slug=r.slug,
+                year_released=r.year_released,
+                platform=r.platform,
+                distro_format=r.distro_format,
+                tags=r.tags,
+            )
+            for r in rows
+        ]
+        self.ids = array("q", (r.id for r in rows))
+        self.uuids = [r.uuid for r in rows]
+        self.uuid_ixs = {u: ix for ix, u in enumerate(self.uuids)}
+        self.id_ixs = {id_: ix for ix, id_ in enumerate(self.ids)}
+        self.years = array("l", (-1 if r.year_released is None else r.year_released for r in rows))
+
+        # names of all releases in a single lowercased blob: substring search is a single C-level scan
+        self.names = [
+            NAMES_SEP.join((r.name or "", r.game_name or "", r.alternative_names or "")).lower() for r in rows
+        ]
+        self.names_blob = ROWS_SEP.join(self.names)
+        self.names_offsets = []
+        offset = 0
+        for n in self.names:
+            self.names_offsets.append(offset)
+            offset += len(n) + len(ROWS_SEP)
+
+        self.all = (1 << self.size) - 1
+        self.age_modes = {
+            AgeMode.KID: bitset((ix for ix, r in enumerate(rows) if r.is_kid), self.size),
+            AgeMode.TEEN: bitset((ix for ix, r in enumerate(rows) if r.is_teen), self.size),
+            AgeMode.ADULT: self.all,
+        }
+        self.esrb_ratings = self._group(rows, lambda r: [r.esrb_rating])
+        self.genres = self._group(rows, lambda r: r.genres or [])
+
+        # facet -> value -> bitset of rows having it; the same over the sampled rows (bit i == sample row i)
+        # whole bytes, so sampled bits are the lowest bits of every (sample_stride // 8)-th byte
+        self.sample_stride = 1 if self.size <= FACETS_SAMPLE_SIZE else -(-self.size // (FACETS_SAMPLE_SIZE * 8)) * 8
+        self.sample_size = -(-self.size // self.sample_stride)
+        self.facets: dict[str, dict[str, int]] = {}
+        self.sample_facets: dict[str, dict[str, int]] = {}
+        for facet, values in FACET_VALUES.items():
+            groups = self._group_ixs(rows, values)
+            self.facets[facet] = {v: bitset(ixs, self.size) for v, ixs in groups.items()}
+            self.sample_facets[facet] = {
+                v: bitset((ix // self.sample_stride for ix in ixs if ix % self.sample_stride == 0), self.sample_size)
+                for v, ixs in groups.items()
+            }
+        self.langs = self.facets["lang"]
+        self.platforms = self.facets["platform"]
+        self.tags = self.facets["tags"]
+        # facets of unfiltered searches (search_all) are the most common ones
+        self.age_mode_facets = {age_mode: self._facet_counts(mask) for age_mode, mask in self.age_modes.items()}
+
+        # permutations: order_by -> row indices in the result order; ranks: order_by -> row index -> position
+        self.ranks: dict[SearchAppsOrderBy, array] = {
+            SearchAppsOrderBy.TS_ADDED: array("l", (r.rank_ts_added for r in rows)),
+            SearchAppsOrderBy.YEAR_RELEASED: array("l", (r.rank_year_released for r in rows)),
+            SearchAppsOrderBy.NAME: array("l", (r.rank_name for r in rows)),
+        }
+        self.permutations: dict[SearchAppsOrderBy, array] = {}
+        for order_by, ranks in self.ranks.items():
+            perm = array("l", bytes(ranks.itemsize * self.size))
+            for ix, rank in enumerate(ranks):
+                perm[rank - 1] = ix  # row_number() is 1-based
+            self.permutations[order_by] = perm
+
+    @staticmethod
+    def _group_ixs(
+        rows: t.Sequence[CatalogRow], values: t.Callable[[CatalogRow], t.Iterable]
+    ) -> dict[t.Any, list[int]]:
+        """Value -> indices of rows having it."""
+        ixs: dict[t.Any, list[int]] = {}
+        for ix, r in enumerate(rows):
+            for v in values(r):
+                ixs.setdefault(v, []).append(ix)
+        return ixs
+
+    def _group(self, rows: t.Sequence[CatalogRow], values: t.Callable[[CatalogRow], t.Iterable]) -> dict[t.Any, int]:
+        """Value -> bitset of rows having it."""
+        return {v: bitset(v_ixs, self.size) for v, v_ixs in self._group_ixs(rows, values).items()}
+
+    def _sample(self, mask: int) -> int:
+        """Bitset of rows -> bitset of sampled rows (sample_stride > 1)."""
+        sampled = mask.to_bytes((self.size + 7) // 8, "little")[:: self.sample_stride // 8]
+        # most significant bit first
+        return int(sampled.translate(LOWEST_BIT_CHAR)[::-1], 2)
+
+    @staticmethod
+    def _counts(mask: int, groups: dict[str, int], scale: float = 1.0) -> dict[str, int]:
+        """Value -> number of rows of mask having it (scaled, non-zero only), most frequent values first."""
+        counts = ((v, (mask & bits).bit_count()) for v, bits in groups.items())
+        res = [(v, round(n * scale)) for v, n in counts if n]
+        res.sort(key=lambda vn: (-vn[1], vn[0]))
+        return dict(res)
+
+    def _facet_counts(self, mask: int) -> dict[str, dict[str, int]]:
+        return {facet: self._counts(mask, groups) for facet, groups in self.facets.items()}
+
+    def facet_counts(self, mask: int, exact_limit: int) -> tuple[dict[str, dict[str, int]], bool]:
+        """Facet -> value -> number of mask rows having it, and whether the counts are approximate.
+
+        Counts of masks matching more than exact_limit rows are estimated from the sampled rows: every bitwise AND is
+        then over FACETS_SAMPLE_SIZE bits instead of the whole catalog.
+
+        Returned dicts may be shared and must not be modified.
+        """
+        for age_mode, age_mode_mask in self.age_modes.items():
+            if mask is age_mode_mask:
+                return self.age_mode_facets[age_mode], False
+        total = mask.bit_count()
+        if total > exact_limit and self.sample_stride > 1:
+            sample_mask = self._sample(mask)
+            sample_total = sample_mask.bit_count()
+            if sample_total:
+                scale = total / sample_total
+                return {
+                    facet: self._counts(sample_mask, groups, scale) for facet, groups in self.sample_facets.items()
+                }, True
+        return self._facet_counts(mask), False
+
+    def match_name(self, app_name: str) -> int:
+        """Bitset of rows with release name, game name or alternative names matching (ilike) %app_name%."""
+        needle = app_name.lower()
+        offsets = self.names_offsets
+        if "%" in needle or "_" in needle:
+            return bitset(
+                (bisect_right(offsets, m.start()) - 1 for m in ilike_regex(needle).finditer(self.names_blob)),
+                self.size,
+            )
+        blob = self.names_blob
+        if blob.count(needle) * 16 >= self.size:
+            # frequent: a per-row check is cheaper than jumping between the matches
+            return bitset((ix for ix, n in enumerate(self.names) if needle in n), self.size)
+        ixs = []
+        pos = blob.find(needle)
+        while pos != -1:
+            ix = bisect_right(offsets, pos) - 1
+            ixs.append(ix)
+            # skip the rest of the matched row
+            pos = blob.find(needle, offsets[ix + 1] if ix + 1 < self.size else len(blob))
+        return bitset(ixs, self.size)
+
+    def mask(
+        self,
+        age_mode: AgeMode,
+        app_name: str | None = None,
+        lang: str | None = None,
+        release_ids: t.Iterable[int] | None = None,
+    ) -> int:
+        res = self.age_modes[age_mode]
+        if app_name:
+            res &= self.match_name(app_name)
+        elif release_ids is not None:
+            id_ixs = self.id_ixs
+            res &= bitset((id_ixs[id_] for id_ in release_ids if id_ in id_ixs), self.size)
+        elif lang:
+            res &= self.langs.get(lang, 0)
+        return res
+
+    def page(
+        self, mask: int, *, order_by: SearchAppsOrderBy | None, offset: int, limit: int, after: int = 0
+    ) -> list[int]:
+        """Row indices of the matching rows, ordered and paginated.
+
+        after: rank of the last row of the previous page (keyset pagination), rows up to it are skipped for free.
+        """
+        order_by = order_by or SearchAppsOrderBy.NAME
+        offset = max(offset, 0)
+        total = mask.bit_count()
+        if not total or offset >= total or limit <= 0:
+            return []
+        mask_bytes = mask.to_bytes((self.size + 7) // 8, "little")
+        ranks = self.ranks[order_by]
+        if total * 16 < self.size:
+            # sparse: sort matching rows by rank
+            ixs = [
+                (m.start() << 3) + bit
+                for m in NON_ZERO_BYTE.finditer(mask_bytes)
+                for bit in range(8)
+                if mask_bytes[m.start()] >> bit & 1
+            ]
+            if after:
+                ixs = [ix for ix in ixs if ranks[ix] > after]
+            ixs.sort(key=ranks.__getitem__)
+            return ixs[offset : offset + limit]
+        # dense: walk the permutation (ranks are 1-based, so rows following rank `after` start at index `after`)
+        res = []
+        skip = offset
+        for ix in islice(self.permutations[order_by], after, None):
+            if mask_bytes[ix >> 3] >> (ix & 7) & 1:
+                if skip:
+                    skip -= 1
+                    continue
+                res.append(ix)
+                if len(res) == limit:
+                    break
+        return res
+
+    def search(
+        self,
+        age_mode: AgeMode,
+        *,
+        order_by: SearchAppsOrderBy | None,
+        offset: int,
+        limit: int,
+        app_name: str | None = None,
+        lang: str | None = None,
+        after: int = 0,
+    ) -> list[SearchAppsResponseItem]:
+        """Same as search_by_app_name / search_by_lang / search_all."""
+        ixs = self.page(self.mask(age_mode, app_name, lang), order_by=order_by, offset=offset, limit=limit, after=after)
+        return [self.items[ix] for ix in ixs]
+
+
+class PublisherIndex:
+    """Inverted index: publisher name -> ids of the releases it published."""
+
+    def __init__(self, rows: t.Sequence[tuple[int, str]]) -> None:
+        """rows: (release id, publisher name) pairs."""
+        self.loaded_at = time.monotonic()
+        release_ids: dict[str, set[int]] = {}
+        for release_id, name in rows:
+            release_ids.setdefault((name or "").lower(), set()).add(release_id)
+        self.names = list(release_ids)
+        self.release_ids = [frozenset(ids) for ids in release_ids.values()]
+        self.size = len(self.names)
+
+    def match(self, publisher_name: str) -> set[int]:
+        """Ids of the releases with a publisher matching (ilike) %publisher_name%."""
+        needle = publisher_name.lower()
+        if "%" in needle or "_" in needle:
+            regex = ilike_regex(needle)
+            matches = [ix for ix, n in enumerate(self.names) if regex.search(n)]
+        else:
+            matches = [ix for ix, n in enumerate(self.names) if needle in n]
+        res: set[int] = set()
+        for ix in matches:
+            res |= self.release_ids[ix]
+        return res
+
+
+class Snapshot(t.Protocol):
+    size: int
+    loaded_at: float
+
+
+S = t.TypeVar("S", bound=Snapshot)
+
+
+class CatalogEngine(t.Generic[S]):
+    """Holds the current snapshot (Catalog, PublisherIndex) and reloads it in the background once it gets older than
+    refresh_interval.
+
+    Until the reload completes the previous snapshot keeps serving requests.
+    """
+
+    def __init__(self, loader: t.Callable[[], S], refresh_interval: float) -> None:
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.catalog: S | None = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._next_reload_at = 0.0
+
+    def get(self) -> S:
+        catalog = self.catalog
+        if catalog is None:
+            with self._lock:
+                if self.catalog is None:
+                    self.catalog = self.loader()
+                    self.reloads += 1
+                    self._next_reload_at = time.monotonic() + self.refresh_interval
+                return self.catalog
+        if time.monotonic() >= self._next_reload_at:
+            app = current_app._get_current_object()  # type: ignore[attr-defined] # pylint: disable=protected-access
+            self.reload_async(app)
+        return catalog
+
+    def reload_async(self, app: Flask) -> None:
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+            # failed reloads are retried on the next interval as well
+            self._next_reload_at = time.monotonic() + self.refresh_interval
+        threading.Thread(target=self._reload, args=(app,), name="catalog-reload", daemon=True).start()
+
+    def _reload(self, app: Flask) -> None:
+        try:
+            with app.app_context():
+                self.catalog = self.loader()
+            self.reloads += 1
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.reload_errors += 1
+            log.exception("catalog reload failed")
+        finally:
+            self._reloading = False
+
+    def stats(self) -> dict:
+        catalog = self.catalog
+        return {
+            "size": catalog.size if catalog else None,
+            "age": time.monotonic() - catalog.loaded_at if catalog else None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
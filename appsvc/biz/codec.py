@@ -0,0 +1,284 @@
+"""Fast load/dump of marshmallow_dataclass DTOs.
+
+Every DTO gets a codec compiled once (per dataclass) into a flat list of specialized per-field converters, built from
+the same dataclass definitions and marshmallow fields the generated Schema uses: required/allow_none/defaults,
+field validators (e.g. validate.Length), by-value/by-name enums and unknown fields handling are all preserved.
+Errors are raised as marshmallow.ValidationError with the same messages structure as Schema().load().
+
+Common cases (exact input types) are converted inline, anything unusual falls back to the marshmallow field itself,
+so results and error messages stay the same as with the Schema path.
+"""
+
+import dataclasses
+import threading
+import typing as t
+from collections.abc import Mapping
+
+from marshmallow import (
+    EXCLUDE,
+    RAISE,
+    ValidationError,
+    fields,
+    missing,
+)
+from marshmallow_dataclass import class_schema
+
+T = t.TypeVar("T")
+
+Converter = t.Callable[[t.Any], t.Any]
+
+
+class Codec(t.Generic[T]):
+    def __init__(self, cls: type[T]) -> None:
+        self.cls = cls
+        self._loaders: list[tuple[str, str, Converter, bool, bool, t.Any, fields.Field]] = []
+        self._dumpers: list[tuple[str, str, Converter, t.Any]] = []
+        self._load_keys: frozenset[str] = frozenset()
+        self._unknown = RAISE
+        self._unknown_error = ""
+
+    def _compile(self) -> None:
+        schema = class_schema(self.cls)()
+        if any(schema._hooks.values()) or schema.unknown not in (RAISE, EXCLUDE):  # pylint: disable=protected-access
+            raise TypeError(f"{self.cls.__name__}: schema hooks and unknown=INCLUDE are not supported")
+        hints = t.get_type_hints(self.cls)
+        self._unknown = schema.unknown
+        self._unknown_error = schema.error_messages["unknown"]
+        for name, field in schema.load_fields.items():
+            self._loaders.append(
+                (
+                    name,
+                    field.data_key if field.data_key is not None else name,
+                    _loader(field, hints.get(name)),
+                    field.required,
+                    field.allow_none,
+                    field.load_default,
+                    field,
+                )
+            )
+        self._load_keys = frozenset(key for _, key, *_ in self._loaders)
+        for name, field in schema.dump_fields.items():
+            self._dumpers.append(
+                (
+                    field.attribute or name,
+                    field.data_key if field.data_key is not None else name,
+                    _dumper(field, hints.get(name)),
+                    field.dump_default,
+                )
+            )
+
+    def load(self, data: t.Any) -> T:
+        """Same as cls.Schema().load(data)."""
+        if not isinstance(data, Mapping):
+            raise ValidationError({"_schema": ["Invalid input type."]})
+        kwargs = {}
+        errors: dict[str, t.Any] = {}
+        for name, key, loader, required, allow_none, load_default, field in self._loaders:
+            value = data.get(key, missing)
+            if value is missing:
+                if required:
+                    errors[key] = [field.error_messages["required"]]
+                elif load_default is not missing:
+                    kwargs[name] = load_default() if callable(load_default) else load_default
+                continue
+            if value is None:
+                if allow_none:
+                    kwargs[name] = None
+                else:
+                    errors[key] = [field.error_messages["null"]]
+                continue
+            try:
+                kwargs[name] = loader(value)
+            except ValidationError as e:
+                errors[key] = e.messages
+        if self._unknown == RAISE:
+            for key in data:
+                if key not in self._load_keys:
+                    errors[key] = [self._unknown_error]
+        if errors:
+            raise ValidationError(errors)
+        return self.cls(**kwargs)
+
+    def dump(self, obj: t.Any) -> dict:
+        """Same as cls.Schema().dump(obj), obj may be either an object or a mapping."""
+        res = {}
+        is_mapping = isinstance(obj, Mapping)
+        for attr, key, dumper, dump_default in self._dumpers:
+            value = obj.get(attr, missing) if is_mapping else getattr(obj, attr, missing)
+            if value is missing:
+                value = dump_default() if callable(dump_default) else dump_default
+                if value is missing:
+                    continue
+            res[key] = None if value is None else dumper(value)
+        return res
+
+
+_codecs: dict[type, Codec] = {}  # compiled ones only: read without the lock
+_compiling: dict[type, Codec] = {}
+_codecs_lock = threading.RLock()
+
+
+def codec_for(cls: type[T]) -> Codec[T]:
+    """Returns (compiling on first use) the codec of the dataclass."""
+    try:
+        return _codecs[cls]
+    except KeyError:
+        pass
+    with _codecs_lock:
+        if cls in _codecs:
+            return _codecs[cls]
+        # self-referencing dataclasses resolve to the codec being compiled (by the thread holding the lock)
+        if cls in _compiling:
+            return _compiling[cls]
+        codec: Codec[T] = Codec(cls)
+        _compiling[cls] = codec
+        try:
+            codec._compile()  # pylint: disable=protected-access
+        finally:
+            del _compiling[cls]
+        _codecs[cls] = codec
+        return codec
+
+
+def compile_codecs(*classes: type) -> None:
+    """Compiles the codecs of the dataclasses right away (at import time of hot DTOs: the first requests don't pay for
+    compiling, nor wait for another thread compiling)."""
+    for cls in classes:
+        codec_for(cls)
+
+
+def _unwrap(hint: t.Any) -> t.Any:
+    """Optional[X] -> X, list[X] -> X."""
+    while True:
+        args = [a for a in t.get_args(hint) if a is not type(None)]
+        origin = t.get_origin(hint)
+        if origin in (t.Union, list) and len(args) == 1:
+            hint = args[0]
+        else:
+            return hint
+
+
+def _validated(field: fields.Field, converter: Converter) -> Converter:
+    if not field.validators:
+        return converter
+
+    def load(value: t.Any) -> t.Any:
+        res = converter(value)
+        field._validate(res)  # pylint: disable=protected-access
+        return res
+
+    return load
+
+
+def _loader(field: fields.Field, hint: t.Any) -> Converter:  # noqa: C901
+    """Value (not None) -> loaded value."""
+    # exact type checks are intended: subclasses (bool of int, custom fields) go through the marshmallow field
+    # pylint: disable=unidiomatic-typecheck
+    deserialize = field.deserialize
+
+    def convert(value: t.Any) -> t.Any:
+        """Deserializes without validation (done by _validated)."""
+        return field._deserialize(value, None, None)  # pylint: disable=protected-access
+
+    if isinstance(field, fields.Nested) and not field.many and dataclasses.is_dataclass(_unwrap(hint)):
+        nested = codec_for(_unwrap(hint))
+
+        def load_nested(value: t.Any) -> t.Any:
+            return nested.load(value)
+
+        return _validated(field, load_nested)
+    if isinstance(field, fields.List):
+        inner_field = field.inner
+        inner_loader = _loader(inner_field, _unwrap(hint))
+        inner_allow_none = inner_field.allow_none
+
+        def load_list(value: t.Any) -> list:
+            if not isinstance(value, (list, tuple)):
+                return deserialize(value)
+            res = []
+            errors = {}
+            for ix, item in enumerate(value):
+                try:
+                    if item is None:
+                        if not inner_allow_none:
+                            raise ValidationError([inner_field.error_messages["null"]])
+                        res.append(None)
+                    else:
+                        res.append(inner_loader(item))
+                except ValidationError as e:
+                    errors[ix] = e.messages
+            if errors:
+                raise ValidationError(errors)
+            return res
+
+        return _validated(field, load_list)
+    if isinstance(field, fields.Enum):
+        members = {m.value if field.by_value else m.name: m for m in field.enum}
+
+        def load_enum(value: t.Any) -> t.Any:
+            try:
+                return members[value]
+            except (KeyError, TypeError):
+                return deserialize(value)
+
+        return _validated(field, load_enum)
+    if isinstance(field, fields.String):
+
+        def load_str(value: t.Any) -> t.Any:
+            return value if type(value) is str else convert(value)  # noqa: E721
+
+        return _validated(field, load_str)
+    if isinstance(field, fields.Integer):
+
+        def load_int(value: t.Any) -> t.Any:
+            return value if type(value) is int else convert(value)  # noqa: E721
+
+        return _validated(field, load_int)
+    if isinstance(field, fields.Boolean):
+
+        def load_bool(value: t.Any) -> t.Any:
+            return value if value is True or value is False else convert(value)
+
+        return _validated(field, load_bool)
+    if type(field) is fields.Dict and field.key_field is None and field.value_field is None:  # noqa: E721
+
+        def load_dict(value: t.Any) -> t.Any:
+            return dict(value) if isinstance(value, Mapping) else deserialize(value)
+
+        return _validated(field, load_dict)
+    if type(field) is fields.Raw:  # noqa: E721
+        return _validated(field, lambda value: value)
+    return deserialize
+
+
+def _dumper(field: fields.Field, hint: t.Any) -> Converter:  # noqa: C901
+    """Value (not None) -> dumped value."""
+    # pylint: disable=unidiomatic-typecheck
+
+    def serialize(value: t.Any) -> t.Any:
+        return field._serialize(value, None, None)  # pylint: disable=protected-access
+
+    if isinstance(field, fields.Nested) and not field.many and dataclasses.is_dataclass(_unwrap(hint)):
+        return codec_for(_unwrap(hint)).dump
+    if isinstance(field, fields.List):
+        inner_dumper = _dumper(field.inner, _unwrap(hint))
+
+        def dump_list(value: t.Any) -> list:
+            return [None if item is None else inner_dumper(item) for item in value]
+
+        return dump_list
+    if isinstance(field, fields.Enum):
+        if field.by_value:
+            return lambda value: value.value
+        return lambda value: value.name
+    if isinstance(field, fields.String):
+        return lambda value: value if type(value) is str else serialize(value)  # noqa: E721
+    if isinstance(field, fields.Integer) and not field.as_string:
+        return lambda value: value if type(value) is int else serialize(value)  # noqa: E721
+    if isinstance(field, fields.Boolean):
+        return lambda value: value if value is True or value is False else serialize(value)
+    if type(field) is fields.Dict and field.key_field is None and field.value_field is None:  # noqa: E721
+        return dict
+    if type(field) is fields.Raw:  # noqa: E721
+        return lambda value: value
+    return serialize
@@ -8,6 +8,7 @@ from marshmallow import (
 )
 from marshmallow_dataclass import dataclass
 
+from appsvc.biz.codec import compile_codecs
 from appsvc.services.dto.jukeboxsvc import (
     DcRegion,
     WindowSystem,
@@ -157,6 +158,31 @@ class GetAppReleaseResponseDTO(AppReleaseDetails):
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
 
 
+@dataclass
+class GetAppReleasesRequestDTO:
+    # release ids and/or uuids
+    ids: t.List[str] = field(metadata={"validate": validate.Length(min=1, max=100)})
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
+@dataclass
+class GetAppReleasesResponseDTO:
+    @dataclass
+    class Error:
+        code: int
+        message: str
+
+    @dataclass
+    class Item:
+        id: str  # as requested
+        app_release: t.Optional[AppReleaseDetails] = None
+        error: t.Optional["GetAppReleasesResponseDTO.Error"] = None
+
+    # in the order of the requested ids
+    app_releases: t.List[Item] = field(default_factory=list)
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
 @dataclass
 class RunAppRequestDTO:
     app_release_uuid: str
@@ -172,6 +198,28 @@ class RunAppResponseDTO:
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
 
 
+class RunAppLaunchStatus(StrEnum):
+    PENDING = "pending"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class RunAppLaunchDTO:
+    """Asynchronous /apps/run."""
+
+    @dataclass
+    class Error:
+        code: int
+        message: str
+
+    id: str
+    status: RunAppLaunchStatus = field(metadata={"by_value": True})
+    result: t.Optional[RunAppResponseDTO] = None  # succeeded
+    error: t.Optional[Error] = None  # failed
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
 @dataclass
 class PauseAppRequestDTO:
     container: ContainerOpDescr
@@ -191,6 +239,30 @@ class StopAppRequestDTO:
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
 
 
+@dataclass
+class ContainersOpRequestDTO:
+    # containers to pause/stop at once
+    containers: t.List[ContainerOpDescr] = field(metadata={"validate": validate.Length(min=1, max=5000)})
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
+@dataclass
+class ContainersOpResponseDTO:
+    @dataclass
+    class Error:
+        code: int
+        message: str
+
+    @dataclass
+    class Item:
+        container: ContainerOpDescr
+        error: t.Optional["ContainersOpResponseDTO.Error"] = None
+
+    # in the order of the requested containers
+    containers: t.List[Item] = field(default_factory=list)
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
 class SearchAppsOrderBy(StrEnum):
     TS_ADDED = "ts_added"
     YEAR_RELEASED = "year_released"
@@ -221,6 +293,10 @@ class SearchAppsRequestDTO:
     offset: int = 0
     limit: int = 100
     order_by: t.Optional[SearchAppsOrderBy] = field(default=SearchAppsOrderBy.TS_ADDED, metadata={"by_value": True})
+    # next_cursor of the previous page (offset is ignored then)
+    cursor: t.Optional[str] = field(default=None)
+    # also count all the results (total) and their facets
+    facets: bool = False
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
 
 
@@ -238,9 +314,40 @@ class SearchAppsResponseItem:
     tags: list[str] | None = None
 
 
+@dataclass
+class SearchFacets:
+    # value -> number of results having it, most frequent values first
+    lang: t.Dict[str, int] = field(default_factory=dict)
+    platform: t.Dict[str, int] = field(default_factory=dict)
+    decade: t.Dict[str, int] = field(default_factory=dict)  # e.g. "1990"
+    distro_format: t.Dict[str, int] = field(default_factory=dict)
+    tags: t.Dict[str, int] = field(default_factory=dict)
+    # counts are estimated from a sample of the results (large result sets)
+    approximate: bool = False
+
+
 @dataclass
 class SearchAppsResponseDTO:
     apps: t.List[SearchAppsResponseItem] = field(default_factory=list)
+    # set when the page is full: pass it as cursor to get the next page
+    next_cursor: t.Optional[str] = field(default=None)
+    # requested with facets only
+    total: t.Optional[int] = field(default=None)
+    facets: t.Optional[SearchFacets] = field(default=None)
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
+@dataclass
+class SearchAppsBatchRequestDTO:
+    # searched on behalf of user_id (user_id of the sections is ignored)
+    sections: t.List[SearchAppsRequestDTO] = field(metadata={"validate": validate.Length(min=1, max=10)})
+    user_id: t.Optional[int] = field(default=None)
+    Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
+@dataclass
+class SearchAppsBatchResponseDTO:
+    sections: t.List[SearchAppsResponseDTO] = field(default_factory=list)
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
 
 
@@ -257,3 +364,13 @@ class SearchAppsAclRequestDTO:
 class SearchAppsAclResponseDTO:
     acl: list[str]
     Schema: t.ClassVar[t.Type[Schema]] = Schema  # pylint: disable=invalid-name
+
+
+# hot request/response DTOs
+compile_codecs(
+    AppReleaseDetails,
+    RunAppRequestDTO,
+    RunAppResponseDTO,
+    SearchAppsRequestDTO,
+    SearchAppsResponseDTO,
+)
@@ -11,6 +11,8 @@ from werkzeug.exceptions import HTTPException
 
 ERROR_APP_OP = (1409, "app operational error")
 ERROR_APP_RELEASE_NOT_FOUND = (1404, "app release not found")
+ERROR_APP_LAUNCH_NOT_FOUND = (1404, "app launch not found")
+ERROR_APP_LAUNCHES_LIMIT = (1429, "too many pending app launches")
 ERROR_JUKEBOXSVC_CONTAINER_NOT_FOUND = (1404, "jukeboxsvc: container not found")
 ERROR_JUKEBOXSVC = (1409, "jukeboxsvc exception")
 ERROR_UNKNOWN = (1500, "unknown error")
@@ -39,6 +41,20 @@ class AppReleaseNotFoundException(BizException):
         super().__init__(code, message)
 
 
+class AppLaunchNotFoundException(BizException):
+    def __init__(self) -> None:
+        code = ERROR_APP_LAUNCH_NOT_FOUND[0]
+        message = ERROR_APP_LAUNCH_NOT_FOUND[1]
+        super().__init__(code, message)
+
+
+class AppLaunchesLimitException(BizException):
+    def __init__(self) -> None:
+        code = ERROR_APP_LAUNCHES_LIMIT[0]
+        message = ERROR_APP_LAUNCHES_LIMIT[1]
+        super().__init__(code, message)
+
+
 class JukeboxSvcException(BizException):
     def __init__(self, message: t.Optional[t.Any] = None) -> None:
         code = ERROR_JUKEBOXSVC[0]
@@ -0,0 +1,155 @@
+"""Hedged calls: a slow call is raced by a second (hedge) one, the first to succeed wins.
+
+The hedge is issued once the primary call has been running for longer than a percentile of the latencies of recent
+calls, so only the slowest calls are hedged (e.g. ~10% of them for the 90th percentile). The loser's result is handed
+to a callback as soon as it comes, to undo its side effects (e.g. stop a container nobody is going to use).
+"""
+
+import logging
+import math
+import threading
+import time
+import typing as t
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    wait,
+)
+
+T = t.TypeVar("T")
+
+log = logging.getLogger("appsvc")
+
+
+class LatencyWindow:
+    """Latencies (seconds) of the last `size` calls."""
+
+    def __init__(self, size: int) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, latency: float) -> None:
+        self._samples.append(latency)  # atomic
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile (0 < q <= 100), 0 with no samples."""
+        samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples), max(1, math.ceil(len(samples) * q / 100))) - 1]
+
+
+class Hedger:
+    """Runs calls (and their hedges) in the executor.
+
+    The hedge delay is the `percentile` of the latencies of the last `window` successful primary calls (hedges may be
+    served differently, e.g. by a farther DC), at least `min_delay`; it's `default_delay` until `min_samples` calls are
+    made.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        *,
+        percentile: float,
+        window: int,
+        min_samples: int,
+        min_delay: float,
+        default_delay: float,
+    ) -> None:
+        self._executor = executor
+        self.percentile = percentile
+        self.latencies = LatencyWindow(window)
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rescued = 0  # hedge wins of failed primaries
+        self.losers = 0  # successful losers handed to on_loser
+        self.saved = 0.0  # seconds saved by hedge wins (primary latency - hedge win latency)
+        self.saved_calls = 0  # hedge wins the saved time is known of (their primaries succeeded eventually)
+
+    def delay(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def _count(self, event: str, value: float = 1) -> None:
+        with self._lock:
+            setattr(self, event, getattr(self, event) + value)
+
+    def _submit_timed(self, fn: t.Callable[[], T]) -> Future[T]:
+        started = time.monotonic()
+
+        def timed() -> T:
+            res = fn()
+            self.latencies.add(time.monotonic() - started)
+            return res
+
+        return self._executor.submit(timed)
+
+    def call(self, primary: t.Callable[[], T], hedge: t.Callable[[], T], on_loser: t.Callable[[T], None]) -> T:
+        """Result of primary, or of hedge if primary is slow and hedge succeeds first.
+
+        Raises the exception of primary if both fail.
+        """
+        self._count("calls")
+        started = time.monotonic()
+        fp = self._submit_timed(primary)
+        if wait([fp], timeout=self.delay()).done:
+            return fp.result()
+
+        self._count("hedged")
+        fh = self._executor.submit(hedge)
+        pending = {fp, fh}
+        winner = None
+        while winner is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # primary wins a tie
+            winner = next((f for f in (fp, fh) if f in done and f.exception() is None), None)
+        if winner is None:
+            return fp.result()
+        won_at = time.monotonic() - started
+        loser = fh if winner is fp else fp
+        if winner is fh:
+            self._count("hedge_wins")
+        loser.add_done_callback(
+            lambda f: self._loser_done(f, is_primary=loser is fp, won_at=won_at, started=started, on_loser=on_loser)
+        )
+        return winner.result()
+
+    def _loser_done(
+        self, f: Future, *, is_primary: bool, won_at: float, started: float, on_loser: t.Callable[[t.Any], None]
+    ) -> None:
+        if f.exception() is not None:
+            if is_primary:
+                self._count("rescued")
+            return
+        if is_primary:
+            self._count("saved", time.monotonic() - started - won_at)
+            self._count("saved_calls")
+        self._count("losers")
+        try:
+            on_loser(f.result())
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception("hedged call loser cleanup failed")
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "rescued": self.rescued,
+            "losers": self.losers,
+            "saved_s": round(self.saved, 3),
+            "saved_avg_s": round(self.saved / self.saved_calls, 3) if self.saved_calls else 0.0,
+            "delay_s": round(self.delay(), 3),
+        }
@@ -0,0 +1,93 @@
+"""Key-value store shared by the worker processes of a pod.
+
+Worker caches (appsvc.biz.cache) are private to a process, while some state has to be seen by all the workers a
+request may land on (e.g. status of a launch started by another worker). Such state is kept in a local SQLite
+database: no extra service to run, a single file on the pod's local disk, concurrent readers with WAL.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import typing as t
+
+PURGE_EVERY = 100  # puts
+TABLE_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class KVStore:
+    """Thread- and process-safe string -> string store with per-entry TTL (a table of a SQLite database)."""
+
+    def __init__(self, path: str, table: str, ttl: float, timer: t.Callable[[], float] = time.time) -> None:
+        # table names can't be bound parameters: they are interpolated into the statements below, identifiers only
+        if not TABLE_NAME_RE.match(table):
+            raise ValueError(f"invalid table name: {table!r}")
+        # wall clock: entries are shared between processes
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self._timer = timer
+        self._local = threading.local()
+        self._puts = 0
+        self._sql_create = (
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._sql_get = f"SELECT value FROM {table} WHERE key = ? AND expires_at > ?"  # nosec B608
+        self._sql_put = f"INSERT OR REPLACE INTO {table} (key, value, expires_at) VALUES (?, ?, ?)"
+        self._sql_add = (
+            f"INSERT INTO {table} (key, value, expires_at) VALUES (?, ?, ?) "  # nosec B608
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            f"WHERE {table}.expires_at <= ?"
+        )
+        self._sql_delete = f"DELETE FROM {table} WHERE key = ?"  # nosec B608
+        self._sql_purge = f"DELETE FROM {table} WHERE expires_at <= ?"  # nosec B608
+        self._sql_size = f"SELECT count(*) FROM {table}"  # nosec B608
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connection of the current thread (sqlite3 connections must not be shared between threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(self._sql_create)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> str | None:
+        row = self._conn().execute(self._sql_get, (key, self._timer())).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, ttl: float | None = None) -> None:
+        self._conn().execute(
+            self._sql_put,
+            (key, value, self._timer() + (self.ttl if ttl is None else ttl)),
+        )
+        self._maybe_purge()
+
+    def add(self, key: str, value: str, ttl: float | None = None) -> bool:
+        """Puts the value unless the key is there already (not expired), returns whether it was put."""
+        now = self._timer()
+        cur = self._conn().execute(
+            self._sql_add,
+            (key, value, now + (self.ttl if ttl is None else ttl), now),
+        )
+        self._maybe_purge()
+        return cur.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._conn().execute(self._sql_delete, (key,))
+
+    def purge(self) -> int:
+        """Deletes expired entries, returns their number."""
+        return self._conn().execute(self._sql_purge, (self._timer(),)).rowcount
+
+    def _maybe_purge(self) -> None:
+        self._puts += 1
+        if self._puts % PURGE_EVERY == 0:
+            self.purge()
+
+    def stats(self) -> dict:
+        (size,) = self._conn().execute(self._sql_size).fetchone()
+        return {"size": size}
@@ -2,6 +2,7 @@ from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
+    DateTime,
     ForeignKey,
     Integer,
     String,
@@ -11,7 +12,10 @@ from sqlalchemy.dialects.postgresql import (
     DATE,
     JSONB,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import (
+    deferred,
+    relationship,
+)
 
 from appsvc.biz.sqldb import sqldb
 
@@ -33,6 +37,8 @@ class AppDAO(sqldb.Model):
     refs = Column(JSONB)
     short_descr = Column(String)
     tags = Column(ARRAY(String))
+    # generated from esrb_rating, tags and genres (see appsvc.biz.age_modes), exists once its migration is applied
+    age_modes = deferred(Column(ARRAY(String)))
 
 
 class AppCompanyDAO(sqldb.Model):
@@ -78,6 +84,8 @@ class UsersDcsDAO(sqldb.Model):
     __table_args__ = {"schema": "stats"}
     id = Column(BigInteger, primary_key=True)
     dcs = Column(JSONB)
+    # requires migrations/0004_users_dcs_updated_at.sql: deferred, so that nothing else depends on it
+    updated_at = deferred(Column(DateTime(timezone=True)))
     user_id = Column(BigInteger)
 
 
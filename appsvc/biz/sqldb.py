@@ -1,3 +1,34 @@
+import typing as t
+from contextlib import contextmanager
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import (
+    Engine,
+    event,
+)
 
 sqldb = SQLAlchemy()
+
+
+class QueryCounter:
+    """Counts statements sent to the database (one per round trip)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.statements: list[str] = []
+
+    def __call__(self, conn: t.Any, cursor: t.Any, statement: str, *args: t.Any) -> None:
+        self.count += 1
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: t.Optional[Engine] = None) -> t.Iterator[QueryCounter]:
+    """Tracks the number of queries executed by the engine (sqldb.engine by default) within the block."""
+    engine = engine if engine is not None else sqldb.engine
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
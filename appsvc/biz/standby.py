@@ -0,0 +1,238 @@
+"""Warm standby containers of popular releases.
+
+Cold container starts dominate launch latency, while a few releases account for most of the launches. The pool keeps
+pre-started, paused containers of the hottest releases of every DC, so that a launch of such a release claims one and
+resumes it with the user's ws connection instead of starting a container cold:
+
+- launch frequency: exponentially decayed launch counts per (release, DC), the DC of a launch being the first one
+  the user prefers;
+- refill: the `hot` most launched releases of every DC (launched at least `min_launches` times) get `per_release`
+  containers each, hotter releases first, as long as the memory the containers require fits the budget;
+- expiry: containers are stopped `ttl` after they were started, or as soon as their release is not hot anymore.
+
+Containers are started, paused and stopped by the callables the pool is given (jukeboxsvc operations, simulated ones
+in tests/benchmarks/sim_standby.py). The pool is per worker: containers are claimed by the worker which started them.
+"""
+
+import logging
+import threading
+import time
+import typing as t
+from collections import deque
+from dataclasses import dataclass
+
+from appsvc.biz.dto import ContainerDescr
+
+log = logging.getLogger("appsvc")
+
+# launch frequencies are forgotten below (a single launch ~4 half-lives ago)
+PRUNE_SCORE = 0.05
+
+# (release uuid, DC)
+PoolKey = tuple[str, str]
+
+
+@dataclass
+class StandbyContainer:
+    release_uuid: str
+    dc: str
+    container: ContainerDescr
+    memory: int  # bytes
+    started_at: float
+
+
+class LaunchFrequency:
+    """Launch counts decaying by half every `half_life` seconds."""
+
+    def __init__(self, half_life: float) -> None:
+        self.half_life = half_life
+        self._scores: dict[PoolKey, tuple[float, float]] = {}  # key -> (score, at)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def _decayed(self, score: float, at: float, now: float) -> float:
+        return score * 0.5 ** ((now - at) / self.half_life)
+
+    def record(self, key: PoolKey, now: float) -> None:
+        score, at = self._scores.get(key, (0.0, now))
+        self._scores[key] = (self._decayed(score, at, now) + 1, now)
+
+    def score(self, key: PoolKey, now: float) -> float:
+        score, at = self._scores.get(key, (0.0, now))
+        return self._decayed(score, at, now)
+
+    def hottest(self, n: int, min_score: float, now: float) -> list[PoolKey]:
+        """n keys of every DC with the highest scores (at least min_score), ordered by score."""
+        scores = {key: self._decayed(score, at, now) for key, (score, at) in self._scores.items()}
+        per_dc: dict[str, int] = {}
+        res = []
+        for key in sorted(scores, key=scores.__getitem__, reverse=True):
+            if scores[key] < min_score:
+                break
+            if per_dc.get(key[1], 0) < n:
+                per_dc[key[1]] = per_dc.get(key[1], 0) + 1
+                res.append(key)
+        return res
+
+    def prune(self, min_score: float, now: float) -> None:
+        """Forgets keys with scores below min_score."""
+        self._scores = {
+            key: (score, at) for key, (score, at) in self._scores.items() if self._decayed(score, at, now) >= min_score
+        }
+
+
+class StandbyPool:
+    """Paused containers ready to be claimed by launches of their releases.
+
+    start: starts a paused container of the release in the DC; memory: memory a container of the release requires;
+    stop: stops a container (also the ones nobody claimed).
+    """
+
+    def __init__(
+        self,
+        *,
+        hot: int,
+        per_release: int,
+        min_launches: float,
+        ttl: float,
+        memory_budget: int,
+        half_life: float,
+        start: t.Callable[[str, str], ContainerDescr],
+        memory: t.Callable[[str], int],
+        stop: t.Callable[[ContainerDescr], None],
+        timer: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.hot = hot
+        self.per_release = per_release
+        self.min_launches = min_launches
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.frequency = LaunchFrequency(half_life)
+        self._start = start
+        self._memory = memory
+        self._stop = stop
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._containers: dict[PoolKey, deque[StandbyContainer]] = {}
+        self._starting: dict[PoolKey, int] = {}
+        self.memory_used = 0  # by pooled and starting containers
+        self.hits = 0
+        self.misses = 0
+        self.started = 0
+        self.start_failures = 0
+        self.expired = 0
+        self.evicted = 0  # stopped as their releases cooled down
+
+    def claim(self, release_uuid: str, dcs: list[str]) -> StandbyContainer | None:
+        """Takes a container of the release out of the pool (DCs in order of preference), records the launch."""
+        now = self._timer()
+        with self._lock:
+            if dcs:
+                self.frequency.record((release_uuid, dcs[0]), now)
+            for dc in dcs:
+                containers = self._containers.get((release_uuid, dc))
+                if not containers:
+                    continue
+                # the oldest one not expired yet (expired ones are stopped by the next refill)
+                for i, c in enumerate(containers):
+                    if now - c.started_at < self.ttl:
+                        del containers[i]
+                        self.memory_used -= c.memory
+                        self.hits += 1
+                        return c
+            self.misses += 1
+        return None
+
+    def refill(self) -> None:
+        """Stops expired and cooled down containers, starts missing ones (blocks till they are up)."""
+        now = self._timer()
+        with self._lock:
+            self.frequency.prune(PRUNE_SCORE, now)
+            hot = self.frequency.hottest(self.hot, self.min_launches, now)
+            hot_keys = set(hot)
+            doomed: list[StandbyContainer] = []
+            for key, containers in list(self._containers.items()):
+                keep: deque[StandbyContainer] = deque()
+                for c in containers:
+                    if key not in hot_keys:
+                        self.evicted += 1
+                    elif now - c.started_at >= self.ttl:
+                        self.expired += 1
+                    else:
+                        keep.append(c)
+                        continue
+                    doomed.append(c)
+                    self.memory_used -= c.memory
+                if keep:
+                    self._containers[key] = keep
+                else:
+                    del self._containers[key]
+            missing = [
+                key
+                for key in hot
+                for _ in range(self.per_release - len(self._containers.get(key, ())) - self._starting.get(key, 0))
+            ]
+        for c in doomed:
+            self._stop_quietly(c)
+        for key in missing:
+            self._start_one(key)
+
+    def _start_one(self, key: PoolKey) -> None:
+        release_uuid, dc = key
+        try:
+            memory = self._memory(release_uuid)
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception("standby container of %s: no memory requirement", release_uuid)
+            return
+        with self._lock:
+            if self.memory_used + memory > self.memory_budget:
+                return
+            self.memory_used += memory
+            self._starting[key] = self._starting.get(key, 0) + 1
+        container = None
+        try:
+            container = self._start(release_uuid, dc)
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception("standby container of %s in %s failed to start", release_uuid, dc)
+        with self._lock:
+            self._starting[key] -= 1
+            if container is None:
+                self.memory_used -= memory
+                self.start_failures += 1
+            else:
+                self._containers.setdefault(key, deque()).append(
+                    StandbyContainer(release_uuid, dc, container, memory, self._timer())
+                )
+                self.started += 1
+
+    def _stop_quietly(self, c: StandbyContainer) -> None:
+        try:
+            self._stop(c.container)
+        except Exception:  # pylint: disable=broad-exception-caught
+            log.exception("standby container %s failed to stop", c.container.id)
+
+    def clear(self) -> None:
+        """Stops all the containers."""
+        with self._lock:
+            doomed = [c for containers in self._containers.values() for c in containers]
+            self._containers = {}
+            self.memory_used -= sum(c.memory for c in doomed)
+        for c in doomed:
+            self._stop_quietly(c)
+
+    def stats(self) -> dict:
+        claims = self.hits + self.misses
+        return {
+            "size": sum(len(containers) for containers in self._containers.values()),
+            "memory_used": self.memory_used,
+            "memory_budget": self.memory_budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / claims if claims else 0.0,
+            "started": self.started,
+            "start_failures": self.start_failures,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "releases_tracked": len(self.frequency),
+        }
@@ -0,0 +1,13 @@
+import typing as t
+
+# name -> callable returning a json-serializable dict (e.g. cache hit/miss counters)
+_providers: dict[str, t.Callable[[], dict]] = {}
+
+
+def register(name: str, provider: t.Callable[[], dict]) -> None:
+    _providers[name] = provider
+
+
+def collect() -> dict:
+    """Collects runtime stats of the current worker process."""
+    return {name: provider() for name, provider in _providers.items()}
@@ -1,4 +1,8 @@
+import os
+import threading
+import time
 import typing as t
+from collections import deque
 
 import requests
 from requests.adapters import (
@@ -6,25 +10,228 @@ from requests.adapters import (
     Retry,
 )
 
+# connections kept alive per host and client, a connection per request thread by default (more are opened when all
+# of them are busy, but are closed after use), see HttpClient.add_callers for the other threads
+HTTP_CLIENT_POOL_SIZE = int(os.environ.get("HTTP_CLIENT_POOL_SIZE", os.environ.get("GUNICORN_NUM_THREADS", 5)))
 
-def get_http_client_session(
-    total: int = 0,
-    backoff_factor: int = 3,
-    allowed_methods: t.Optional[list[str]] = None,
-    status_forcelist: t.Optional[list[int]] = None,
-) -> requests.Session:
-    # backoff_factor for 3: 5, 10, 20, 40, 80, 160, 320, 640, 1280, 2560
-    if not allowed_methods:
-        allowed_methods = ["GET", "POST"]
-    if not status_forcelist:
-        status_forcelist = [429]
-    retries = Retry(
-        total=total,
-        backoff_factor=backoff_factor,
-        allowed_methods=frozenset(allowed_methods),
-        status_forcelist=status_forcelist,
-    )
-    sess = requests.Session()
-    sess.mount("http://", HTTPAdapter(max_retries=retries))
-    sess.mount("https://", HTTPAdapter(max_retries=retries))
-    return sess
+
+class HttpClient:
+    """Long-lived (per worker) thread-safe HTTP client: connections are kept alive and reused by all threads.
+
+    Every thread gets its own requests.Session (sessions are not thread-safe), all of them share the same connection
+    pool (urllib3 pools are). Requests are made with the client's timeout and retries unless a timeout is given.
+    """
+
+    def __init__(
+        self,
+        timeout: float | tuple[float, float],
+        retries: Retry | int = 0,
+        pool_size: int = HTTP_CLIENT_POOL_SIZE,
+    ) -> None:
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+        self._local = threading.local()
+
+    def add_callers(self, threads: int) -> None:
+        """Grows the pool by a connection per thread of e.g. an executor calling the client.
+
+        Meant to be called on module init: the connections kept alive so far are dropped.
+        """
+        self.pool_size += threads
+        self._adapter.poolmanager.clear()
+        self._adapter.init_poolmanager(1, self.pool_size)
+
+    def session(self) -> requests.Session:
+        sess = getattr(self._local, "session", None)
+        if sess is None:
+            sess = requests.Session()
+            sess.mount("http://", self._adapter)
+            sess.mount("https://", self._adapter)
+            self._local.session = sess
+        return sess
+
+    def request(
+        self, method: str, url: str, timeout: float | tuple[float, float] | None = None, **kwargs: t.Any
+    ) -> requests.Response:
+        return self.session().request(method, url, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+    def post(self, url: str, **kwargs: t.Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs: t.Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Connection pool stats (summed over hosts)."""
+        pools = [self._adapter.poolmanager.pools[key] for key in self._adapter.poolmanager.pools.keys()]
+        return {
+            "pools": len(pools),
+            "pool_size": self.pool_size,
+            "connections_opened": sum(p.num_connections for p in pools),
+            "requests": sum(p.num_requests for p in pools),
+            # the pool's queue is filled with None placeholders of not opened yet connections
+            "idle_connections": sum(c is not None for p in pools if p.pool is not None for c in list(p.pool.queue)),
+        }
+
+    def close(self) -> None:
+        self._adapter.close()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreakerConf(t.TypedDict):
+    """CircuitBreaker tuning shared by several breakers (slow_call is usually specific to each of them)."""
+
+    window: float
+    min_calls: int
+    error_rate: float
+    slow_rate: float
+    open_for: float
+    probes: int
+
+
+class CircuitBreaker:
+    """Circuit breaker over a rolling window of call outcomes and latencies.
+
+    closed: calls pass, the circuit opens once the window has at least `min_calls` calls and their error rate reaches
+    `error_rate` or the rate of calls slower than `slow_call` reaches `slow_rate`;
+    open: calls are rejected for `open_for` seconds, then the circuit gets half-open;
+    half-open: `probes` calls at a time are let through, the circuit closes once `probes` of them succeed in a row and
+    opens again on a failure.
+    """
+
+    BUCKETS = 10  # the window is rolled bucket by bucket
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: float,
+        min_calls: int,
+        error_rate: float,
+        slow_call: float,
+        slow_rate: float,
+        open_for: float,
+        probes: int,
+        timer: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_for = open_for
+        self.probes = probes
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._buckets: deque[list[float]] = deque()  # [started_at, calls, errors, slow calls, latency sum]
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+        self.opened = 0  # times
+        self.rejected = 0  # calls
+
+    def _roll(self, now: float) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window:
+            self._buckets.popleft()
+
+    def _totals(self) -> tuple[float, float, float, float]:
+        calls = errors = slow = latency = 0.0
+        for _, b_calls, b_errors, b_slow, b_latency in self._buckets:
+            calls += b_calls
+            errors += b_errors
+            slow += b_slow
+            latency += b_latency
+        return calls, errors, slow, latency
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self._opened_at = now
+        self.opened += 1
+        self._buckets.clear()
+
+    def acquire(self) -> None:
+        """Raises CircuitOpenError if the call is not allowed, the call's outcome is to be passed to release."""
+        with self._lock:
+            if self.state == "open" and self._timer() - self._opened_at >= self.open_for:
+                self.state = "half_open"
+                self._probes_in_flight = self._probes_succeeded = 0
+            if self.state == "open" or (self.state == "half_open" and self._probes_in_flight >= self.probes):
+                self.rejected += 1
+                raise CircuitOpenError(f"circuit {self.name} is open")
+            if self.state == "half_open":
+                self._probes_in_flight += 1
+
+    def release(self, ok: bool | None, latency: float = 0.0) -> None:
+        """Records the outcome of an acquired call (None: the call was not made)."""
+        with self._lock:
+            now = self._timer()
+            if self.state == "half_open":
+                self._probes_in_flight -= 1
+                if ok is False:
+                    self._open(now)
+                elif ok:
+                    self._probes_succeeded += 1
+                    if self._probes_succeeded >= self.probes:
+                        self.state = "closed"
+                return
+            if ok is None or self.state == "open":
+                return
+            self._roll(now)
+            if not self._buckets or self._buckets[-1][0] <= now - self.window / self.BUCKETS:
+                self._buckets.append([now, 0, 0, 0, 0.0])
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += not ok
+            bucket[3] += latency >= self.slow_call
+            bucket[4] += latency
+            calls, errors, slow, _ = self._totals()
+            if calls >= self.min_calls and (errors >= calls * self.error_rate or slow >= calls * self.slow_rate):
+                self._open(now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._roll(self._timer())
+            calls, errors, slow, latency = self._totals()
+            error_rate = errors / calls if calls else 0.0
+            slow_rate = slow / calls if calls else 0.0
+            return {
+                "state": self.state,
+                "calls": int(calls),
+                "error_rate": round(error_rate, 3),
+                "slow_rate": round(slow_rate, 3),
+                "avg_latency_s": round(latency / calls, 3) if calls else 0.0,
+                # 1: all recent calls succeeded in time, 0: open
+                "health": 0.0 if self.state == "open" else round(1 - max(error_rate, slow_rate), 3),
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakers:
+    """Circuit breakers created on first use, e.g. per endpoint and per node."""
+
+    def __init__(self, slow_call: float, conf: CircuitBreakerConf) -> None:
+        self.slow_call = slow_call
+        self.conf = conf
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name, slow_call=self.slow_call, **self.conf))
+        return breaker
+
+    def clear(self) -> None:
+        with self._lock:
+            self._breakers = {}
+
+    def stats(self) -> dict:
+        return {name: breaker.stats() for name, breaker in list(self._breakers.items())}
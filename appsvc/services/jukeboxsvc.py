@@ -1,6 +1,16 @@
 import json
 import os
+import time
+import typing as t
 
+import requests
+from requests.adapters import Retry
+
+from appsvc.biz import stats
+from appsvc.biz.codec import (
+    codec_for,
+    compile_codecs,
+)
 from appsvc.biz.dto import (
     ContainerOpDescr,
     ResumeAppRequestDTO,
@@ -15,61 +25,163 @@ from appsvc.services.dto.jukeboxsvc import (
     RunContainerResponseDTO,
     WsConnDC,
 )
-from appsvc.services.helpers import get_http_client_session
+from appsvc.services.helpers import (
+    CircuitBreaker,
+    CircuitBreakerConf,
+    CircuitBreakers,
+    CircuitOpenError,
+    HttpClient,
+)
 
 REQUESTS_TIMEOUT_CONN_READ = (3, 10)
 JUKEBOXSVC_URL = os.environ["JUKEBOXSVC_URL"]
 
+# DTOs of every launch
+compile_codecs(RunContainerRequestDTO, RunContainerResponseDTO, ResumeContainerRequestDTO)
+
+# a launch is not idempotent: never retried (a retry could start a second container)
+run_client = HttpClient(timeout=(3, 55))
+# container ops are retried on connection errors only (the request was not sent yet)
+ops_client = HttpClient(
+    timeout=REQUESTS_TIMEOUT_CONN_READ,
+    retries=Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.1),
+)
+stats.register("jukeboxsvc_http", lambda: {"run": run_client.stats(), "ops": ops_client.stats()})
+
+# circuit breakers of the endpoints and of the nodes (see CircuitBreaker): calls failing (connection errors, 5xx) or
+# slower than JUKEBOXSVC_BREAKER_SLOW_RUN / _SLOW_OP within the last JUKEBOXSVC_BREAKER_WINDOW open the circuits;
+# failures of container ops are the node's, their endpoints' circuits only open when jukeboxsvc itself is unreachable
+JUKEBOXSVC_BREAKER_ENABLED = os.environ.get("JUKEBOXSVC_BREAKER_ENABLED", "true").lower() == "true"
+JUKEBOXSVC_BREAKER_WINDOW = int(os.environ.get("JUKEBOXSVC_BREAKER_WINDOW", 60))  # seconds
+JUKEBOXSVC_BREAKER_MIN_CALLS = int(os.environ.get("JUKEBOXSVC_BREAKER_MIN_CALLS", 20))
+JUKEBOXSVC_BREAKER_ERROR_RATE = float(os.environ.get("JUKEBOXSVC_BREAKER_ERROR_RATE", 0.5))
+JUKEBOXSVC_BREAKER_SLOW_RATE = float(os.environ.get("JUKEBOXSVC_BREAKER_SLOW_RATE", 0.8))
+JUKEBOXSVC_BREAKER_SLOW_RUN = float(os.environ.get("JUKEBOXSVC_BREAKER_SLOW_RUN", 30))  # seconds
+JUKEBOXSVC_BREAKER_SLOW_OP = float(os.environ.get("JUKEBOXSVC_BREAKER_SLOW_OP", 5))  # seconds
+JUKEBOXSVC_BREAKER_OPEN_FOR = int(os.environ.get("JUKEBOXSVC_BREAKER_OPEN_FOR", 30))  # seconds
+JUKEBOXSVC_BREAKER_PROBES = int(os.environ.get("JUKEBOXSVC_BREAKER_PROBES", 3))
+
+breaker_conf: CircuitBreakerConf = {
+    "window": JUKEBOXSVC_BREAKER_WINDOW,
+    "min_calls": JUKEBOXSVC_BREAKER_MIN_CALLS,
+    "error_rate": JUKEBOXSVC_BREAKER_ERROR_RATE,
+    "slow_rate": JUKEBOXSVC_BREAKER_SLOW_RATE,
+    "open_for": JUKEBOXSVC_BREAKER_OPEN_FOR,
+    "probes": JUKEBOXSVC_BREAKER_PROBES,
+}
+run_breaker = CircuitBreaker("run", slow_call=JUKEBOXSVC_BREAKER_SLOW_RUN, **breaker_conf)
+# "pause", "resume", "stop" and "node:<node_id>"
+op_breakers = CircuitBreakers(slow_call=JUKEBOXSVC_BREAKER_SLOW_OP, conf=breaker_conf)
+stats.register("jukeboxsvc_breakers", lambda: {"run": run_breaker.stats(), **op_breakers.stats()})
+
+
+def node_breaker_of(container: ContainerOpDescr) -> CircuitBreaker:
+    return op_breakers.get(f"node:{container.node_id}")
+
+
+def send(
+    breaker: CircuitBreaker,
+    request: t.Callable[[], requests.Response],
+    node_breaker: CircuitBreaker | None = None,
+) -> requests.Response:
+    """Makes the request unless a circuit is open (fails fast with JukeboxSvcException then).
+
+    With a node breaker (container ops), the endpoint breaker records connection errors to jukeboxsvc only, everything
+    else (5xx, timeouts, slow calls) is the node's: a dead node must not open the endpoint for the healthy ones.
+    """
+    if not JUKEBOXSVC_BREAKER_ENABLED:
+        return request()
+    breakers = [breaker] if node_breaker is None else [breaker, node_breaker]
+    acquired: list[CircuitBreaker] = []
+    try:
+        for b in breakers:
+            b.acquire()
+            acquired.append(b)
+    except CircuitOpenError as e:
+        for b in acquired:
+            b.release(None)
+        raise JukeboxSvcException(str(e)) from e
+    started = time.monotonic()
+    ok: bool | None = False
+    endpoint_ok: bool | None = False
+    try:
+        res = request()
+        ok = res.status_code < 500  # e.g. 410 of a gone container is not a failure of the node
+        endpoint_ok = ok if node_breaker is None else True
+        return res
+    except requests.ConnectionError:
+        ok = None if node_breaker is not None else False  # jukeboxsvc is unreachable, the node may be fine
+        raise
+    except Exception:
+        endpoint_ok = node_breaker is not None
+        raise
+    finally:
+        latency = time.monotonic() - started
+        if node_breaker is None:
+            breaker.release(ok, latency)
+        else:
+            breaker.release(endpoint_ok)
+            node_breaker.release(ok, latency)
+
 
 def run_container(req: RunContainerRequestDTO) -> RunContainerResponseDTO:
-    s = get_http_client_session()
-    res = s.post(
-        url=f"{JUKEBOXSVC_URL}/containers/run",
-        data=json.dumps(RunContainerRequestDTO.Schema().dump(req)),
-        headers={"Content-Type": "application/json"},
-        timeout=(3, 55),
+    return run_container_json(json.dumps(codec_for(RunContainerRequestDTO).dump(req)))
+
+
+def run_container_json(data: str) -> RunContainerResponseDTO:
+    """Same as run_container, the request is serialized already."""
+    res = send(
+        run_breaker,
+        lambda: run_client.post(
+            url=f"{JUKEBOXSVC_URL}/containers/run",
+            data=data,
+            headers={"Content-Type": "application/json"},
+        ),
     )
     if res.status_code != 200:
         raise JukeboxSvcException(res.text)
-    return RunContainerResponseDTO.Schema().load(data=res.json())
+    return codec_for(RunContainerResponseDTO).load(res.json())
 
 
 def pause_container(container: ContainerOpDescr) -> None:
-    s = get_http_client_session()
-    res = s.post(
-        url=f"{JUKEBOXSVC_URL}/nodes/{container.node_id}/containers/{container.id}/pause",
-        timeout=REQUESTS_TIMEOUT_CONN_READ,
+    res = send(
+        op_breakers.get("pause"),
+        lambda: ops_client.post(url=f"{JUKEBOXSVC_URL}/nodes/{container.node_id}/containers/{container.id}/pause"),
+        node_breaker_of(container),
     )
     if res.status_code != 200:
         raise JukeboxSvcException(res.text)
 
 
 def resume_container(req: ResumeAppRequestDTO) -> None:
-    s = get_http_client_session()
-    res = s.post(
-        url=f"{JUKEBOXSVC_URL}/nodes/{req.container.node_id}/containers/{req.container.id}/resume",
-        data=json.dumps(
-            ResumeContainerRequestDTO.Schema().dump(
-                ResumeContainerRequestDTO(
-                    ws_conn=WsConnDC(
-                        id=req.ws_conn.id,
-                        consumer_id=req.ws_conn.consumer_id,
-                    )
+    data = json.dumps(
+        codec_for(ResumeContainerRequestDTO).dump(
+            ResumeContainerRequestDTO(
+                ws_conn=WsConnDC(
+                    id=req.ws_conn.id,
+                    consumer_id=req.ws_conn.consumer_id,
                 )
             )
+        )
+    )
+    res = send(
+        op_breakers.get("resume"),
+        lambda: ops_client.post(
+            url=f"{JUKEBOXSVC_URL}/nodes/{req.container.node_id}/containers/{req.container.id}/resume",
+            data=data,
+            headers={"Content-Type": "application/json"},
         ),
-        headers={"Content-Type": "application/json"},
-        timeout=REQUESTS_TIMEOUT_CONN_READ,
+        node_breaker_of(req.container),
     )
     if res.status_code != 200:
         raise JukeboxSvcException(res.text)
 
 
 def stop_container(container: ContainerOpDescr) -> None:
-    s = get_http_client_session()
-    res = s.post(
-        url=f"{JUKEBOXSVC_URL}/nodes/{container.node_id}/containers/{container.id}/stop",
-        timeout=REQUESTS_TIMEOUT_CONN_READ,
+    res = send(
+        op_breakers.get("stop"),
+        lambda: ops_client.post(url=f"{JUKEBOXSVC_URL}/nodes/{container.node_id}/containers/{container.id}/stop"),
+        node_breaker_of(container),
     )
     if res.status_code == 410:
         raise ContainerNotFoundException(res.text)
@@ -0,0 +1,19 @@
+-- trigram indexes for substring (ilike '%x%') name search: search_by_app_name and search_apps_acl
+-- required by SEARCH_TRGM_ENABLED=true
+-- run outside of a transaction block (CREATE INDEX CONCURRENTLY)
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- array_to_string is STABLE only, so it can't be used in an index expression
+CREATE OR REPLACE FUNCTION games.immutable_array_to_string(text[], text) RETURNS text
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+    AS $$ SELECT array_to_string($1, $2) $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS releases_name_trgm_idx
+    ON games.releases USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS games_name_trgm_idx
+    ON games.games USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS games_alternative_names_trgm_idx
+    ON games.games USING gin (games.immutable_array_to_string(alternative_names, ',') gin_trgm_ops);
@@ -0,0 +1,11 @@
+-- indexes matching the search orderings (get_order_by), so cursor (keyset) pages are an index range scan
+-- run outside of a transaction block (CREATE INDEX CONCURRENTLY)
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS releases_visible_uuid_idx
+    ON games.releases (uuid DESC) WHERE is_visible;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS releases_visible_year_released_uuid_idx
+    ON games.releases (year_released DESC, uuid DESC) WHERE is_visible;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS releases_visible_name_uuid_idx
+    ON games.releases (name, uuid DESC) WHERE is_visible;
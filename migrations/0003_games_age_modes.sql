@@ -0,0 +1,17 @@
+-- GENERATED by `python -m appsvc.biz.age_modes_tool ddl` from appsvc/biz/age_modes.py, do not edit
+-- required by AGE_MODES_PRECOMPUTED=true
+-- re-applying it (e.g. after the rules change) recomputes the column for all games: the table is rewritten under an
+-- ACCESS EXCLUSIVE lock (searches wait, never see the column missing), so apply it off-peak
+-- run outside of a transaction block (CREATE INDEX CONCURRENTLY)
+
+BEGIN;
+
+ALTER TABLE games.games DROP COLUMN IF EXISTS age_modes;
+
+ALTER TABLE games.games ADD COLUMN age_modes text[] GENERATED ALWAYS AS (
+    array_remove(ARRAY[CASE WHEN (esrb_rating < 10 OR (tags @> CAST(ARRAY['kids'] AS TEXT[])) OR (genres @> ARRAY[1000000]) AND NOT ((tags @> CAST(ARRAY['adults'] AS TEXT[]))) AND NOT ((tags @> CAST(ARRAY['mature'] AS TEXT[])))) THEN 'K' END, CASE WHEN (esrb_rating < 11 OR esrb_rating IS NULL AND NOT ((tags @> CAST(ARRAY['adults'] AS TEXT[]))) AND NOT ((tags @> CAST(ARRAY['mature'] AS TEXT[])))) THEN 'T' END, CASE WHEN true THEN 'A' END], NULL)
+) STORED;
+
+COMMIT;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS games_age_modes_idx ON games.games USING gin (age_modes);
@@ -0,0 +1,17 @@
+-- last RTT sample update of every user: DC ranking warmup picks the most recently active users
+-- required by DC_RANKING_WARMUP_SIZE > 0
+-- run outside of a transaction block (CREATE INDEX CONCURRENTLY)
+
+-- existing rows all get the time of the migration (the warmup falls back to the most recently added ones)
+ALTER TABLE stats.users_dcs ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+-- samples are written by another service: keep the column up to date without its cooperation
+CREATE OR REPLACE FUNCTION stats.users_dcs_touch() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$ BEGIN NEW.updated_at := now(); RETURN NEW; END $$;
+
+CREATE OR REPLACE TRIGGER users_dcs_touch BEFORE UPDATE ON stats.users_dcs
+    FOR EACH ROW EXECUTE FUNCTION stats.users_dcs_touch();
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_dcs_updated_at_idx
+    ON stats.users_dcs (updated_at DESC, id DESC);
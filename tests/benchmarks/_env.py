@@ -0,0 +1,13 @@
+"""Benchmarks run outside of pytest: load the same env files (see [tool.pytest.ini_options]) and make appsvc
+importable."""
+
+import os
+import sys
+
+from dotenv import load_dotenv
+
+ROOT_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+load_dotenv(os.path.join(ROOT_DIR, ".devcontainer", ".env"))
+load_dotenv(os.path.join(ROOT_DIR, ".devcontainer", "secret.env"))
+sys.path.insert(0, ROOT_DIR)
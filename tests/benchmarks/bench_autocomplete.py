@@ -0,0 +1,59 @@
+"""Latency of the in-memory autocomplete (search_apps_acl with SEARCH_ACL_ENGINE=memory) on synthetic catalogs.
+
+Usage: python tests/benchmarks/bench_autocomplete.py [number_of_names ...]  (default: 10000 100000)
+"""
+
+import random
+import sys
+import time
+
+import _env  # noqa: F401 pylint: disable=unused-import
+
+from appsvc.biz.autocomplete import (
+    Autocomplete,
+    AutocompleteEntry,
+)
+from appsvc.biz.dto import AgeMode
+
+SYLLABLES = ["ka", "ro", "mon", "key", "is", "land", "sword", "que", "st", "lar", "ry", "doom", "tri", "ple", "x"]
+QUERIES = ["mo", "mon", "monk", "monkey", "island", "nkey", "ey is", "and", "zzz", "key isl", "swordquest"]
+PERCENTILES = (50, 99)
+
+
+def make_entries(n: int, seed: int = 0) -> list[AutocompleteEntry]:
+    rnd = random.Random(seed)
+    return [
+        AutocompleteEntry(
+            text=" ".join(
+                "".join(rnd.choices(SYLLABLES, k=rnd.randint(1, 4))).title() for _ in range(rnd.randint(1, 4))
+            ),
+            age_modes={AgeMode.ADULT, *rnd.sample([AgeMode.KID, AgeMode.TEEN], rnd.randint(0, 2))},
+            popularity=int(rnd.paretovariate(1.2)),
+        )
+        for _ in range(n)
+    ]
+
+
+def bench(n: int) -> None:
+    entries = make_entries(n)
+    started_at = time.perf_counter()
+    index = Autocomplete(entries)
+    print(f"{n} names: built in {time.perf_counter() - started_at:.2f}s ({index.size} distinct)")
+    for age_mode in (AgeMode.KID, AgeMode.ADULT):
+        for query in QUERIES:
+            latencies = []
+            for _ in range(200):
+                started_at = time.perf_counter()
+                res = index.complete(query, age_mode, 25)
+                latencies.append(time.perf_counter() - started_at)
+            latencies.sort()
+            stats = " ".join(
+                f"p{p}={latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1e6:>7.1f}us"
+                for p in PERCENTILES
+            )
+            print(f"  {age_mode.name:<5} {query!r:<14} {stats} {len(res):>3} results")
+
+
+if __name__ == "__main__":
+    for size in [int(a) for a in sys.argv[1:]] or [10_000, 100_000]:
+        bench(size)
@@ -0,0 +1,144 @@
+"""Compares codec load/dump with the marshmallow Schema path for every DTO.
+
+Usage: python tests/benchmarks/bench_codec.py [number_of_iterations]
+"""
+
+import sys
+import timeit
+
+import _env  # noqa: F401 pylint: disable=unused-import
+
+from appsvc.biz.codec import codec_for
+from appsvc.biz.dto import (
+    AppReleaseDetails,
+    AppsLib,
+    GetAppReleaseResponseDTO,
+    PauseAppRequestDTO,
+    ResumeAppRequestDTO,
+    RunAppRequestDTO,
+    RunAppResponseDTO,
+    SearchAppsAclRequestDTO,
+    SearchAppsAclResponseDTO,
+    SearchAppsRequestDTO,
+    SearchAppsResponseDTO,
+    StopAppRequestDTO,
+)
+from appsvc.services.dto.jukeboxsvc import (
+    ResumeContainerRequestDTO,
+    RunContainerRequestDTO,
+    RunContainerResponseDTO,
+)
+
+WS_CONN = {"id": "test-ws-conn-id", "consumer_id": "test-ws-consumer-id"}
+CONTAINER = {"id": "5baa233e317a", "node_id": "3KXM:A6UU:LLYL"}
+APP_REQS = {"color_bits": 8, "screen_width": 320, "screen_height": 200, "hw": {"memory": 1024}, "midi": True}
+MEDIA_ASSETS = {
+    "cover": {"image_id": "co1xyz"},
+    "screenshots": [{"width": 640, "height": 480, "image_id": f"sc{i}"} for i in range(8)],
+}
+APP_RELEASE = {
+    "addl_artifacts": {},
+    "alternative_names": ["alt name 1", "alt name 2"],
+    "app_reqs": APP_REQS,
+    "companies": [
+        {"id": i, "name": f"company {i}", "developer": True, "porting": False, "publisher": True, "supporting": False}
+        for i in range(4)
+    ],
+    "distro": {"files": ["disk1.zip", "disk2.zip"], "format": "zip", "url": "https://example.com/game.zip"},
+    "esrb_rating": 8,
+    "igdb": {"id": 1, "slug": "test-game", "similar_ids": list(range(10))},
+    "id": 201,
+    "is_visible": True,
+    "lang": "en",
+    "long_descr": "long description " * 50,
+    "media_assets": MEDIA_ASSETS,
+    "media_assets_localized": None,
+    "name": "Test Game",
+    "platform": {"id": 13, "name": "DOS", "abbreviation": "DOS", "alternative_name": "", "slug": "dos"},
+    "refs": {"ag_id": 1, "lutris_id": "test-game", "mg_id": 2, "pcgw_id": None, "qz_id": None},
+    "runner": {"name": "dosbox", "ver": None, "window_system": "x11"},
+    "short_descr": "short description",
+    "uuid": "019c887a-f4e2-7dcc-a793-678c0e0b9f6e",
+    "uuidv4": None,
+    "year_released": 1993,
+    "tags": ["kids"],
+}
+SEARCH_ITEM = {
+    "cover_image_id": "co1xyz",
+    "esrb_rating": 8,
+    "id": "201",
+    "lang": "en",
+    "name": "Test Game",
+    "slug": "test-game",
+    "year_released": 1993,
+    "platform": "dos",
+    "distro_format": "zip",
+    "tags": ["kids"],
+}
+
+SAMPLES = [
+    (AppsLib, {"favorite_games": list(range(20)), "recently_played_games": list(range(10))}),
+    (AppReleaseDetails.AppReqs, APP_REQS),
+    (AppReleaseDetails.MediaAssets, MEDIA_ASSETS),
+    (GetAppReleaseResponseDTO, APP_RELEASE),
+    (RunAppRequestDTO, {"app_release_uuid": APP_RELEASE["uuid"], "user_id": 1, "ws_conn": WS_CONN}),
+    (RunAppResponseDTO, {"container": {**CONTAINER, "region": "us-west-1", "cpuset_cpus": [0, 1]}}),
+    (PauseAppRequestDTO, {"container": CONTAINER}),
+    (ResumeAppRequestDTO, {"container": CONTAINER, "ws_conn": WS_CONN}),
+    (StopAppRequestDTO, {"container": CONTAINER}),
+    (SearchAppsRequestDTO, {"app_name": "broken", "user_id": 1, "offset": 0, "limit": 10, "order_by": "name"}),
+    (SearchAppsResponseDTO, {"apps": [SEARCH_ITEM] * 100}),
+    (SearchAppsAclRequestDTO, {"app_name": "har"}),
+    (SearchAppsAclResponseDTO, {"acl": [f"name {i}" for i in range(25)]}),
+    (
+        RunContainerRequestDTO,
+        {
+            "app_descr": {
+                "slug": "test-game",
+                "release_uuid": APP_RELEASE["uuid"],
+                "release_uuidv4": None,
+                "platform": "dos",
+            },
+            "preferred_dcs": ["us-west-1", "eu-central-1"],
+            "reqs": {
+                "app": {"color_bits": 16, "midi": True, "screen_height": 400, "screen_width": 640},
+                "container": {"runner": {"name": "dosbox", "ver": "0.74", "window_system": "x11"}, "video_enc": "cpu"},
+                "hw": {"dgpu": False, "igpu": True, "memory": 1 << 30, "memory_shared": None, "nanocpus": 10**9},
+            },
+            "user_id": 1,
+            "ws_conn": WS_CONN,
+        },
+    ),
+    (
+        RunContainerResponseDTO,
+        {
+            "node": {"id": "n", "api_uri": "http://n", "region": "us-west-1"},
+            "container": {"id": "c", "cpuset_cpus": [0]},
+        },
+    ),
+    (ResumeContainerRequestDTO, {"ws_conn": WS_CONN}),
+]
+
+
+def bench(number: int) -> None:
+    print(
+        f"{'DTO':<28} {'schema load':>12} {'codec load':>12} {'x':>6} {'schema dump':>12} {'codec dump':>12} {'x':>6}"
+    )
+    for cls, data in SAMPLES:
+        codec = codec_for(cls)
+        obj = codec.load(data)
+        assert obj == cls.Schema().load(data)
+        assert codec.dump(obj) == cls.Schema().dump(obj)
+        # the Schema path as used by endpoints: a new Schema instance per call
+        schema_load = timeit.timeit(lambda: cls.Schema().load(data), number=number) / number * 1e6
+        codec_load = timeit.timeit(lambda: codec.load(data), number=number) / number * 1e6
+        schema_dump = timeit.timeit(lambda: cls.Schema().dump(obj), number=number) / number * 1e6
+        codec_dump = timeit.timeit(lambda: codec.dump(obj), number=number) / number * 1e6
+        print(
+            f"{cls.__name__:<28} {schema_load:>10.1f}us {codec_load:>10.1f}us {schema_load / codec_load:>5.1f}x"
+            f" {schema_dump:>10.1f}us {codec_dump:>10.1f}us {schema_dump / codec_dump:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
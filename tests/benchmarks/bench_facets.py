@@ -0,0 +1,77 @@
+"""Latency of search facet counts (Catalog.facet_counts): exact vs estimated from the sampled rows.
+
+Usage: python tests/benchmarks/bench_facets.py [number_of_releases ...]  (default: 10000 100000)
+"""
+
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import _env  # noqa: F401 pylint: disable=unused-import
+
+from appsvc.biz.catalog import Catalog
+from appsvc.biz.dto import AgeMode
+
+LANGS = ["en", "de", "fr", "ru", "es", "it", "pl", "ja"]
+PLATFORMS = ["dos", "win", "amiga", "c64", "nes", "snes"]
+TAGS = [f"tag{i}" for i in range(300)]
+PERCENTILES = (50, 99)
+
+
+def make_rows(n: int, seed: int = 0) -> list[SimpleNamespace]:
+    rnd = random.Random(seed)
+    ranks = list(range(1, n + 1))
+    return [
+        SimpleNamespace(
+            cover_image_id=f"co{i}",
+            esrb_rating=rnd.choice([None, 8, 10, 11]),
+            id=i,
+            lang=rnd.choice(LANGS),
+            name=f"game {i}",
+            slug=f"game-{i}",
+            year_released=rnd.choice([None, *range(1975, 2025)]),
+            platform=rnd.choice(PLATFORMS),
+            distro_format=rnd.choice(["zip", "iso"]),
+            tags=rnd.sample(TAGS, rnd.randint(0, 6)),
+            uuid=f"uuid-{i}",
+            game_name=None,
+            alternative_names=None,
+            genres=None,
+            is_kid=rnd.random() < 0.3,
+            is_teen=rnd.random() < 0.7,
+            rank_ts_added=ranks[i],
+            rank_year_released=ranks[i],
+            rank_name=ranks[i],
+        )
+        for i in range(n)
+    ]
+
+
+def bench(n: int) -> None:
+    started_at = time.perf_counter()
+    catalog = Catalog(make_rows(n))
+    print(f"{n} releases: catalog built in {time.perf_counter() - started_at:.2f}s")
+    masks = {
+        "teen": catalog.mask(AgeMode.TEEN) | 0,  # not the precomputed age mode bitset
+        "teen, lang": catalog.mask(AgeMode.TEEN, lang="en"),
+        "adult, name": catalog.mask(AgeMode.ADULT, app_name="game 1"),
+    }
+    for name, mask in masks.items():
+        for mode, exact_limit in (("exact", n), ("approximate", 0)):
+            latencies = []
+            for _ in range(50):
+                started_at = time.perf_counter()
+                catalog.facet_counts(mask, exact_limit)
+                latencies.append(time.perf_counter() - started_at)
+            latencies.sort()
+            stats = " ".join(
+                f"p{p}={latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1e3:>6.2f}ms"
+                for p in PERCENTILES
+            )
+            print(f"  {name:<12} {mode:<12} {stats} ({mask.bit_count()} results)")
+
+
+if __name__ == "__main__":
+    for size in [int(a) for a in sys.argv[1:]] or [10_000, 100_000]:
+        bench(size)
@@ -0,0 +1,84 @@
+"""Compares ORM entity search (full releases + games rows) with the lean column projection used by search_apps.
+
+Requires the dev DB (see .devcontainer/.env and secret.env). To emulate a catalog with large descriptions, game
+descriptions are inflated inside a transaction which is rolled back at the end.
+
+Usage: python tests/benchmarks/bench_search_projection.py [descr_size_kb] [number_of_iterations]
+"""
+
+import sys
+import timeit
+
+import _env  # noqa: F401 pylint: disable=unused-import
+from sqlalchemy import (
+    func,
+    update,
+)
+from sqlalchemy.orm import contains_eager
+
+from appsvc import create_app
+from appsvc.biz.app import (
+    APPS_SEARCH_LIMIT,
+    search_query,
+)
+from appsvc.biz.dto import SearchAppsResponseItem
+from appsvc.biz.models import (
+    AppDAO,
+    AppReleaseDAO,
+)
+from appsvc.biz.sqldb import (
+    count_queries,
+    sqldb,
+)
+
+
+def search_orm() -> list[SearchAppsResponseItem]:
+    """search_apps before switching to the column projection."""
+    q = AppReleaseDAO.query.join(AppReleaseDAO.game).options(contains_eager(AppReleaseDAO.game))
+    q = q.filter(AppReleaseDAO.is_visible.is_(True)).order_by(AppReleaseDAO.uuid.desc()).limit(APPS_SEARCH_LIMIT)
+    res = [
+        SearchAppsResponseItem(
+            cover_image_id=(
+                r.media_assets["cover"]["image_id"] if r.media_assets else r.game.media_assets["cover"]["image_id"]
+            ),
+            esrb_rating=r.game.esrb_rating,
+            id=r.id,
+            lang=r.lang,
+            name=r.name,
+            slug=r.game.igdb["slug"],
+            year_released=r.year_released,
+            platform=r.platform.slug,
+            distro_format=r.distro["format"],
+            tags=r.game.tags,
+        )
+        for r in q.all()
+    ]
+    sqldb.session.expunge_all()  # don't let the identity map serve the next iteration
+    return res
+
+
+def search_projection() -> list[SearchAppsResponseItem]:
+    q = search_query().where(AppReleaseDAO.is_visible.is_(True)).order_by(AppReleaseDAO.uuid.desc())
+    return [SearchAppsResponseItem(**r._asdict()) for r in sqldb.session.execute(q.limit(APPS_SEARCH_LIMIT)).all()]
+
+
+def bench(descr_size_kb: int, number: int) -> None:
+    app = create_app()
+    with app.app_context():
+        sqldb.session.execute(update(AppDAO).values(long_descr=func.repeat("x", descr_size_kb * 1024)))
+        try:
+            assert search_orm() == search_projection()
+            for fn in (search_orm, search_projection):
+                with count_queries() as counter:
+                    fn()
+                elapsed = timeit.timeit(fn, number=number) / number * 1000
+                print(f"{fn.__name__:<20} {elapsed:>8.2f}ms/search {counter.count:>4} queries/search")
+        finally:
+            sqldb.session.rollback()
+
+
+if __name__ == "__main__":
+    bench(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
@@ -0,0 +1,106 @@
+"""Standby pool (appsvc.biz.standby) hit rate on a launch trace, for several pool configurations.
+
+The trace is replayed on a simulated clock: the pool is refilled every REFILL_INTERVAL, containers start instantly and
+memory-wise every release is the same. Hit rate is the share of launches which got a standby container, waste is the
+share of started standby containers nobody claimed (expired or evicted).
+
+Trace: a CSV file of "<seconds>,<release uuid>,<dc>" lines (e.g. exported from the launch logs), a synthetic trace
+(Zipf-distributed releases, Poisson arrivals) if none is given.
+
+Usage: python tests/benchmarks/sim_standby.py [trace.csv]
+"""
+
+import csv
+import random
+import sys
+from types import SimpleNamespace
+
+import _env  # noqa: F401 pylint: disable=unused-import
+
+from appsvc.biz.dto import ContainerDescr
+from appsvc.biz.standby import StandbyPool
+from appsvc.services.dto.jukeboxsvc import DcRegion
+
+GB = 1024 * 1024 * 1024
+REFILL_INTERVAL = 30  # seconds
+CONFIGS = [  # (hot releases per DC, containers per release, memory budget in containers)
+    (5, 1, 16),
+    (10, 1, 16),
+    (20, 1, 32),
+    (10, 2, 32),
+    (50, 1, 64),
+]
+TTL = 900  # seconds
+HALF_LIFE = 3600  # seconds
+MIN_LAUNCHES = 3
+
+
+def synthetic_trace(
+    launches: int = 50_000, releases: int = 5000, rate: float = 2.0, zipf_s: float = 1.1, seed: int = 0
+) -> list[tuple[float, str, str]]:
+    """Launches of Zipf-distributed releases arriving at `rate` per second, 70% of them in the first DC."""
+    rnd = random.Random(seed)
+    weights = [1 / (rank**zipf_s) for rank in range(1, releases + 1)]
+    uuids = rnd.choices([f"release-{i}" for i in range(releases)], weights=weights, k=launches)
+    now = 0.0
+    trace = []
+    for uuid in uuids:
+        now += rnd.expovariate(rate)
+        trace.append((now, uuid, "eu-central-1" if rnd.random() < 0.7 else "us-west-1"))
+    return trace
+
+
+def load_trace(path: str) -> list[tuple[float, str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return sorted((float(ts), uuid, dc) for ts, uuid, dc in csv.reader(f))
+
+
+def simulate(trace: list[tuple[float, str, str]], hot: int, per_release: int, budget: int) -> SimpleNamespace:
+    clock = SimpleNamespace(now=0.0, containers=0)
+
+    def start(_: str, dc: str) -> ContainerDescr:
+        clock.containers += 1
+        return ContainerDescr(id=f"c{clock.containers}", node_id="n", region=DcRegion(dc), cpuset_cpus=[])
+
+    pool = StandbyPool(
+        hot=hot,
+        per_release=per_release,
+        min_launches=MIN_LAUNCHES,
+        ttl=TTL,
+        memory_budget=budget * GB,
+        half_life=HALF_LIFE,
+        start=start,
+        memory=lambda _: GB,
+        stop=lambda _: None,
+        timer=lambda: clock.now,
+    )
+    next_refill = 0.0
+    memory_samples = []
+    for ts, uuid, dc in trace:
+        while next_refill <= ts:
+            clock.now = next_refill
+            pool.refill()
+            memory_samples.append(pool.memory_used)
+            next_refill += REFILL_INTERVAL
+        clock.now = ts
+        pool.claim(uuid, [dc])
+    stats = pool.stats()
+    return SimpleNamespace(
+        hit_rate=stats["hit_rate"],
+        started=stats["started"],
+        waste=(stats["expired"] + stats["evicted"]) / stats["started"] if stats["started"] else 0.0,
+        avg_memory_gb=sum(memory_samples) / len(memory_samples) / GB if memory_samples else 0.0,
+    )
+
+
+if __name__ == "__main__":
+    launch_trace = load_trace(sys.argv[1]) if len(sys.argv) > 1 else synthetic_trace()
+    hours = (launch_trace[-1][0] - launch_trace[0][0]) / 3600
+    print(f"{len(launch_trace)} launches of {len({uuid for _, uuid, _ in launch_trace})} releases in {hours:.1f}h")
+    for hot_releases, containers, budget_containers in CONFIGS:
+        res = simulate(launch_trace, hot_releases, containers, budget_containers)
+        print(
+            f"  hot={hot_releases:<3} per_release={containers} budget={budget_containers:>3}GB: "
+            f"hit rate {res.hit_rate:6.1%}, {res.started:>6} standby starts, waste {res.waste:6.1%}, "
+            f"avg memory {res.avg_memory_gb:5.1f}GB"
+        )
@@ -0,0 +1,67 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from jukeboxsvc_stub import JukeboxSvcStub
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from appsvc import create_app
+from appsvc.biz import app as biz_app
+from appsvc.biz.app import search_result_cache
+from appsvc.biz.kvstore import KVStore
+from appsvc.biz.sqldb import sqldb
+from appsvc.services import jukeboxsvc
+from appsvc.services.helpers import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def fixture_no_search_result_cache():
+    """Search tests compare results of different engines/requests: the cache is enabled by its own tests only."""
+    with patch.object(search_result_cache, "max_size", 0):
+        yield
+
+
+@pytest.fixture(name="run_app_keys", autouse=True)
+def fixture_run_app_keys(tmp_path):
+    """Launch keys of idempotent /apps/run in a temporary database (launches of different tests must not collide)."""
+    store = KVStore(str(tmp_path / "appsvc.sqlite3"), "run_app_keys", biz_app.RUN_APP_IDEMPOTENCY_TTL)
+    with patch.object(biz_app, "run_app_keys", store):
+        yield store
+
+
+@pytest.fixture(name="launches")
+def fixture_launches(tmp_path):
+    """Launch store of asynchronous /apps/run in a temporary database."""
+    store = KVStore(str(tmp_path / "appsvc.sqlite3"), "launches", biz_app.RUN_APP_ASYNC_TTL)
+    with patch.object(biz_app, "launches", store):
+        yield store
+
+
+@pytest.fixture(name="jukeboxsvc_stub")
+def fixture_jukeboxsvc_stub():
+    """jukeboxsvc replaced with a local stub server (see jukeboxsvc_stub)."""
+    run_breaker = CircuitBreaker("run", slow_call=jukeboxsvc.JUKEBOXSVC_BREAKER_SLOW_RUN, **jukeboxsvc.breaker_conf)
+    jukeboxsvc.op_breakers.clear()
+    with (
+        JukeboxSvcStub() as stub,
+        patch.object(jukeboxsvc, "JUKEBOXSVC_URL", stub.url),
+        patch.object(jukeboxsvc, "run_breaker", run_breaker),
+    ):
+        yield stub
+    jukeboxsvc.op_breakers.clear()
+
+
+@pytest.fixture(name="db_app")
+def fixture_db_app():
+    """App bound to the dev DB (integration tests); skips when the DB is not reachable."""
+    if not os.environ.get("SQLDB_PASSWORD"):
+        pytest.skip("SQLDB_PASSWORD is not set (.devcontainer/secret.env)")
+    app = create_app()
+    with app.app_context():
+        try:
+            sqldb.session.execute(text("SELECT 1"))
+        except OperationalError as e:
+            pytest.skip(f"sqldb is not reachable: {e}")
+        yield app
+        sqldb.session.rollback()
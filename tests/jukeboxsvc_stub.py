@@ -0,0 +1,116 @@
+"""Local jukeboxsvc stub: launches containers in the first preferred DC after the delay configured for it."""
+
+import json
+import threading
+import time
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+
+class JukeboxSvcStub(ThreadingHTTPServer):
+    request_queue_size = 64  # concurrent connects of bulk ops
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), JukeboxSvcStubHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.delays: dict[str, float] = {}  # dc -> seconds to launch a container in
+        self.failing: set[str] = set()  # dcs out of capacity
+        self.failing_nodes: set[str] = set()  # nodes failing container ops
+        self.op_delay = 0.0  # seconds a container op takes
+        self.ops_in_flight: dict[str, int] = {}  # node_id -> container ops
+        self.max_ops_in_flight: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.runs: list[list[str]] = []  # preferred_dcs of the run requests
+        self.stopped: list[tuple[str, str]] = []  # (node_id, container_id)
+        self.paused: list[tuple[str, str]] = []
+        self.resumed: list[tuple[str, str, dict]] = []  # (node_id, container_id, ws_conn)
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self) -> "JukeboxSvcStub":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def requests(self) -> int:
+        return len(self.runs) + len(self.stopped) + len(self.paused) + len(self.resumed)
+
+    def wait_stopped(self, count: int, timeout: float = 5) -> bool:
+        deadline = time.monotonic() + timeout
+        while len(self.stopped) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.stopped) >= count
+
+
+class JukeboxSvcStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: JukeboxSvcStub
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        parts = self.path.strip("/").split("/")
+        if parts == ["containers", "run"]:
+            req = json.loads(body)
+            dc = req["preferred_dcs"][0]
+            self.server.runs.append(req["preferred_dcs"])
+            time.sleep(self.server.delays.get(dc, 0))
+            if dc in self.server.failing:
+                self.respond(500, {"message": f"no capacity in {dc}"})
+                return
+            self.respond(
+                200,
+                {
+                    "node": {"id": f"node-{dc}", "api_uri": f"http://node-{dc}", "region": dc},
+                    "container": {"id": f"container-{dc}", "cpuset_cpus": [0, 1]},
+                },
+            )
+        elif len(parts) == 5 and parts[0] == "nodes":
+            self.container_op(parts[1], parts[3], parts[4], body)
+        else:
+            self.respond(404, {})
+
+    def container_op(self, node_id: str, container_id: str, op: str, body: bytes) -> None:
+        server = self.server
+        with server.lock:
+            in_flight = server.ops_in_flight[node_id] = server.ops_in_flight.get(node_id, 0) + 1
+            server.max_ops_in_flight[node_id] = max(server.max_ops_in_flight.get(node_id, 0), in_flight)
+        try:
+            time.sleep(server.op_delay)
+        finally:
+            with server.lock:
+                server.ops_in_flight[node_id] -= 1
+        if node_id in server.failing_nodes:
+            self.respond(500, {"message": f"node {node_id} failed"})
+        elif container_id == "gone":
+            self.respond(410, {"message": "container not found"})
+        elif op == "stop":
+            server.stopped.append((node_id, container_id))
+            self.respond(200, {})
+        elif op == "pause":
+            server.paused.append((node_id, container_id))
+            self.respond(200, {})
+        elif op == "resume":
+            req = json.loads(body)
+            if set(req) != {"ws_conn"}:
+                self.respond(400, {"message": f"unknown fields: {sorted(set(req) - {'ws_conn'})}"})
+                return
+            server.resumed.append((node_id, container_id, req["ws_conn"]))
+            self.respond(200, {})
+        else:
+            self.respond(404, {})
+
+    def respond(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
@@ -0,0 +1,150 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+from test_biz_app import (
+    TEST_RELEASE_UUID,
+    make_release_dao,
+    make_run_app_req,
+    make_run_container_res,
+)
+
+from appsvc.api import api
+from appsvc.api.app import (
+    RUN_APP_ASYNC_SSE_RETRY,
+    app_release_body_cache,
+)
+from appsvc.biz import errors
+from appsvc.biz.app import make_app_release_details
+from appsvc.biz.codec import codec_for
+from appsvc.biz.dto import (
+    RunAppRequestDTO,
+    SearchAppsResponseDTO,
+)
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    app = Flask(__name__)
+    api.init_app(app)
+    errors.init_app(app)
+    return app.test_client()
+
+
+@pytest.mark.unit
+class TestApiApp:
+    @patch("appsvc.api.app.get_app_release")
+    def test_get_app_release_etag(self, mock_get_app_release, client):
+        app_release_body_cache.clear()
+        mock_get_app_release.return_value = make_app_release_details(make_release_dao(1), [])
+
+        res = client.get(f"/apps/{TEST_RELEASE_UUID}")
+        assert res.status_code == 200
+        assert res.json["uuid"] == TEST_RELEASE_UUID
+        assert "max-age" in res.headers["Cache-Control"]
+        etag = res.headers["ETag"]
+
+        # served from the cached body, regardless of the key form
+        res = client.get("/apps/1")
+        assert res.status_code == 200
+        assert res.headers["ETag"] == etag
+        assert mock_get_app_release.call_count == 1
+
+        res = client.get(f"/apps/{TEST_RELEASE_UUID}", headers={"If-None-Match": etag})
+        assert res.status_code == 304
+        assert res.data == b""
+        assert res.headers["ETag"] == etag
+
+        res = client.get(f"/apps/{TEST_RELEASE_UUID}", headers={"If-None-Match": '"stale"'})
+        assert res.status_code == 200
+        assert mock_get_app_release.call_count == 1
+        app_release_body_cache.clear()
+
+    @patch("appsvc.api.app.search_apps_batch")
+    def test_search_apps_batch(self, mock_search_apps_batch, client):
+        mock_search_apps_batch.return_value = [SearchAppsResponseDTO(next_cursor="c"), SearchAppsResponseDTO()]
+        res = client.post("/apps/search/batch", json={"sections": [{}, {"lang": "en"}], "user_id": 1})
+        assert res.status_code == 200
+        assert [s["next_cursor"] for s in res.json["sections"]] == ["c", None]
+        req = mock_search_apps_batch.call_args.args[0]
+        assert req.user_id == 1 and req.sections[1].lang == "en"
+
+        assert client.post("/apps/search/batch", json={"sections": []}).status_code == 400
+        assert client.post("/apps/search/batch", json={"sections": [{}] * 11}).status_code == 400
+
+    @patch("appsvc.api.app.get_app_releases")
+    def test_get_app_releases(self, mock_get_app_releases, client):
+        release = make_app_release_details(make_release_dao(1), [])
+        mock_get_app_releases.return_value = [None, release]
+        res = client.post("/apps/batch", json={"ids": ["2", TEST_RELEASE_UUID]})
+        assert res.status_code == 200
+        missing, found = res.json["app_releases"]
+        assert missing == {"id": "2", "app_release": None, "error": {"code": 1404, "message": "app release not found"}}
+        assert found["id"] == TEST_RELEASE_UUID and found["app_release"]["uuid"] == TEST_RELEASE_UUID
+        assert found["error"] is None
+
+        assert client.post("/apps/batch", json={"ids": []}).status_code == 400
+        assert client.post("/apps/batch", json={"ids": ["1"] * 101}).status_code == 400
+
+    def test_stop_apps(self, client, jukeboxsvc_stub):
+        jukeboxsvc_stub.failing_nodes.add("n2")
+        containers = [{"id": "c1", "node_id": "n1"}, {"id": "gone", "node_id": "n1"}, {"id": "c2", "node_id": "n2"}]
+        res = client.post("/apps/stop/batch", json={"containers": containers})
+        assert res.status_code == 200
+        items = res.json["containers"]
+        assert [item["container"] for item in items] == containers
+        assert items[0]["error"] is None and items[1]["error"] is None
+        assert items[2]["error"]["code"] == 1409 and "node n2 failed" in items[2]["error"]["message"]
+        res = client.post("/apps/pause/batch", json={"containers": containers[:1]})
+        assert res.json["containers"] == [{"container": containers[0], "error": None}]
+        assert jukeboxsvc_stub.paused == [("n1", "c1")]
+
+        assert client.post("/apps/stop/batch", json={"containers": []}).status_code == 400
+
+    @pytest.mark.usefixtures("launches")
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+    @patch("appsvc.biz.app.get_app_release")
+    def test_run_app_async(self, mock_get_app_release, mock_run_container_json, client):
+        mock_get_app_release.return_value = make_app_release_details(make_release_dao(1), [])
+        proceed = threading.Event()
+        mock_run_container_json.side_effect = lambda body: proceed.wait(5) and make_run_container_res()
+        req = codec_for(RunAppRequestDTO).dump(make_run_app_req())
+
+        res = client.post("/apps/run", json=req, headers={"Prefer": "respond-async"})
+        assert res.status_code == 202
+        assert res.json["status"] == "pending"
+        launch_url = res.headers["Location"]
+        assert client.get(launch_url).json["status"] == "pending"
+        with patch("appsvc.api.app.RUN_APP_ASYNC_SSE_TIMEOUT", 0):
+            # the stream doesn't wait for the launch to complete: the client reconnects
+            res = client.get(f"{launch_url}/events")
+            events = [e.split("\n") for e in res.get_data(as_text=True).strip().split("\n\n")]
+            assert [e[0] for e in events] == [f"retry: {RUN_APP_ASYNC_SSE_RETRY}", "event: pending"]
+
+        res = client.get(f"{launch_url}/events")  # streamed: the first event is sent before the launch completes
+        proceed.set()
+        assert res.mimetype == "text/event-stream"
+        events = [e.split("\n") for e in res.get_data(as_text=True).strip().split("\n\n")]
+        assert [e[0] for e in events] == [f"retry: {RUN_APP_ASYNC_SSE_RETRY}", "event: pending", "event: succeeded"]
+        assert json.loads(events[-1][1].removeprefix("data: "))["result"]["container"]["id"] == "c1"
+        assert client.get(launch_url).json["result"]["container"]["node_id"] == "n1"
+
+        assert client.get("/apps/run/missing").json["code"] == 1404
+        assert client.get("/apps/run/missing/events").json["code"] == 1404
+        # synchronous by default
+        res = client.post("/apps/run", json=req)
+        assert res.status_code == 200 and res.json["container"]["id"] == "c1"
+
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+    @patch("appsvc.biz.app.get_app_release")
+    def test_run_app_idempotency_key(self, mock_get_app_release, mock_run_container_json, client):
+        mock_get_app_release.return_value = make_app_release_details(make_release_dao(1), [])
+        mock_run_container_json.side_effect = [make_run_container_res("c1"), make_run_container_res("c2")]
+        req = codec_for(RunAppRequestDTO).dump(make_run_app_req())
+        with patch("appsvc.biz.app.RUN_APP_IDEMPOTENCY_ENABLED", False):
+            res = [client.post("/apps/run", json=req, headers={"Idempotency-Key": "k1"}) for _ in range(2)]
+            assert [r.json["container"]["id"] for r in res] == ["c1", "c1"]
+            res = client.post("/apps/run", json=req, headers={"Idempotency-Key": "k2"})
+            assert res.json["container"]["id"] == "c2"
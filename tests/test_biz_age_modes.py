@@ -0,0 +1,68 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import (
+    select,
+    text,
+)
+from sqlalchemy.dialects import postgresql
+
+from appsvc.biz.age_modes import (
+    age_modes_ddl,
+    find_mismatches,
+)
+from appsvc.biz.age_modes_tool import main
+from appsvc.biz.app import age_mode_filter_expr
+from appsvc.biz.dto import AgeMode
+from appsvc.biz.models import AppDAO
+from appsvc.biz.sqldb import sqldb
+
+MIGRATION_PATH = os.path.join(os.path.dirname(__file__), "..", "migrations", "0003_games_age_modes.sql")
+
+
+def compile_pg(expr) -> str:
+    return str(expr.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.unit
+class TestAgeModes:
+    def test_migration_matches_rules(self):
+        # regenerate with `python -m appsvc.biz.age_modes_tool ddl > migrations/0003_games_age_modes.sql`
+        with open(MIGRATION_PATH, encoding="utf-8") as f:
+            assert f.read() == age_modes_ddl()
+
+    def test_tool(self, capsys):
+        assert main(["ddl"]) == 0
+        assert capsys.readouterr().out == age_modes_ddl()
+        assert main(["unknown"]) == 2
+
+    def test_age_mode_filter_expr(self):
+        assert compile_pg(age_mode_filter_expr(AgeMode.KID)).startswith("games.games.esrb_rating < 10 OR")
+        with patch("appsvc.biz.app.AGE_MODES_PRECOMPUTED", True):
+            assert (
+                compile_pg(age_mode_filter_expr(AgeMode.KID)) == "games.games.age_modes @> CAST(ARRAY['K'] AS TEXT[])"
+            )
+            assert (
+                compile_pg(age_mode_filter_expr(AgeMode.TEEN)) == "games.games.age_modes @> CAST(ARRAY['T'] AS TEXT[])"
+            )
+            assert compile_pg(age_mode_filter_expr(AgeMode.ADULT)) == "true"
+
+
+@pytest.mark.integration
+class TestAgeModesDb:
+    def test_stored_age_modes_match_rules(self, db_app):
+        if not sqldb.session.execute(
+            text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = 'games' AND table_name = 'games' AND column_name = 'age_modes'"
+            )
+        ).first():
+            pytest.skip("migrations/0003_games_age_modes.sql is not applied")
+        assert not find_mismatches()
+        with patch("appsvc.biz.app.AGE_MODES_PRECOMPUTED", True):
+            for age_mode in (AgeMode.KID, AgeMode.TEEN):
+                precomputed = sqldb.session.execute(select(AppDAO.id).where(age_mode_filter_expr(age_mode))).all()
+                with patch("appsvc.biz.app.AGE_MODES_PRECOMPUTED", False):
+                    rules = sqldb.session.execute(select(AppDAO.id).where(age_mode_filter_expr(age_mode))).all()
+                assert set(precomputed) == set(rules)
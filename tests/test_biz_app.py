@@ -1,12 +1,150 @@
+import datetime
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 import pytest
+from flask import Flask
+from marshmallow import ValidationError
+from sqlalchemy import (
+    case,
+    create_engine,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.dialects import postgresql
+from test_biz_cache import FakeTimer
 
-from appsvc.biz.app import get_preferred_dcs
-from appsvc.biz.models import UsersDcsDAO
+from appsvc.biz.app import (
+    RUN_APP_KEY_PENDING,
+    RUNNERS_CONF,
+    STREAMD_REQS,
+    UserProfile,
+    app_release_cache,
+    dc_ranking_cache,
+    decode_cursor,
+    encode_cursor,
+    get_age_mode,
+    get_app_release,
+    get_app_releases,
+    get_launch,
+    get_launch_dcs,
+    get_launch_plan,
+    get_preferred_dcs,
+    get_user_preferred_dcs,
+    get_user_profile,
+    invalidate_user_profile,
+    keyset_filter_expr,
+    launch_plan_cache,
+    load_app_release,
+    load_app_releases,
+    make_app_release_details,
+    make_run_container_request,
+    pause_apps,
+    run_app,
+    run_app_async,
+    run_app_key,
+    run_app_key_stats,
+    search_apps,
+    search_apps_batch,
+    search_cache_key,
+    search_query,
+    search_result_cache,
+    standby_container_memory,
+    start_standby_container,
+    start_standby_pool,
+    stop_app,
+    stop_apps,
+    stop_standby_container,
+    update_dc_ranking,
+    user_profile_cache,
+    warmup_dc_rankings,
+    watch_launch,
+)
+from appsvc.biz.codec import codec_for
+from appsvc.biz.dto import (
+    AgeMode,
+    AppReleaseDetails,
+    AppsLib,
+    ContainerDescr,
+    ContainerOpDescr,
+    ContainersOpRequestDTO,
+    MyStuffType,
+    RunAppLaunchStatus,
+    RunAppRequestDTO,
+    RunAppResponseDTO,
+    SearchAppsBatchRequestDTO,
+    SearchAppsOrderBy,
+    SearchAppsRequestDTO,
+    SearchAppsResponseItem,
+    StopAppRequestDTO,
+    WsConnDC,
+)
+from appsvc.biz.errors import (
+    AppLaunchesLimitException,
+    AppLaunchNotFoundException,
+    AppOpException,
+    JukeboxSvcException,
+)
+from appsvc.biz.hedge import Hedger
+from appsvc.biz.kvstore import KVStore
+from appsvc.biz.models import (
+    AppDAO,
+    AppPlatformDAO,
+    AppReleaseDAO,
+    UsersDcsDAO,
+)
+from appsvc.biz.sqldb import (
+    count_queries,
+    sqldb,
+)
+from appsvc.biz.standby import StandbyPool
+from appsvc.services.dto.jukeboxsvc import (
+    DcRegion,
+    RunContainerRequestDTO,
+    RunContainerResponseDTO,
+)
 
 TEST_USER_ID = 0
 TEST_DATA_CENTERS = ["us-west-1", "us-east-1", "eu-central-1"]
+TEST_RELEASE_UUID = "019c887a-f4e2-7dcc-a793-678c0e0b9f6e"
+
+
+def make_release_dao(num_companies: int) -> AppReleaseDAO:
+    return AppReleaseDAO(
+        id=1,
+        app_reqs={"color_bits": 8, "screen_width": 320, "screen_height": 200},
+        companies=[
+            {"id": i, "developer": True, "porting": False, "publisher": False, "supporting": False}
+            for i in range(num_companies)
+        ],
+        distro={"files": ["game.zip"], "format": "zip", "url": "https://example.com"},
+        is_visible=True,
+        lang="en",
+        media_assets=None,
+        name="test game",
+        runner={"name": "dosbox", "ver": None},
+        uuid=TEST_RELEASE_UUID,
+        uuidv4=None,
+        year_released=1993,
+        game=AppDAO(
+            id=1,
+            addl_artifacts={},
+            alternative_names=[],
+            esrb_rating=None,
+            igdb={"id": 1, "slug": "test-game", "similar_ids": None},
+            long_descr="",
+            media_assets={"cover": {"image_id": "co1"}, "screenshots": None},
+            refs={"ag_id": -1, "lutris_id": "", "mg_id": 2, "pcgw_id": None, "qz_id": None},
+            short_descr="",
+            tags=None,
+        ),
+        platform=AppPlatformDAO(id=13, name="DOS", abbreviation="DOS", alternative_name="", slug="dos"),
+    )
 
 
 @pytest.mark.unit
@@ -53,3 +191,862 @@ class TestBizApp:
             user_id=TEST_USER_ID, dcs={"us-west-1": [2.0, 2.3], "us-east-1": [1.0, 0.4], "eu-central-1": [1.5, 1.6]}
         )
         assert get_preferred_dcs(TEST_USER_ID, TEST_DATA_CENTERS) == ["us-east-1", "eu-central-1", "us-west-1"]
+
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_load_app_release_row(self, mock_execute):
+        """Release details are built from the single (release, companies) row; see TestAppReleaseDb for the query."""
+        for num_companies in (0, 1, 8):
+            mock_execute.reset_mock()
+            r = make_release_dao(num_companies)
+            companies = [{**c, "name": f"company {c['id']}"} for c in r.companies]
+            mock_execute.return_value.first.return_value = (r, companies)
+            res = load_app_release(TEST_RELEASE_UUID)
+            assert mock_execute.call_count == 1
+            assert [c["name"] for c in res.companies] == [f"company {i}" for i in range(num_companies)]
+            assert res.refs.ag_id is None and res.refs.lutris_id is None and res.refs.mg_id == 2
+            # the ORM row stays untouched and isn't referenced by the (cached) details
+            assert r.game.refs["ag_id"] == -1
+            assert res.platform == AppReleaseDetails.AppPlatform(
+                id=13, name="DOS", abbreviation="DOS", alternative_name="", slug="dos"
+            )
+
+    def test_count_queries(self):
+        engine = create_engine("sqlite://")
+        with engine.connect() as conn:
+            with count_queries(engine) as counter:
+                conn.execute(text("select 1"))
+                conn.execute(text("select 2"))
+            conn.execute(text("select 3"))
+        assert counter.count == 2
+
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_get_app_release_cached(self, mock_execute):
+        app_release_cache.clear()
+        mock_execute.return_value.first.return_value = (make_release_dao(2), [])
+        res = get_app_release(TEST_RELEASE_UUID)
+        # both uuid and numeric id resolve to the same entry
+        assert get_app_release(TEST_RELEASE_UUID) is res
+        assert get_app_release("1") is res
+        assert mock_execute.call_count == 1
+        app_release_cache.clear()
+
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_get_app_releases(self, mock_execute):
+        app_release_cache.clear()
+        cached = make_release_dao(0)
+        cached.id, cached.uuid = 2, "019c887a-f4e2-7dcc-a793-000000000002"
+        mock_execute.return_value.first.return_value = (cached, [])
+        get_app_release("2")
+        mock_execute.reset_mock()
+
+        mock_execute.return_value.all.return_value = [(make_release_dao(1), [])]
+        res = get_app_releases(["3", TEST_RELEASE_UUID, cached.uuid, "x", "3", "1"])
+        # cache misses are loaded at once, input order (and duplicates) are preserved
+        assert mock_execute.call_count == 1
+        stmt = mock_execute.call_args.args[0].compile(dialect=postgresql.dialect())
+        assert "games.releases.id = ANY (CAST(%(param_2)s::BIGINT[] AS BIGINT[]))" in str(stmt)
+        assert "games.releases.uuid = ANY (CAST(%(param_3)s::TEXT[] AS TEXT[]))" in str(stmt)
+        assert stmt.params["param_2"] == [3, 1] and stmt.params["param_3"] == [TEST_RELEASE_UUID]
+        assert [r.id if r else None for r in res] == [None, 1, 2, None, None, 1]
+        assert res[1] is res[5] is get_app_release("1")
+        assert mock_execute.call_count == 1
+
+        # all cached or malformed: no DB round trip
+        assert get_app_releases(["1", "x"])[1] is None
+        assert mock_execute.call_count == 1
+        app_release_cache.clear()
+
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_projection(self, mock_execute):
+        # only the columns of the response item are fetched
+        columns = list(search_query().selected_columns.keys())
+        assert set(columns) == set(SearchAppsResponseItem.__dataclass_fields__)
+        SearchRow = namedtuple("SearchRow", columns)
+        mock_execute.return_value.all.return_value = [
+            SearchRow(
+                cover_image_id=f"co{i}",
+                esrb_rating=None,
+                id=i,
+                lang="en",
+                name=f"game {i}",
+                slug=f"game-{i}",
+                year_released=1990 + i,
+                platform="dos",
+                distro_format="zip",
+                tags=None,
+            )
+            for i in range(3)
+        ]
+        res = search_apps(SearchAppsRequestDTO()).apps
+        assert [r.name for r in res] == ["game 0", "game 1", "game 2"]
+        assert res[2].cover_image_id == "co2" and res[2].platform == "dos"
+
+
+def compile_pg(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def make_search_rows(n: int, uuid: bool = True) -> list:
+    columns = [*SearchAppsResponseItem.__dataclass_fields__, *(["uuid"] if uuid else [])]
+    SearchRow = namedtuple("SearchRow", columns)
+    return [
+        SearchRow(
+            cover_image_id=f"co{i}",
+            esrb_rating=None,
+            id=i,
+            lang="en",
+            name=f"game {i}",
+            slug=f"game-{i}",
+            year_released=1990 + i if i % 2 else None,
+            platform="dos",
+            distro_format="zip",
+            tags=None,
+            **({"uuid": f"uuid-{i}"} if uuid else {}),
+        )
+        for i in range(n)
+    ]
+
+
+@pytest.mark.integration
+class TestAppReleaseDb:
+    def test_get_app_release_single_query(self, db_app):
+        """Releases with the fewest and the most companies/screenshots are loaded with the same number of queries."""
+
+        def length(array):  # JSON nulls are not arrays
+            return case((func.jsonb_typeof(array) == "array", func.jsonb_array_length(array)), else_=0)
+
+        size = length(AppReleaseDAO.companies) + length(AppDAO.media_assets["screenshots"])
+        q = (
+            select(AppReleaseDAO.uuid, size)
+            .join(AppDAO, AppReleaseDAO.game_id == AppDAO.id)
+            .where(AppReleaseDAO.is_visible.is_(True))
+        )
+        releases = [sqldb.session.execute(q.order_by(order).limit(1)).first() for order in (size.asc(), size.desc())]
+        if None in releases or releases[0][1] == releases[1][1]:
+            pytest.skip("no releases with different numbers of companies/screenshots")
+        for uuid, _ in releases:
+            with count_queries() as counter:
+                load_app_release(uuid)
+            assert counter.count == 1, uuid
+        with count_queries() as counter:
+            assert len(load_app_releases([uuid for uuid, _ in releases])) == 2
+        assert counter.count == 1
+
+
+@pytest.mark.unit
+class TestSearchCursor:
+    def test_cursor_roundtrip(self):
+        cursor = encode_cursor("name", ["Monkey Island", "uuid-1"])
+        assert decode_cursor(cursor, "name", ((str, type(None)), (str,))) == ["Monkey Island", "uuid-1"]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "garbage",
+            "",
+            encode_cursor("ts_added", ["uuid-1"]),  # cursor of a different order
+            encode_cursor("name", ["uuid-1"]),  # too few keys
+            encode_cursor("name", [1, "uuid-1"]),  # wrong key type
+            encode_cursor("name", [True, "uuid-1"]),
+        ],
+    )
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(ValidationError) as e:
+            decode_cursor(cursor, "name", ((str, type(None)), (str,)))
+        assert e.value.messages == {"cursor": ["Invalid cursor."]}
+
+    def test_keyset_filter_expr(self):
+        assert compile_pg(keyset_filter_expr(SearchAppsOrderBy.TS_ADDED, ["u"])) == "games.releases.uuid < 'u'"
+        assert compile_pg(keyset_filter_expr(SearchAppsOrderBy.YEAR_RELEASED, [1990, "u"])) == (
+            "(games.releases.year_released, games.releases.uuid) < (1990, 'u')"
+        )
+        # rows with null year come first (desc)
+        assert compile_pg(keyset_filter_expr(SearchAppsOrderBy.YEAR_RELEASED, [None, "u"])) == (
+            "games.releases.year_released IS NOT NULL "
+            "OR games.releases.year_released IS NULL AND games.releases.uuid < 'u'"
+        )
+        assert compile_pg(keyset_filter_expr(SearchAppsOrderBy.NAME, ["n", "u"])) == (
+            "games.releases.name >= 'n' AND (games.releases.name > 'n' OR games.releases.uuid < 'u') "
+            "OR games.releases.name IS NULL"
+        )
+        # rows with null name come last (asc)
+        assert compile_pg(keyset_filter_expr(SearchAppsOrderBy.NAME, [None, "u"])) == (
+            "games.releases.name IS NULL AND games.releases.uuid < 'u'"
+        )
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_cursor(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = make_search_rows(3)
+        res = search_apps(SearchAppsRequestDTO(order_by=SearchAppsOrderBy.YEAR_RELEASED, offset=5, limit=3))
+        assert "OFFSET 5" in compile_pg(mock_execute.call_args.args[0])
+        assert res.next_cursor == encode_cursor("year_released", [None, "uuid-2"])
+
+        # next page seeks past the last row instead of skipping rows
+        mock_execute.return_value.all.return_value = make_search_rows(2)
+        res = search_apps(
+            SearchAppsRequestDTO(order_by=SearchAppsOrderBy.YEAR_RELEASED, offset=5, limit=3, cursor=res.next_cursor)
+        )
+        stmt = compile_pg(mock_execute.call_args.args[0])
+        assert "OFFSET" not in stmt
+        assert "games.releases.year_released IS NOT NULL OR games.releases.year_released IS NULL" in stmt
+        # last page
+        assert len(res.apps) == 2 and res.next_cursor is None
+
+        with pytest.raises(ValidationError):
+            search_apps(SearchAppsRequestDTO(order_by=SearchAppsOrderBy.NAME, cursor=res.next_cursor or "x"))
+
+    @patch(
+        "appsvc.biz.app.get_user_profile",
+        return_value=UserProfile(age_mode=AgeMode.TEEN, apps_lib=AppsLib(favorite_games=list(range(10)))),
+    )
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_by_my_stuff_offset_cursor(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = make_search_rows(4, uuid=False)
+        req = SearchAppsRequestDTO(my_stuff=MyStuffType.FAVORITES, user_id=TEST_USER_ID + 1, offset=2, limit=4)
+        res = search_apps(req)
+        assert res.next_cursor == encode_cursor("favorites", [6])
+        res = search_apps(
+            SearchAppsRequestDTO(
+                my_stuff=MyStuffType.FAVORITES, user_id=TEST_USER_ID + 1, limit=4, cursor=res.next_cursor
+            )
+        )
+        assert "OFFSET 6" in compile_pg(mock_execute.call_args.args[0])
+
+
+@pytest.mark.unit
+class TestDcRanking:
+    def setup_method(self):
+        dc_ranking_cache.clear()
+
+    def teardown_method(self):
+        dc_ranking_cache.clear()
+
+    @patch("appsvc.biz.app.DATA_CENTERS", TEST_DATA_CENTERS)
+    @patch("appsvc.biz.app.sqldb.session.query")
+    def test_cached_ranking(self, mock_query):
+        mock_query.return_value.filter.return_value.first.return_value = UsersDcsDAO(
+            user_id=1, dcs={"us-west-1": [0.037, 0.045]}
+        )
+        assert get_user_preferred_dcs(1) == ["us-west-1", "us-east-1", "eu-central-1"]
+        assert get_user_preferred_dcs(1) == ["us-west-1", "us-east-1", "eu-central-1"]
+        assert mock_query.call_count == 1
+
+        # new samples are written through
+        update_dc_ranking(1, {"us-west-1": [0.037, 0.045], "eu-central-1": [0.01]})
+        assert get_user_preferred_dcs(1) == ["eu-central-1", "us-west-1", "us-east-1"]
+        assert mock_query.call_count == 1
+
+        update_dc_ranking(1)
+        assert get_user_preferred_dcs(1) == ["us-west-1", "us-east-1", "eu-central-1"]
+        assert mock_query.call_count == 2
+
+    @patch("appsvc.biz.app.DATA_CENTERS", TEST_DATA_CENTERS)
+    @patch("appsvc.biz.app.DC_RANKING_WARMUP_SIZE", 100)
+    @patch("appsvc.biz.app.sqldb.session.query")
+    def test_warmup(self, mock_query):
+        UserDcsRow = namedtuple("UserDcsRow", ["user_id", "dcs"])
+        mock_query.return_value.filter.return_value.all.return_value = [
+            UserDcsRow(1, {"eu-central-1": [0.01]}),
+            UserDcsRow(2, {"us-east-1": [0.01]}),
+        ]
+        assert warmup_dc_rankings([1, 2, 3]) == 3
+        assert mock_query.call_count == 1
+        assert get_user_preferred_dcs(1)[0] == "eu-central-1"
+        assert get_user_preferred_dcs(2)[0] == "us-east-1"
+        # no samples
+        assert get_user_preferred_dcs(3) == TEST_DATA_CENTERS
+        assert mock_query.call_count == 1
+
+        mock_query.return_value.order_by.return_value.limit.return_value.all.return_value = [
+            UserDcsRow(4, {"us-west-1": [0.01]})
+        ]
+        assert warmup_dc_rankings() == 1
+        mock_query.return_value.order_by.return_value.limit.assert_called_once_with(100)
+        # the most recently active users
+        assert [str(c) for c in mock_query.return_value.order_by.call_args.args] == [
+            "stats.users_dcs.updated_at DESC",
+            "stats.users_dcs.id DESC",
+        ]
+        assert get_user_preferred_dcs(4)[0] == "us-west-1"
+        assert mock_query.call_count == 2
+
+
+def make_user_row(age: int, apps_lib: dict | None = None):
+    UserRow = namedtuple("UserRow", ["dob", "apps_lib"])
+    return UserRow(dob=datetime.date.today().replace(year=datetime.date.today().year - age - 1), apps_lib=apps_lib)
+
+
+@pytest.mark.unit
+class TestUserProfile:
+    def setup_method(self):
+        user_profile_cache.clear()
+
+    def teardown_method(self):
+        user_profile_cache.clear()
+
+    @patch("appsvc.biz.app.sqldb.session.query")
+    def test_age_mode(self, mock_query):
+        assert get_age_mode(None) == AgeMode.TEEN
+        for user_id, (age, age_mode) in enumerate([(8, AgeMode.KID), (15, AgeMode.TEEN), (30, AgeMode.ADULT)], 1):
+            mock_query.return_value.filter.return_value.first.return_value = make_user_row(age)
+            assert get_age_mode(user_id) == age_mode
+        # unknown user
+        mock_query.return_value.filter.return_value.first.return_value = None
+        assert get_age_mode(100) == AgeMode.TEEN
+
+    @patch("appsvc.biz.app.sqldb.session.query")
+    def test_profile_cache(self, mock_query):
+        mock_query.return_value.filter.return_value.first.return_value = make_user_row(
+            30, {"favorite_games": [1, 2], "recently_played_games": [2]}
+        )
+        profile = get_user_profile(1)
+        assert profile == UserProfile(
+            age_mode=AgeMode.ADULT, apps_lib=AppsLib(favorite_games=[1, 2], recently_played_games=[2])
+        )
+        assert get_user_profile(1) is profile
+        assert mock_query.call_count == 1
+
+        invalidate_user_profile(1)
+        get_user_profile(1)
+        assert mock_query.call_count == 2
+
+    @patch("appsvc.biz.app.sqldb.session.query")
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_user_fetched_once_per_request(self, mock_execute, mock_query):
+        mock_query.return_value.filter.return_value.first.return_value = make_user_row(
+            10, {"favorite_games": [1, 2], "recently_played_games": []}
+        )
+        mock_execute.return_value.all.return_value = []
+        with patch.object(user_profile_cache, "max_size", 0):
+            with Flask(__name__).app_context():
+                # age mode and apps library of my_stuff searches come from the same profile
+                search_apps(SearchAppsRequestDTO(my_stuff=MyStuffType.FAVORITES, user_id=1))
+                search_apps(SearchAppsRequestDTO(user_id=1))
+                assert mock_query.call_count == 1
+                invalidate_user_profile(1)
+                search_apps(SearchAppsRequestDTO(user_id=1))
+                assert mock_query.call_count == 2
+            with Flask(__name__).app_context():
+                search_apps(SearchAppsRequestDTO(user_id=1))
+                assert mock_query.call_count == 3
+
+
+@pytest.mark.unit
+class TestSearchResultCache:
+    def setup_method(self):
+        search_result_cache.clear()
+
+    def teardown_method(self):
+        search_result_cache.clear()
+
+    def test_cache_key(self):
+        assert search_cache_key(SearchAppsRequestDTO(app_name="Monkey", lang="en"), AgeMode.KID) == search_cache_key(
+            SearchAppsRequestDTO(app_name="monkey", publisher_name="x", user_id=1), AgeMode.KID
+        )
+        assert search_cache_key(SearchAppsRequestDTO(), AgeMode.KID) != search_cache_key(
+            SearchAppsRequestDTO(), AgeMode.TEEN
+        )
+        # offset is ignored with a cursor
+        assert search_cache_key(SearchAppsRequestDTO(offset=10, cursor="c"), AgeMode.KID) == search_cache_key(
+            SearchAppsRequestDTO(cursor="c"), AgeMode.KID
+        )
+
+    @patch("appsvc.biz.app.get_age_mode", side_effect=lambda user_id: AgeMode.ADULT if user_id else AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_cached_per_age_mode(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = make_search_rows(2)
+        with patch.object(search_result_cache, "max_size", 100):
+            res = search_apps(SearchAppsRequestDTO(lang="en"))
+            # other adult users share the entry
+            assert search_apps(SearchAppsRequestDTO(lang="en", user_id=1)) is not res
+            assert search_apps(SearchAppsRequestDTO(lang="en", user_id=2)) == res
+            assert search_apps(SearchAppsRequestDTO(lang="en")) is res
+            assert mock_execute.call_count == 2
+
+    @patch(
+        "appsvc.biz.app.get_user_profile",
+        return_value=UserProfile(age_mode=AgeMode.TEEN, apps_lib=AppsLib(favorite_games=[1, 2])),
+    )
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_my_stuff_is_not_cached(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = make_search_rows(2, uuid=False)
+        with patch.object(search_result_cache, "max_size", 100):
+            for _ in range(2):
+                search_apps(SearchAppsRequestDTO(my_stuff=MyStuffType.FAVORITES, user_id=1))
+        assert mock_execute.call_count == 2
+        assert search_result_cache.stats()["size"] == 0
+
+
+def make_section_rows(sections: dict[int, int]) -> list:
+    """Rows of a combined (UNION ALL) statement: section -> number of rows."""
+    SectionRow = namedtuple("SectionRow", ["section", "pos", *make_search_rows(1)[0]._fields])
+    return [
+        SectionRow(section, pos + 1, *r) for section, n in sections.items() for pos, r in enumerate(make_search_rows(n))
+    ]
+
+
+@pytest.mark.unit
+class TestSearchBatch:
+    def setup_method(self):
+        search_result_cache.clear()
+
+    def teardown_method(self):
+        search_result_cache.clear()
+
+    @patch(
+        "appsvc.biz.app.get_user_profile",
+        return_value=UserProfile(age_mode=AgeMode.KID, apps_lib=AppsLib(favorite_games=[1, 2])),
+    )
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_sections_fetched_with_single_statement(self, mock_execute, mock_get_user_profile):
+        mock_execute.return_value.__iter__.return_value = iter(make_section_rows({0: 2, 2: 3}))
+        req = SearchAppsBatchRequestDTO(
+            sections=[
+                SearchAppsRequestDTO(order_by=SearchAppsOrderBy.TS_ADDED, limit=2),
+                SearchAppsRequestDTO(lang="xx", user_id=100),
+                SearchAppsRequestDTO(my_stuff=MyStuffType.FAVORITES, limit=5),
+            ],
+            user_id=1,
+        )
+        res = search_apps_batch(req)
+        assert mock_execute.call_count == 1
+        stmt = compile_pg(mock_execute.call_args.args[0])
+        assert stmt.count("UNION ALL") == 2
+        assert stmt.endswith("ORDER BY section, pos")
+        # rows are numbered in the order of their pages
+        assert "row_number() OVER (ORDER BY games.releases.uuid DESC) AS pos" in stmt
+        assert [len(r.apps) for r in res] == [2, 0, 3]
+        assert res[0].next_cursor is not None and res[2].next_cursor is None
+        # sections are searched on behalf of the batch user
+        assert {c.args for c in mock_get_user_profile.call_args_list} == {(1,)}
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_cached_sections_skip_db(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = make_search_rows(2)
+        with patch.object(search_result_cache, "max_size", 100):
+            cached = search_apps(SearchAppsRequestDTO(lang="en"))
+            assert mock_execute.call_count == 1
+            res = search_apps_batch(
+                SearchAppsBatchRequestDTO(
+                    sections=[SearchAppsRequestDTO(lang="en"), SearchAppsRequestDTO(app_name="monkey")]
+                )
+            )
+            assert res[0] is cached
+            # a single uncached section is fetched with its own statement and gets cached
+            assert mock_execute.call_count == 2
+            assert "UNION" not in compile_pg(mock_execute.call_args.args[0])
+            assert search_apps(SearchAppsRequestDTO(app_name="monkey")) is res[1]
+            assert mock_execute.call_count == 2
+
+
+def make_run_app_req(user_id: int = 1) -> RunAppRequestDTO:
+    return RunAppRequestDTO(
+        app_release_uuid=TEST_RELEASE_UUID,
+        user_id=user_id,
+        ws_conn=WsConnDC(consumer_id=f"consumer{user_id}", id=f"ws{user_id}"),
+        preferred_dcs=["eu-central-1"],
+    )
+
+
+def make_run_container_res(container_id: str = "c1", node_id: str = "n1") -> RunContainerResponseDTO:
+    return RunContainerResponseDTO(
+        node=RunContainerResponseDTO.NodeDescr(id=node_id, api_uri=f"http://{node_id}", region=DcRegion.US_EAST_1),
+        container=RunContainerResponseDTO.ContainerDescr(id=container_id, cpuset_cpus=[0, 1]),
+    )
+
+
+@pytest.mark.unit
+class TestLaunchPlan:
+    def setup_method(self):
+        launch_plan_cache.clear()
+
+    def teardown_method(self):
+        launch_plan_cache.clear()
+
+    def test_request_body(self):
+        ws_conn = WsConnDC(consumer_id="c1", id="w1")
+        for runner, color_bits in [("dosbox", 8), ("wine", 16), ("qemu", 32)]:
+            r = make_release_dao(2)
+            r.runner = {"name": runner, "ver": None}
+            r.app_reqs = {**r.app_reqs, "color_bits": color_bits}
+            app_release = make_app_release_details(r, [])
+            body = get_launch_plan(app_release).request_body(7, ["us-east-1", "us-west-1"], ws_conn)
+            expected = make_run_container_request(app_release, 7, ["us-east-1", "us-west-1"], ws_conn)
+            assert json.loads(body) == codec_for(RunContainerRequestDTO).dump(expected)
+
+    def test_invalidation(self):
+        app_release = make_app_release_details(make_release_dao(1), [])
+        plan = get_launch_plan(app_release)
+        assert get_launch_plan(app_release) is plan
+        # release reloaded
+        reloaded = make_app_release_details(make_release_dao(1), [])
+        plan = get_launch_plan(reloaded)
+        assert plan.app_release is reloaded
+        assert get_launch_plan(reloaded) is plan
+        # runner config changed
+        with patch.dict("appsvc.biz.app.RUNNERS_CONF", {"dosbox": {"ver": "0.75", "window_system": "x11"}}):
+            body = json.loads(get_launch_plan(reloaded).request_body(1, [], WsConnDC(consumer_id="c", id="w")))
+            assert body["reqs"]["container"]["runner"]["ver"] == "0.75"
+        plan = get_launch_plan(reloaded)
+        assert plan.runner_conf is RUNNERS_CONF["dosbox"]
+        # streamd requirements changed
+        with patch("appsvc.biz.app.STREAMD_REQS", {**STREAMD_REQS, "memory": 1 << 30}):
+            assert get_launch_plan(reloaded) is not plan
+
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+    @patch("appsvc.biz.app.get_app_release")
+    def test_run_app(self, mock_get_app_release, mock_run_container_json):
+        mock_get_app_release.return_value = make_app_release_details(make_release_dao(1), [])
+        mock_run_container_json.return_value = make_run_container_res()
+        for user_id in (1, 2):
+            res = run_app(make_run_app_req(user_id))
+            assert res.container.id == "c1" and res.container.node_id == "n1"
+            body = json.loads(mock_run_container_json.call_args.args[0])
+            assert body["user_id"] == user_id
+            assert body["ws_conn"] == {"consumer_id": f"consumer{user_id}", "id": f"ws{user_id}"}
+            assert body["preferred_dcs"] == ["eu-central-1"]
+        assert launch_plan_cache.stats()["size"] == 1
+
+
+@pytest.mark.unit
+@pytest.mark.usefixtures("launches")
+@patch("appsvc.biz.app.get_app_release", return_value=make_app_release_details(make_release_dao(1), []))
+class TestRunAppAsync:
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+    def test_launch(self, mock_run_container_json, _):
+        started, proceed = threading.Event(), threading.Event()
+
+        def run_container_json(body: str) -> RunContainerResponseDTO:
+            started.set()
+            proceed.wait(5)
+            return make_run_container_res()
+
+        mock_run_container_json.side_effect = run_container_json
+        launch = run_app_async(make_run_app_req())
+        assert launch.status == RunAppLaunchStatus.PENDING
+        assert started.wait(5)
+        assert get_launch(launch.id).status == RunAppLaunchStatus.PENDING
+
+        events = watch_launch(launch.id, timeout=5, interval=0.01)
+        assert next(events).status == RunAppLaunchStatus.PENDING
+        proceed.set()
+        completed = next(events)
+        assert completed.status == RunAppLaunchStatus.SUCCEEDED
+        assert completed.result.container.id == "c1" and completed.result.container.node_id == "n1"
+        assert list(events) == []
+        assert get_launch(launch.id) == completed
+
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json", side_effect=JukeboxSvcException("no capacity"))
+    def test_failed_launch(self, *_):
+        launch = run_app_async(make_run_app_req())
+        *_, completed = watch_launch(launch.id, timeout=5, interval=0.01)
+        assert completed.status == RunAppLaunchStatus.FAILED
+        assert completed.error.code == 1409 and completed.error.message == "no capacity"
+
+    @patch("appsvc.biz.app.launch_slots", threading.BoundedSemaphore(1))
+    @patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+    def test_pending_launches_limit(self, mock_run_container_json, _):
+        proceed = threading.Event()
+        mock_run_container_json.side_effect = lambda body: proceed.wait(5) and make_run_container_res()
+        launch = run_app_async(make_run_app_req())
+        with pytest.raises(AppLaunchesLimitException):
+            run_app_async(make_run_app_req())
+        proceed.set()
+        *_, completed = watch_launch(launch.id, timeout=5, interval=0.01)
+        assert completed.status == RunAppLaunchStatus.SUCCEEDED
+        # the slot is free again
+        launch = run_app_async(make_run_app_req())
+        *_, completed = watch_launch(launch.id, timeout=5, interval=0.01)
+        assert completed.status == RunAppLaunchStatus.SUCCEEDED
+
+    def test_unknown_launch(self, _):
+        with pytest.raises(AppLaunchNotFoundException):
+            get_launch("missing")
+
+
+@pytest.mark.unit
+@patch("appsvc.biz.app.RUN_APP_HEDGE_ENABLED", True)
+@patch("appsvc.biz.app.get_app_release", return_value=make_app_release_details(make_release_dao(1), []))
+class TestRunAppHedged:
+    def setup_method(self):
+        # hedges are issued after 0.2s
+        self.hedger = Hedger(
+            ThreadPoolExecutor(max_workers=4), percentile=90, window=10, min_samples=10, min_delay=0, default_delay=0.2
+        )
+        self.patcher = patch("appsvc.biz.app.hedger", self.hedger)
+        self.patcher.start()
+
+    def teardown_method(self):
+        self.patcher.stop()
+
+    def make_req(self, user_id: int = 1) -> RunAppRequestDTO:
+        req = make_run_app_req(user_id)
+        req.preferred_dcs = ["eu-central-1", "us-west-1"]
+        return req
+
+    def test_fast_primary(self, _, jukeboxsvc_stub):
+        res = run_app(self.make_req())
+        assert res.container.id == "container-eu-central-1"
+        assert jukeboxsvc_stub.runs == [["eu-central-1", "us-west-1"]]
+        assert self.hedger.stats()["hedged"] == 0
+
+    def test_slow_primary(self, _, jukeboxsvc_stub):
+        jukeboxsvc_stub.delays["eu-central-1"] = 1
+        started = time.monotonic()
+        res = run_app(self.make_req())
+        assert time.monotonic() - started < 0.8
+        assert res.container.id == "container-us-west-1" and res.container.node_id == "node-us-west-1"
+        # the hedge is restricted to the next DC
+        assert jukeboxsvc_stub.runs == [["eu-central-1", "us-west-1"], ["us-west-1"]]
+        # the container of the primary launch is stopped once it's up
+        assert jukeboxsvc_stub.wait_stopped(1)
+        assert jukeboxsvc_stub.stopped == [("node-eu-central-1", "container-eu-central-1")]
+        stats = self.hedger.stats()
+        assert stats["hedged"] == stats["hedge_wins"] == stats["losers"] == 1
+        assert 0.5 < stats["saved_s"] < 1
+
+    def test_slow_hedge(self, _, jukeboxsvc_stub):
+        jukeboxsvc_stub.delays.update({"eu-central-1": 0.4, "us-west-1": 1})
+        assert run_app(self.make_req()).container.id == "container-eu-central-1"
+        assert jukeboxsvc_stub.wait_stopped(1)
+        assert jukeboxsvc_stub.stopped == [("node-us-west-1", "container-us-west-1")]
+        assert self.hedger.stats()["hedge_wins"] == 0
+
+    def test_failing_primary(self, _, jukeboxsvc_stub):
+        jukeboxsvc_stub.delays["eu-central-1"] = 0.4
+        jukeboxsvc_stub.failing.add("eu-central-1")
+        assert run_app(self.make_req()).container.id == "container-us-west-1"
+        time.sleep(0.5)  # the primary fails after the hedge won
+        assert self.hedger.stats()["rescued"] == 1
+        jukeboxsvc_stub.failing.add("us-west-1")
+        with pytest.raises(AppOpException, match="no capacity in eu-central-1"):
+            run_app(self.make_req(2))
+        assert not jukeboxsvc_stub.stopped
+
+    def test_single_dc(self, _, jukeboxsvc_stub):
+        jukeboxsvc_stub.delays["eu-central-1"] = 0.4
+        assert run_app(make_run_app_req()).container.id == "container-eu-central-1"
+        assert self.hedger.stats()["calls"] == 0
+
+
+@pytest.mark.unit
+@patch("appsvc.biz.app.STANDBY_POOL_ENABLED", True)
+@patch("appsvc.biz.app.STANDBY_POOL_SUPPORTED", True)  # the pool as it's to work once jukeboxsvc supports it
+@patch("appsvc.biz.app.get_app_release", return_value=make_app_release_details(make_release_dao(1), []))
+class TestRunAppStandby:
+    def setup_method(self):
+        self.pool = StandbyPool(
+            hot=1,
+            per_release=1,
+            min_launches=0.5,  # a launch a moment ago
+            ttl=600,
+            memory_budget=8 * 1024 * 1024 * 1024,
+            half_life=3600,
+            start=start_standby_container,
+            memory=standby_container_memory,
+            stop=stop_standby_container,
+        )
+        self.patcher = patch("appsvc.biz.app.standby_pool", self.pool)
+        self.patcher.start()
+
+    def teardown_method(self):
+        self.patcher.stop()
+
+    def test_claim(self, _, jukeboxsvc_stub):
+        assert run_app(make_run_app_req(1)).container.id == "container-eu-central-1"
+        self.pool.refill()
+        # started on behalf of no user and paused
+        assert jukeboxsvc_stub.runs == [["eu-central-1"], ["eu-central-1"]]
+        assert jukeboxsvc_stub.paused == [("node-eu-central-1", "container-eu-central-1")]
+
+        res = run_app(make_run_app_req(2))
+        assert res.container.id == "container-eu-central-1" and res.container.region == DcRegion.EU_CENTRAL_1
+        assert len(jukeboxsvc_stub.runs) == 2
+        assert jukeboxsvc_stub.resumed == [
+            ("node-eu-central-1", "container-eu-central-1", {"consumer_id": "consumer2", "id": "ws2"})
+        ]
+        assert self.pool.stats()["hits"] == 1
+
+    def test_not_supported(self, _, jukeboxsvc_stub):
+        run_app(make_run_app_req(1))
+        self.pool.refill()
+        with (
+            patch("appsvc.biz.app.STANDBY_POOL_SUPPORTED", False),
+            patch("appsvc.biz.app.threading.Thread") as mock_thread,
+        ):
+            start_standby_pool(Flask(__name__))
+            mock_thread.assert_not_called()
+            # standby containers are never given to users: they'd stay owned by no one
+            assert run_app(make_run_app_req(2)).container.id == "container-eu-central-1"
+        assert len(jukeboxsvc_stub.runs) == 3 and jukeboxsvc_stub.resumed == []
+
+    @pytest.mark.usefixtures("launches")
+    def test_claim_async(self, _, jukeboxsvc_stub):
+        run_app(make_run_app_req(1))
+        self.pool.refill()
+        # DCs are resolved in the request only (launch executor threads have no app context)
+        with patch("appsvc.biz.app.get_launch_dcs", wraps=get_launch_dcs) as mock_get_launch_dcs:
+            launch = run_app_async(make_run_app_req(2))
+            for _ in range(50):
+                if get_launch(launch.id).status != RunAppLaunchStatus.PENDING:
+                    break
+                time.sleep(0.05)
+            assert mock_get_launch_dcs.call_count == 1
+        assert get_launch(launch.id).result.container.id == "container-eu-central-1"
+        assert len(jukeboxsvc_stub.runs) == 2 and len(jukeboxsvc_stub.resumed) == 1
+
+    @patch("appsvc.biz.app.jukeboxsvc.resume_container", side_effect=JukeboxSvcException("gone"))
+    def test_resume_failure(self, _, __, jukeboxsvc_stub):
+        run_app(make_run_app_req(1))
+        self.pool.refill()
+        # the container is stopped, the app is launched in a new one
+        assert run_app(make_run_app_req(2)).container.id == "container-eu-central-1"
+        assert len(jukeboxsvc_stub.runs) == 3
+        assert jukeboxsvc_stub.stopped == [("node-eu-central-1", "container-eu-central-1")]
+
+
+@pytest.mark.unit
+class TestContainersOps:
+    def test_stop_apps(self, jukeboxsvc_stub):
+        jukeboxsvc_stub.failing_nodes.add("n3")
+        containers = [
+            ContainerOpDescr(id="c1", node_id="n1"),
+            ContainerOpDescr(id="gone", node_id="n1"),
+            ContainerOpDescr(id="c2", node_id="n2"),
+            ContainerOpDescr(id="c3", node_id="n3"),
+        ]
+        res = stop_apps(ContainersOpRequestDTO(containers=containers))
+        assert [item.container for item in res.containers] == containers
+        # not found containers are stopped already
+        assert [item.error for item in res.containers][:3] == [None, None, None]
+        assert res.containers[3].error.code == 1409 and "node n3 failed" in res.containers[3].error.message
+        assert sorted(jukeboxsvc_stub.stopped) == [("n1", "c1"), ("n2", "c2")]
+
+    @patch("appsvc.biz.app.CONTAINERS_OP_NODE_CONCURRENCY", 4)
+    def test_fan_out(self, jukeboxsvc_stub):
+        jukeboxsvc_stub.op_delay = 0.1
+        containers = [ContainerOpDescr(id=f"c{i}", node_id=f"n{i % 3}") for i in range(24)]
+        started = time.monotonic()
+        res = pause_apps(ContainersOpRequestDTO(containers=containers))
+        # 8 containers per node, 4 at a time
+        assert time.monotonic() - started < 0.5
+        assert all(item.error is None for item in res.containers)
+        assert len(jukeboxsvc_stub.paused) == 24
+        assert jukeboxsvc_stub.max_ops_in_flight == {"n0": 4, "n1": 4, "n2": 4}
+
+
+@pytest.mark.unit
+@patch("appsvc.biz.app.RUN_APP_IDEMPOTENCY_ENABLED", True)  # launches without an Idempotency-Key are deduplicated too
+@patch("appsvc.biz.app.get_app_release", return_value=make_app_release_details(make_release_dao(1), []))
+@patch("appsvc.biz.app.jukeboxsvc.run_container_json")
+class TestRunAppIdempotent:
+    def test_coalescing(self, mock_run_container_json, _, run_app_keys):
+        coalesced = run_app_key_stats.coalesced
+        replayed = run_app_key_stats.replayed
+        proceed = threading.Event()
+        mock_run_container_json.side_effect = lambda body: proceed.wait(5) and make_run_container_res()
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(run_app, make_run_app_req()) for _ in range(3)]
+            time.sleep(0.3)
+            proceed.set()
+            results = [f.result() for f in futures]
+        assert mock_run_container_json.call_count == 1
+        assert results[0] == results[1] == results[2]
+        assert run_app_key_stats.coalesced - coalesced == 2
+        # a retry gets the same result
+        assert run_app(make_run_app_req()) == results[0]
+        assert run_app_key_stats.replayed - replayed == 1
+        assert mock_run_container_json.call_count == 1
+        # a launch of another ws connection is not coalesced
+        req = make_run_app_req()
+        req.ws_conn.id = "ws-other"
+        run_app(req)
+        assert mock_run_container_json.call_count == 2
+        assert run_app_keys.stats()["size"] == 3  # 2 keys, the index entry of their (same) container
+
+    def test_window(self, mock_run_container_json, _, run_app_keys):
+        timer = FakeTimer()
+        mock_run_container_json.return_value = make_run_container_res()
+        with patch("appsvc.biz.app.run_app_keys", KVStore(run_app_keys.path, "test", ttl=30, timer=timer)):
+            run_app(make_run_app_req())
+            timer.now = 29
+            run_app(make_run_app_req())
+            assert mock_run_container_json.call_count == 1
+            timer.now = 30
+            run_app(make_run_app_req())
+            assert mock_run_container_json.call_count == 2
+
+    def test_failure(self, mock_run_container_json, *_):
+        mock_run_container_json.side_effect = JukeboxSvcException("no capacity")
+        with pytest.raises(AppOpException):
+            run_app(make_run_app_req())
+        # failed launches are retried
+        mock_run_container_json.side_effect = None
+        mock_run_container_json.return_value = make_run_container_res()
+        assert run_app(make_run_app_req()).container.id == "c1"
+        assert mock_run_container_json.call_count == 2
+
+    def test_idempotency_key(self, mock_run_container_json, *_):
+        mock_run_container_json.return_value = make_run_container_res()
+        for user_id, ws_conn_id in ((1, "ws1"), (1, "ws2"), (2, "ws1")):
+            req = make_run_app_req(user_id)
+            req.ws_conn.id = ws_conn_id
+            run_app(req, "key1")
+        # keys are scoped by user
+        assert mock_run_container_json.call_count == 2
+        with patch("appsvc.biz.app.RUN_APP_IDEMPOTENCY_ENABLED", False):
+            run_app(make_run_app_req())
+            run_app(make_run_app_req())
+        assert mock_run_container_json.call_count == 4
+
+    def test_workers(self, mock_run_container_json, _, run_app_keys):
+        """The launch of another worker (store connection) is waited for."""
+        mock_run_container_json.return_value = make_run_container_res("c2")
+        other_worker = KVStore(run_app_keys.path, run_app_keys.table, ttl=30)
+        key = run_app_key(make_run_app_req(), None)
+        assert other_worker.add(key, RUN_APP_KEY_PENDING)
+        res = RunAppResponseDTO(
+            container=ContainerDescr(id="c1", node_id="n1", region=DcRegion.US_EAST_1, cpuset_cpus=[0, 1])
+        )
+        data = json.dumps(codec_for(RunAppResponseDTO).dump(res))
+        threading.Timer(0.3, lambda: other_worker.put(key, data)).start()
+        assert run_app(make_run_app_req()).container.id == "c1"
+        assert mock_run_container_json.call_count == 0
+
+    @patch("appsvc.biz.app.jukeboxsvc.stop_container")
+    def test_rerun_after_stop(self, _, mock_run_container_json, __, run_app_keys):
+        mock_run_container_json.side_effect = [make_run_container_res(f"c{i}") for i in range(1, 6)]
+        for idempotency_key in (None, "key1"):
+            container = run_app(make_run_app_req(), idempotency_key).container
+            stop_app(StopAppRequestDTO(container=ContainerOpDescr(id=container.id, node_id=container.node_id)))
+            # a relaunch right after the stop gets a new container
+            assert run_app(make_run_app_req(), idempotency_key).container.id != container.id
+        # stopped in bulk
+        stop_apps(ContainersOpRequestDTO(containers=[ContainerOpDescr(id="c4", node_id="n1")]))
+        assert run_app(make_run_app_req(), "key1").container.id == "c5"
+        assert mock_run_container_json.call_count == 5
+        assert run_app_keys.stats()["size"] == 4  # keys of c2 and c5, and their index entries
+
+    @pytest.mark.usefixtures("launches")
+    def test_async(self, mock_run_container_json, *_):
+        mock_run_container_json.return_value = make_run_container_res()
+        launch = run_app_async(make_run_app_req())
+        assert run_app_async(make_run_app_req()).id == launch.id
+        for _ in range(50):
+            if get_launch(launch.id).status == RunAppLaunchStatus.SUCCEEDED:
+                break
+            time.sleep(0.05)
+        assert run_app_async(make_run_app_req()).result.container.id == "c1"
+        assert mock_run_container_json.call_count == 1
+        # relaunched once stopped
+        with patch("appsvc.biz.app.jukeboxsvc.stop_container"):
+            stop_app(StopAppRequestDTO(container=ContainerOpDescr(id="c1", node_id="n1")))
+        relaunch = run_app_async(make_run_app_req())
+        assert relaunch.id != launch.id
+        for _ in range(50):
+            if get_launch(relaunch.id).status == RunAppLaunchStatus.SUCCEEDED:
+                break
+            time.sleep(0.05)
+        assert mock_run_container_json.call_count == 2
@@ -0,0 +1,139 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from appsvc.biz.app import (
+    completions_engine,
+    favorites_counts_cache,
+    load_completions,
+    search_apps_acl,
+)
+from appsvc.biz.autocomplete import (
+    Autocomplete,
+    AutocompleteEntry,
+    Completions,
+)
+from appsvc.biz.dto import (
+    AgeMode,
+    SearchAppsAclRequestDTO,
+)
+
+ALL_AGE_MODES = {AgeMode.KID, AgeMode.TEEN, AgeMode.ADULT}
+
+
+def make_index() -> Autocomplete:
+    return Autocomplete(
+        [
+            AutocompleteEntry("The Secret of Monkey Island", ALL_AGE_MODES, popularity=10),
+            AutocompleteEntry("Monkey Island 2: LeChuck's Revenge", ALL_AGE_MODES, popularity=5),
+            AutocompleteEntry("Donkey Kong", ALL_AGE_MODES, popularity=100),
+            AutocompleteEntry("Monkeys Attack", {AgeMode.ADULT}, popularity=50),
+            AutocompleteEntry("monkey island 2: lechuck's revenge", {AgeMode.TEEN, AgeMode.ADULT}, popularity=7),
+            AutocompleteEntry("Leisure Suit Larry", {AgeMode.ADULT}, popularity=1),
+        ]
+    )
+
+
+@pytest.mark.unit
+class TestAutocomplete:
+    def test_rank(self):
+        index = make_index()
+        # word prefix matches first (by popularity), then infix ones
+        assert index.complete("monk", AgeMode.ADULT, 10) == [
+            "Monkeys Attack",
+            "The Secret of Monkey Island",
+            "Monkey Island 2: LeChuck's Revenge",
+        ]
+        assert index.complete("onkey", AgeMode.ADULT, 10) == [
+            "Donkey Kong",
+            "Monkeys Attack",
+            "The Secret of Monkey Island",
+            "Monkey Island 2: LeChuck's Revenge",
+        ]
+        assert index.complete("KEY", AgeMode.ADULT, 2) == ["Donkey Kong", "Monkeys Attack"]
+        # multi word and longer than the trie depth
+        assert index.complete("monkey island", AgeMode.ADULT, 10) == [
+            "The Secret of Monkey Island",
+            "Monkey Island 2: LeChuck's Revenge",
+        ]
+        assert index.complete("lechuck's", AgeMode.ADULT, 10) == ["Monkey Island 2: LeChuck's Revenge"]
+        assert index.complete("zzz", AgeMode.ADULT, 10) == []
+        # most popular first
+        assert index.complete("", AgeMode.ADULT, 2) == ["Donkey Kong", "Monkeys Attack"]
+
+    def test_age_modes(self):
+        index = make_index()
+        assert index.complete("monk", AgeMode.KID, 10) == [
+            "The Secret of Monkey Island",
+            "Monkey Island 2: LeChuck's Revenge",
+        ]
+        assert "Leisure Suit Larry" not in index.complete("", AgeMode.TEEN, 10)
+
+    def test_merged_entries(self):
+        index = make_index()
+        # entries differing in case are merged: age modes united, the highest popularity kept
+        assert index.size == 5
+        assert index.complete("revenge", AgeMode.KID, 10) == ["Monkey Island 2: LeChuck's Revenge"]
+
+    @patch("appsvc.biz.app.SEARCH_ACL_ENGINE", "memory")
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.KID)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_acl_memory_engine(self, mock_execute, _):
+        completions = Completions(
+            apps=make_index(),
+            publishers=Autocomplete(
+                [
+                    AutocompleteEntry("LucasArts", ALL_AGE_MODES, popularity=15),
+                    AutocompleteEntry("Sierra On-Line", {AgeMode.ADULT}, popularity=1),
+                ]
+            ),
+        )
+        with (
+            patch.object(completions_engine, "catalog", completions),
+            patch.object(completions_engine, "_next_reload_at", float("inf")),
+        ):
+            assert search_apps_acl(SearchAppsAclRequestDTO(app_name="don")) == ["Donkey Kong"]
+            assert search_apps_acl(SearchAppsAclRequestDTO(publisher_name="arts")) == ["LucasArts"]
+            assert search_apps_acl(SearchAppsAclRequestDTO(publisher_name="sierra")) == []
+        mock_execute.assert_not_called()
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_acl_publisher_sql(self, mock_execute, _):
+        mock_execute.return_value.scalars.return_value = ["LucasArts"]
+        assert search_apps_acl(SearchAppsAclRequestDTO(publisher_name="lucas")) == ["LucasArts"]
+        stmt = str(
+            mock_execute.call_args.args[0].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        )
+        assert "games.companies.name ILIKE '%%lucas%%'" in stmt  # pyformat escaping
+        assert "(elem.value ->> 'publisher') = 'true'" in stmt
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_acl_app_name_sql(self, mock_execute, _):
+        mock_execute.return_value.scalars.return_value = ["Monkey Island"]
+        assert search_apps_acl(SearchAppsAclRequestDTO(app_name="monkey")) == ["Monkey Island"]
+        stmt = str(
+            mock_execute.call_args.args[0].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        )
+        assert stmt.startswith("SELECT games.releases.name \nFROM games.releases JOIN games.games")
+        assert "games.releases.name ILIKE '%%monkey%%'" in stmt
+
+    @patch("appsvc.biz.app.sqldb.session.execute", return_value=[])
+    def test_favorites_counts_cached(self, mock_execute):
+        favorites_counts_cache.clear()
+        load_completions()
+        load_completions()
+        # favorites counts, then completions and publishers of every load
+        assert mock_execute.call_count == 5
+        favorites_counts_cache.clear()
+
+
+@pytest.mark.integration
+class TestCompletionsDb:
+    def test_load_completions(self, db_app):
+        completions = load_completions()
+        assert completions.apps.size > 0
+        for query in ("mo", "the", "isl"):
+            assert all(query in name.lower() for name in completions.apps.complete(query, AgeMode.KID, 25))
@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from appsvc.biz.cache import (
+    SingleFlight,
+    TTLCache,
+)
+
+
+class FakeTimer:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.unit
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2, ttl=60)
+        cache.put("1", "a")
+        cache.put("2", "b")
+        assert cache.get("1") == "a"  # "2" becomes the least recently used
+        cache.put("3", "c")
+        assert cache.get("2") is None
+        assert cache.get("1") == "a"
+        assert cache.get("3") == "c"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        cache = TTLCache(max_size=2, ttl=10, timer=timer)
+        cache.put("1", "a")
+        timer.now = 9.9
+        assert cache.get("1") == "a"
+        timer.now = 10
+        assert cache.get("1") is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["expirations"], stats["size"]) == (1, 1, 1, 0)
+
+    def test_aliases(self):
+        cache = TTLCache(max_size=1, ttl=60)
+        cache.put("1", "a", aliases=["uuid-1"])
+        assert cache.get("uuid-1") == "a"
+        cache.invalidate("uuid-1")
+        assert cache.get("1") is None
+        cache.put("1", "a", aliases=["uuid-1"])
+        cache.put("2", "b", aliases=["uuid-2"])
+        # evicted entry takes its aliases along
+        assert cache.get("uuid-1") is None
+        assert cache.get("uuid-2") == "b"
+        assert cache.stats()["size"] == 1
+
+
+@pytest.mark.unit
+class TestSingleFlight:
+    def test_coalescing(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "res"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, "k", fn)
+            started.wait(5)
+            followers = [pool.submit(flight.do, "k", fn) for _ in range(3)]
+            while flight.stats()["coalesced"] < 3:
+                time.sleep(0.001)
+            release.set()
+            assert leader.result() == "res"
+            assert [f.result() for f in followers] == ["res"] * 3
+        assert len(calls) == 1
+        assert flight.stats() == {"calls": 1, "coalesced": 3, "in_flight": 0}
+        # nothing is kept once the call completes
+        assert flight.do("k", lambda: "next") == "next"
+
+    def test_error_is_shared(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fn():
+            started.set()
+            release.wait(5)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "k", fn)
+            started.wait(5)
+            follower = pool.submit(flight.do, "k", fn)
+            while flight.stats()["coalesced"] < 1:
+                time.sleep(0.001)
+            release.set()
+            for f in (leader, follower):
+                with pytest.raises(ValueError):
+                    f.result()
+        assert flight.stats()["in_flight"] == 0
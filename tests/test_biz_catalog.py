@@ -0,0 +1,347 @@
+import random
+import re
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from appsvc.biz.app import (
+    APPS_SEARCH_LIMIT,
+    catalog_engine,
+    keyset_cursor,
+    publisher_index_engine,
+    search_apps,
+)
+from appsvc.biz.catalog import (
+    Catalog,
+    PublisherIndex,
+)
+from appsvc.biz.dto import (
+    AgeMode,
+    SearchAppsOrderBy,
+    SearchAppsRequestDTO,
+)
+
+LANGS = ["en", "de", "fr", "ru"]
+TAGS = ["adventure", "puzzle", "arcade", "kids"]
+WORDS = ["monkey", "island", "broken", "sword", "quest", "space", "king", "larry", "100%", "a_b"]
+
+
+def make_rows(n: int, seed: int = 0) -> list[SimpleNamespace]:
+    rnd = random.Random(seed)
+    rows = [
+        SimpleNamespace(
+            cover_image_id=f"co{i}",
+            esrb_rating=rnd.choice([None, 8, 10, 11]),
+            id=i,
+            lang=rnd.choice(LANGS),
+            # duplicated names check ordering ties
+            name=" ".join(rnd.sample(WORDS, 2)).title() if i % 10 else "Duplicate Name",
+            slug=f"game-{i}",
+            year_released=rnd.choice([None, 1990, 1991, 1995]),
+            platform=rnd.choice(["dos", "win"]),
+            distro_format="zip",
+            tags=[TAGS[i % 3], *([TAGS[3]] if i % 5 == 0 else [])] if i % 4 else None,
+            uuid=str(uuid.UUID(int=rnd.getrandbits(128))),
+            game_name=rnd.choice(WORDS),
+            alternative_names=",".join(rnd.sample(WORDS, rnd.randint(0, 2))) or None,
+            genres=None,
+            is_kid=rnd.random() < 0.3,
+            is_teen=rnd.random() < 0.7,
+        )
+        for i in range(n)
+    ]
+    # same orderings as get_order_by (postgres: desc puts nulls first)
+    for rank, r in enumerate(sorted(rows, key=lambda r: r.uuid, reverse=True), 1):
+        r.rank_ts_added = rank
+    year_desc = sorted(rows, key=lambda r: r.uuid, reverse=True)
+    year_desc.sort(key=lambda r: -1 if r.year_released is None else -r.year_released)
+    for rank, r in enumerate(year_desc, 1):
+        r.rank_year_released = rank
+    name_asc = sorted(rows, key=lambda r: r.uuid, reverse=True)
+    name_asc.sort(key=lambda r: r.name)
+    for rank, r in enumerate(name_asc, 1):
+        r.rank_name = rank
+    # catalog is loaded in ts_added order
+    return sorted(rows, key=lambda r: r.rank_ts_added)
+
+
+def ilike(pattern: str, value: str | None) -> bool:
+    regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in f"%{pattern}%")
+    return value is not None and re.fullmatch(regex, value, re.IGNORECASE | re.DOTALL) is not None
+
+
+def reference_search(rows, age_mode, order_by, offset, limit, app_name=None, lang=None) -> list[int]:
+    res = [
+        r
+        for r in rows
+        if (age_mode == AgeMode.ADULT or (r.is_kid if age_mode == AgeMode.KID else r.is_teen))
+        and (
+            (ilike(app_name, r.name) or ilike(app_name, r.game_name) or ilike(app_name, r.alternative_names))
+            if app_name
+            else (r.lang == lang if lang else True)
+        )
+    ]
+    res.sort(key=lambda r: getattr(r, f"rank_{order_by.value}"))
+    return [r.id for r in res[offset : offset + limit]]
+
+
+@pytest.mark.unit
+class TestCatalog:
+    @pytest.mark.parametrize("size", [0, 1, 50, 1000])
+    def test_search_matches_reference(self, size):
+        rows = make_rows(size)
+        catalog = Catalog(rows)
+        for age_mode in AgeMode:
+            for order_by in SearchAppsOrderBy:
+                for app_name, lang in [
+                    (None, None),
+                    (None, "de"),
+                    (None, "xx"),
+                    ("monkey", None),
+                    ("KEY IS", "de"),
+                    ("a_b", None),
+                    ("y%d", None),
+                    ("100%", None),
+                    ("zzz", None),
+                ]:
+                    for offset, limit in [(0, 10), (5, 3), (0, 200), (size, 10)]:
+                        res = catalog.search(
+                            age_mode, order_by=order_by, offset=offset, limit=limit, app_name=app_name, lang=lang
+                        )
+                        expected = reference_search(rows, age_mode, order_by, offset, limit, app_name, lang)
+                        assert [r.id for r in res] == expected, (age_mode, order_by, app_name, lang, offset)
+
+    @patch("appsvc.biz.app.SEARCH_ENGINE", "memory")
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_memory_engine(self, mock_execute):
+        with (
+            patch.object(catalog_engine, "catalog", Catalog(make_rows(100))),
+            patch.object(catalog_engine, "_next_reload_at", float("inf")),
+        ):
+            res = search_apps(SearchAppsRequestDTO(lang="en", limit=5)).apps
+        assert len(res) == 5 and all(r.lang == "en" for r in res)
+        mock_execute.assert_not_called()
+
+    @pytest.mark.parametrize("order_by", list(SearchAppsOrderBy))
+    def test_keyset_pages_match_reference(self, order_by):
+        rows = make_rows(300)
+        catalog = Catalog(rows)
+        expected = reference_search(rows, AgeMode.TEEN, order_by, 0, len(rows), lang="de")
+        res: list[int] = []
+        after = 0
+        while page := catalog.search(AgeMode.TEEN, order_by=order_by, offset=0, limit=7, lang="de", after=after):
+            res.extend(r.id for r in page)
+            after = catalog.ranks[order_by][catalog.ids.index(page[-1].id)]
+        assert res == expected
+
+    @patch("appsvc.biz.app.SEARCH_ENGINE", "memory")
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.KID)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_memory_engine_cursor(self, mock_execute, _):
+        rows = make_rows(500)
+        with (
+            patch.object(catalog_engine, "catalog", Catalog(rows)),
+            patch.object(catalog_engine, "_next_reload_at", float("inf")),
+        ):
+            for order_by in SearchAppsOrderBy:
+                res: list[int] = []
+                req = SearchAppsRequestDTO(app_name="is", order_by=order_by, limit=10)
+                while True:
+                    page = search_apps(req)
+                    res.extend(r.id for r in page.apps)
+                    if not page.next_cursor:
+                        break
+                    req = SearchAppsRequestDTO(app_name="is", order_by=order_by, limit=10, cursor=page.next_cursor)
+                assert res == reference_search(rows, AgeMode.KID, order_by, 0, len(rows), app_name="is")
+            mock_execute.assert_not_called()
+
+            # release of the cursor is gone from the snapshot: the DB seeks by the cursor keys
+            mock_execute.return_value.all.return_value = []
+            cursor = keyset_cursor(SearchAppsOrderBy.TS_ADDED, rows[0], "missing-uuid")
+            assert search_apps(SearchAppsRequestDTO(order_by=SearchAppsOrderBy.TS_ADDED, cursor=cursor)).apps == []
+            mock_execute.assert_called_once()
+
+
+def reference_facets(rows) -> dict[str, dict[str, int]]:
+    res: dict[str, dict[str, int]] = {"lang": {}, "platform": {}, "decade": {}, "distro_format": {}, "tags": {}}
+    for r in rows:
+        values = {
+            "lang": [r.lang],
+            "platform": [r.platform],
+            "decade": [] if r.year_released is None else [f"{r.year_released // 10}0"],
+            "distro_format": [r.distro_format],
+            "tags": r.tags or [],
+        }
+        for facet, facet_values in values.items():
+            for v in facet_values:
+                res[facet][v] = res[facet].get(v, 0) + 1
+    return res
+
+
+@pytest.mark.unit
+class TestCatalogFacets:
+    def test_facets_match_reference(self):
+        rows = make_rows(1000)
+        catalog = Catalog(rows)
+        for age_mode in AgeMode:
+            for app_name, lang in [(None, None), (None, "de"), ("monkey", None), ("zzz", None)]:
+                mask = catalog.mask(age_mode, app_name=app_name, lang=lang)
+                ids = set(reference_search(rows, age_mode, SearchAppsOrderBy.NAME, 0, len(rows), app_name, lang))
+                counts, approximate = catalog.facet_counts(mask, exact_limit=len(rows))
+                assert not approximate
+                assert counts == reference_facets([r for r in rows if r.id in ids])
+                # most frequent values first
+                assert list(counts["tags"].values()) == sorted(counts["tags"].values(), reverse=True)
+
+    def test_unfiltered_facets_are_precomputed(self):
+        catalog = Catalog(make_rows(100))
+        mask = catalog.mask(AgeMode.KID)
+        assert catalog.facet_counts(mask, exact_limit=0) == (catalog.age_mode_facets[AgeMode.KID], False)
+        # same rows, but not the age mode bitset itself
+        assert catalog.facet_counts(mask | 0, exact_limit=100)[0] == catalog.age_mode_facets[AgeMode.KID]
+
+    def test_approximate_facets(self):
+        rows = make_rows(20000)
+        catalog = Catalog(rows)
+        assert catalog.sample_stride == 8
+        mask = catalog.mask(AgeMode.TEEN, lang="en")
+        exact, _ = catalog.facet_counts(mask, exact_limit=mask.bit_count())
+        counts, approximate = catalog.facet_counts(mask, exact_limit=1000)
+        assert approximate
+        assert counts.keys() == exact.keys()
+        for facet, facet_counts in exact.items():
+            for v, n in facet_counts.items():
+                assert abs(counts[facet].get(v, 0) - n) <= max(0.15 * n, 50), (facet, v)
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_apps_facets(self, mock_execute, _):
+        rows = make_rows(300)
+        catalog = Catalog(rows)
+        mock_execute.return_value.all.return_value = []
+        ids = set(reference_search(rows, AgeMode.TEEN, SearchAppsOrderBy.NAME, 0, len(rows), lang="de"))
+        with (
+            patch.object(catalog_engine, "catalog", catalog),
+            patch.object(catalog_engine, "_next_reload_at", float("inf")),
+        ):
+            for engine in ("sql", "memory"):
+                with patch("appsvc.biz.app.SEARCH_ENGINE", engine):
+                    res = search_apps(SearchAppsRequestDTO(lang="de", limit=5, facets=True))
+                    assert res.total == len(ids)
+                    assert not res.facets.approximate
+                    assert res.facets.lang == {"de": len(ids)}
+                    assert res.facets.tags == reference_facets([r for r in rows if r.id in ids])["tags"]
+                    assert search_apps(SearchAppsRequestDTO(lang="de", limit=5)).facets is None
+        # the DB fetched the page only
+        assert mock_execute.call_count == 2
+
+
+PUBLISHERS = ["LucasArts", "Sierra On-Line", "Revolution 100%", "Psygnosis"]
+
+
+def make_publisher_rows(rows) -> list[tuple[int, str]]:
+    """Every 3rd release has no publisher, others have one or two."""
+    return [(r.id, p) for r in rows if r.id % 3 for p in {PUBLISHERS[r.id % 4], PUBLISHERS[r.id % 7 % 4]}]
+
+
+@pytest.mark.unit
+class TestPublisherIndex:
+    def test_match(self):
+        index = PublisherIndex([(1, "LucasArts"), (2, "LucasArts"), (2, "Sierra On-Line"), (3, "Revolution 100%")])
+        assert index.size == 3
+        assert index.match("lucas") == {1, 2}
+        assert index.match("ON-LINE") == {2}
+        assert index.match("o%n") == {2, 3}
+        assert index.match("100%") == {3}
+        assert index.match("s_erra") == {2}
+        assert index.match("nope") == set()
+
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_by_publisher(self, mock_execute, _):
+        mock_execute.return_value.all.return_value = []
+        with (
+            patch.object(publisher_index_engine, "catalog", PublisherIndex([(3, "LucasArts"), (1, "LucasArts")])),
+            patch.object(publisher_index_engine, "_next_reload_at", float("inf")),
+        ):
+            search_apps(SearchAppsRequestDTO(publisher_name="lucas"))
+            stmt = str(
+                mock_execute.call_args.args[0].compile(
+                    dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+                )
+            )
+            assert "games.releases.id = ANY (CAST(ARRAY[1, 3] AS BIGINT[]))" in stmt
+            assert "jsonb_array_elements" not in stmt
+
+            # no publisher matches: no DB round trip
+            mock_execute.reset_mock()
+            assert search_apps(SearchAppsRequestDTO(publisher_name="sierra")).apps == []
+            mock_execute.assert_not_called()
+
+    @patch("appsvc.biz.app.SEARCH_ENGINE", "memory")
+    @patch("appsvc.biz.app.get_age_mode", return_value=AgeMode.TEEN)
+    @patch("appsvc.biz.app.sqldb.session.execute")
+    def test_search_by_publisher_memory_engine(self, mock_execute, _):
+        rows = make_rows(300)
+        publisher_rows = make_publisher_rows(rows)
+        with (
+            patch.object(catalog_engine, "catalog", Catalog(rows)),
+            patch.object(catalog_engine, "_next_reload_at", float("inf")),
+            patch.object(publisher_index_engine, "catalog", PublisherIndex(publisher_rows)),
+            patch.object(publisher_index_engine, "_next_reload_at", float("inf")),
+        ):
+            for publisher_name in ("lucas", "%on%", "100%", "nope"):
+                release_ids = {id_ for id_, p in publisher_rows if ilike(publisher_name, p)}
+                res = search_apps(
+                    SearchAppsRequestDTO(publisher_name=publisher_name, order_by=SearchAppsOrderBy.NAME, limit=500)
+                )
+                expected = reference_search(rows, AgeMode.TEEN, SearchAppsOrderBy.NAME, 0, 500)
+                assert [r.id for r in res.apps] == [id_ for id_ in expected if id_ in release_ids]
+        mock_execute.assert_not_called()
+
+
+SEARCH_REQUESTS = [
+    SearchAppsRequestDTO(order_by=order_by, offset=offset, limit=limit, **filters)
+    for order_by in SearchAppsOrderBy
+    for offset, limit in [(0, 100), (10, 20), (0, 200)]
+    for filters in [{}, {"lang": "en"}, {"lang": "de"}, {"app_name": "the"}, {"app_name": "ma"}, {"app_name": "x_"}]
+]
+
+
+@pytest.mark.integration
+class TestCatalogDifferential:
+    @pytest.mark.parametrize("age_mode", list(AgeMode))
+    def test_memory_engine_matches_sql(self, db_app, age_mode):
+        with patch("appsvc.biz.app.get_age_mode", return_value=age_mode):
+            for req in SEARCH_REQUESTS:
+                with patch("appsvc.biz.app.SEARCH_ENGINE", "sql"):
+                    expected = search_apps(req)
+                with patch("appsvc.biz.app.SEARCH_ENGINE", "memory"):
+                    assert search_apps(req) == expected, req
+
+    def test_publisher_index_matches_sql(self, db_app):
+        for publisher_name in ("sierra", "lucas", "soft", "%a%"):
+            req = SearchAppsRequestDTO(publisher_name=publisher_name, limit=APPS_SEARCH_LIMIT)
+            with patch("appsvc.biz.app.SEARCH_PUBLISHER_INDEX_ENABLED", False):
+                expected = search_apps(req)
+            for engine in ("sql", "memory"):
+                with patch("appsvc.biz.app.SEARCH_ENGINE", engine):
+                    assert search_apps(req) == expected, (publisher_name, engine)
+
+    @pytest.mark.parametrize("engine", ["sql", "memory"])
+    def test_cursor_pages_match_offset_pages(self, db_app, engine):
+        with patch("appsvc.biz.app.SEARCH_ENGINE", engine):
+            for order_by in SearchAppsOrderBy:
+                expected = search_apps(SearchAppsRequestDTO(order_by=order_by, limit=APPS_SEARCH_LIMIT)).apps
+                res = []
+                req = SearchAppsRequestDTO(order_by=order_by, limit=17)
+                while len(res) < len(expected):
+                    page = search_apps(req)
+                    res.extend(page.apps)
+                    if not page.next_cursor:
+                        break
+                    req = SearchAppsRequestDTO(order_by=order_by, limit=17, cursor=page.next_cursor)
+                assert res[: len(expected)] == expected, order_by
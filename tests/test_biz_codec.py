@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import (
+    field,
+    make_dataclass,
+)
+
+import pytest
+from marshmallow import ValidationError
+
+from appsvc.biz.codec import (
+    _codecs,
+    codec_for,
+)
+from appsvc.biz.dto import (
+    AppReleaseDetails,
+    RunAppRequestDTO,
+    RunAppResponseDTO,
+    SearchAppsRequestDTO,
+)
+from appsvc.services.dto.jukeboxsvc import RunContainerResponseDTO
+
+WS_CONN = {"id": "test-ws-conn-id", "consumer_id": "test-ws-consumer-id"}
+
+CASES = [
+    (SearchAppsRequestDTO, {}),
+    (SearchAppsRequestDTO, {"app_name": "ab", "my_stuff": "FAVORITES", "order_by": "name", "offset": "5"}),
+    (SearchAppsRequestDTO, {"app_name": None, "my_stuff": None, "order_by": None, "user_id": None}),
+    (SearchAppsRequestDTO, {"app_name": "a", "lang": 1, "my_stuff": "favorites", "order_by": "NAME", "limit": True}),
+    (SearchAppsRequestDTO, {"offset": None, "foo": 1}),
+    (RunAppRequestDTO, {"app_release_uuid": "x", "user_id": 1, "ws_conn": WS_CONN}),
+    (RunAppRequestDTO, {"app_release_uuid": "x", "user_id": 1, "ws_conn": WS_CONN, "preferred_dcs": None}),
+    (RunAppRequestDTO, {"app_release_uuid": "x", "user_id": 1, "ws_conn": WS_CONN, "preferred_dcs": ["a", None, 3]}),
+    (RunAppRequestDTO, {"user_id": "a", "ws_conn": [1], "preferred_dcs": "us-west-1"}),
+    (RunAppRequestDTO, {"user_id": 1, "ws_conn": {"id": 1}}),
+    (RunAppRequestDTO, []),
+    (RunAppResponseDTO, {"container": {"id": "c", "node_id": "n", "region": "us-west-1", "cpuset_cpus": [1, 2]}}),
+    (RunAppResponseDTO, {"container": {"id": "c", "node_id": "n", "region": "US_WEST_1", "cpuset_cpus": [1, "x"]}}),
+    (
+        RunContainerResponseDTO,
+        {"node": {"id": "n", "api_uri": "u", "region": "us-west-1"}, "container": {"id": "c", "cpuset_cpus": []}},
+    ),
+    (AppReleaseDetails.AppReqs, {"color_bits": None, "screen_width": 640, "screen_height": 480}),
+    (AppReleaseDetails.AppReqs, {"color_bits": 8, "screen_width": 320, "screen_height": 200, "hw": {"dgpu": True}}),
+    (AppReleaseDetails.GameRefs, {"ag_id": 5, "lutris_id": None, "mg_id": 1, "pcgw_id": None, "qz_id": None}),
+    (AppReleaseDetails.Runner, {"name": "wine", "ver": None, "window_system": "x11"}),
+    (AppReleaseDetails.Runner, {"name": "wine", "ver": None, "window_system": "x12"}),
+]
+
+
+def schema_load(cls, data):
+    try:
+        return cls.Schema().load(data), None
+    except ValidationError as e:
+        return None, e.messages
+
+
+def codec_load(cls, data):
+    try:
+        return codec_for(cls).load(data), None
+    except ValidationError as e:
+        return None, e.messages
+
+
+@pytest.mark.unit
+class TestCodec:
+    @pytest.mark.parametrize("cls,data", CASES)
+    def test_same_as_schema(self, cls, data):
+        res, errors = codec_load(cls, data)
+        assert (res, errors) == schema_load(cls, data)
+        if res is not None:
+            assert codec_for(cls).dump(res) == cls.Schema().dump(res)
+
+    def test_concurrent_compile(self):
+        """Codecs being compiled by one thread are not used by the others."""
+        cls = make_dataclass("Wide", [(f"f{i}", int, field(default=i)) for i in range(200)])
+        barrier = threading.Barrier(8)
+
+        def dump(_):
+            barrier.wait()
+            return codec_for(cls).dump(cls())
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(dump, range(8)))
+        assert results == [{f"f{i}": i for i in range(200)}] * 8
+
+    def test_hot_dtos_compiled_at_import(self):
+        for cls in (AppReleaseDetails, RunAppRequestDTO, RunAppResponseDTO, SearchAppsRequestDTO):
+            assert cls in _codecs, cls
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from appsvc.biz.hedge import (
+    Hedger,
+    LatencyWindow,
+)
+
+
+@pytest.mark.unit
+class TestHedger:
+    def test_percentile(self):
+        window = LatencyWindow(size=10)
+        assert window.percentile(90) == 0
+        for latency in range(20, 0, -1):
+            window.add(latency)
+        # the last 10 samples: 1..10
+        assert len(window) == 10
+        assert window.percentile(90) == 9
+        assert window.percentile(100) == 10
+        assert window.percentile(50) == 5
+        assert window.percentile(1) == 1
+
+    def test_delay(self):
+        hedger = Hedger(
+            ThreadPoolExecutor(max_workers=1), percentile=90, window=5, min_samples=5, min_delay=2, default_delay=10
+        )
+        for latency in (1, 1, 1, 1):
+            hedger.latencies.add(latency)
+        assert hedger.delay() == 10
+        hedger.latencies.add(3)
+        assert hedger.delay() == 3
+        for latency in (1, 1, 1, 1, 1):
+            hedger.latencies.add(latency)
+        assert hedger.delay() == 2  # min_delay
+
+    def test_call(self):
+        hedger = Hedger(
+            ThreadPoolExecutor(max_workers=2), percentile=90, window=10, min_samples=5, min_delay=0, default_delay=1
+        )
+        losers = []
+        assert hedger.call(lambda: 1, lambda: 2, losers.append) == 1
+        assert not losers
+        assert hedger.stats()["calls"] == 1 and hedger.stats()["hedged"] == 0
+        assert len(hedger.latencies) == 1
+
+    def test_hedge_latencies_not_recorded(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+        hedger = Hedger(executor, percentile=90, window=10, min_samples=5, min_delay=0, default_delay=0.05)
+
+        def primary():
+            time.sleep(0.2)
+            return 1
+
+        losers = []
+        assert hedger.call(primary, lambda: 2, losers.append) == 2
+        executor.shutdown(wait=True)
+        assert losers == [1]
+        # only the primary's latency: hedges may be served faster or slower by design (e.g. by another DC)
+        assert len(hedger.latencies) == 1 and hedger.latencies.percentile(100) >= 0.2
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+from test_biz_cache import FakeTimer
+
+from appsvc.biz.kvstore import KVStore
+
+
+@pytest.fixture(name="db_path")
+def fixture_db_path(tmp_path):
+    return str(tmp_path / "kv.sqlite3")
+
+
+@pytest.mark.unit
+class TestKVStore:
+    def test_get_put(self, db_path):
+        store = KVStore(db_path, "test", ttl=60)
+        assert store.get("1") is None
+        store.put("1", "a")
+        store.put("1", "b")
+        assert store.get("1") == "b"
+        store.delete("1")
+        assert store.get("1") is None
+
+    def test_ttl(self, db_path):
+        timer = FakeTimer()
+        store = KVStore(db_path, "test", ttl=10, timer=timer)
+        store.put("1", "a")
+        store.put("2", "b", ttl=20)
+        timer.now = 10
+        assert store.get("1") is None
+        assert store.get("2") == "b"
+        assert store.purge() == 1
+        assert store.stats()["size"] == 1
+
+    def test_add(self, db_path):
+        timer = FakeTimer()
+        store = KVStore(db_path, "test", ttl=10, timer=timer)
+        assert store.add("1", "a")
+        assert not store.add("1", "b")
+        assert store.get("1") == "a"
+        # expired entries are replaced
+        timer.now = 10
+        assert store.add("1", "c")
+        assert store.get("1") == "c"
+
+    def test_shared_between_stores(self, db_path):
+        # e.g. stores of different worker processes
+        store1 = KVStore(db_path, "test", ttl=60)
+        store2 = KVStore(db_path, "test", ttl=60)
+        other_table = KVStore(db_path, "other", ttl=60)
+        store1.put("1", "a")
+        assert store2.get("1") == "a"
+        assert other_table.get("1") is None
+
+    def test_threads(self, db_path):
+        store = KVStore(db_path, "test", ttl=60)
+        added = []
+
+        def add(ix: int) -> None:
+            for key in range(20):
+                if store.add(str(key), str(ix)):
+                    added.append(key)
+
+        threads = [threading.Thread(target=add, args=(ix,)) for ix in range(4)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        # every key is added exactly once
+        assert sorted(added) == list(range(20))
+
+    @pytest.mark.parametrize("table", ["", "1st", "t; DROP TABLE launches", "t.x", "t-x"])
+    def test_invalid_table(self, db_path, table):
+        with pytest.raises(ValueError):
+            KVStore(db_path, table, ttl=10)
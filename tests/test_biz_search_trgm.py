@@ -0,0 +1,52 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from appsvc.biz.app import (
+    app_name_filter_expr,
+    search_apps_acl_query,
+    search_query,
+)
+from appsvc.biz.dto import (
+    DEFAULT_AGE_MODE,
+    SearchAppsAclRequestDTO,
+)
+from appsvc.biz.sqldb import sqldb
+
+MIGRATION_PATH = os.path.join(os.path.dirname(__file__), "..", "migrations", "0001_search_trgm.sql")
+
+
+def explain(q) -> str:
+    """Returns json plan of the query (with seq scans discouraged, so the test doesn't depend on the catalog size)."""
+    sqldb.session.execute(text("SET LOCAL enable_seqscan = off"))
+    stmt = q.compile(dialect=sqldb.engine.dialect, compile_kwargs={"literal_binds": True})
+    return json.dumps(sqldb.session.execute(text(f"EXPLAIN (FORMAT JSON) {stmt}")).scalar())
+
+
+@pytest.mark.integration
+class TestSearchTrgm:
+    @patch("appsvc.biz.app.SEARCH_TRGM_ENABLED", True)
+    def test_search_by_app_name_uses_trgm_indexes(self, db_app):
+        plan = explain(search_query().where(app_name_filter_expr("monkey")))
+        assert "releases_name_trgm_idx" in plan
+        assert "games_name_trgm_idx" in plan
+        assert "games_alternative_names_trgm_idx" in plan
+
+    def test_search_apps_acl_uses_trgm_index(self, db_app):
+        q = search_apps_acl_query(SearchAppsAclRequestDTO(app_name="monkey"), DEFAULT_AGE_MODE)
+        assert "releases_name_trgm_idx" in explain(q)
+
+
+@pytest.mark.unit
+class TestSearchTrgmExpr:
+    @patch("appsvc.biz.app.SEARCH_TRGM_ENABLED", True)
+    def test_index_expressions_match_migration(self):
+        # query expression must be the same as the indexed one, otherwise the index is silently ignored
+        with open(MIGRATION_PATH, encoding="utf-8") as f:
+            assert "games.immutable_array_to_string(alternative_names, ',') gin_trgm_ops" in f.read()
+        stmt = app_name_filter_expr("x").compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        assert "games.immutable_array_to_string(games.games.alternative_names, ',') ILIKE" in str(stmt)
@@ -0,0 +1,147 @@
+import pytest
+from test_biz_cache import FakeTimer
+
+from appsvc.biz.dto import ContainerDescr
+from appsvc.biz.standby import (
+    LaunchFrequency,
+    StandbyPool,
+)
+from appsvc.services.dto.jukeboxsvc import DcRegion
+
+GB = 1024 * 1024 * 1024
+
+
+class FakeJukeboxSvc:
+    def __init__(self) -> None:
+        self.running: dict[str, tuple[str, str]] = {}  # container id -> (release uuid, dc)
+        self.memory: dict[str, int] = {}  # release uuid -> bytes
+        self.failing: set[str] = set()  # dcs
+        self.starts = 0
+
+    def start(self, release_uuid: str, dc: str) -> ContainerDescr:
+        if dc in self.failing:
+            raise RuntimeError(f"no capacity in {dc}")
+        self.starts += 1
+        container_id = f"c{self.starts}"
+        self.running[container_id] = (release_uuid, dc)
+        return ContainerDescr(id=container_id, node_id=f"n-{dc}", region=DcRegion(dc), cpuset_cpus=[0])
+
+    def stop(self, container: ContainerDescr) -> None:
+        del self.running[container.id]
+
+
+def make_pool(jukeboxsvc: FakeJukeboxSvc, timer: FakeTimer, **kwargs) -> StandbyPool:
+    return StandbyPool(
+        **{
+            "hot": 2,
+            "per_release": 1,
+            "min_launches": 2,
+            "ttl": 600,
+            "memory_budget": 4 * GB,
+            "half_life": 3600,
+            "start": jukeboxsvc.start,
+            "memory": lambda release_uuid: jukeboxsvc.memory.get(release_uuid, GB),
+            "stop": jukeboxsvc.stop,
+            "timer": timer,
+            **kwargs,
+        }
+    )
+
+
+def launch(pool: StandbyPool, release_uuid: str, dcs: list[str], times: int = 1) -> list:
+    return [pool.claim(release_uuid, dcs) for _ in range(times)]
+
+
+@pytest.mark.unit
+class TestStandbyPool:
+    def test_frequency(self):
+        freq = LaunchFrequency(half_life=10)
+        for _ in range(4):
+            freq.record(("a", "eu-central-1"), now=0)
+        freq.record(("b", "eu-central-1"), now=0)
+        freq.record(("c", "eu-central-1"), now=0)
+        freq.record(("b", "eu-central-1"), now=10)
+        assert freq.score(("a", "eu-central-1"), now=10) == pytest.approx(2)
+        assert freq.score(("b", "eu-central-1"), now=10) == pytest.approx(1.5)
+        freq.record(("d", "us-west-1"), now=10)
+        assert freq.hottest(2, min_score=0.6, now=10) == [
+            ("a", "eu-central-1"),
+            ("b", "eu-central-1"),
+            ("d", "us-west-1"),
+        ]
+        freq.prune(0.4, now=20)
+        assert len(freq) == 3  # c: 0.25
+
+    def test_claim(self):
+        jukeboxsvc, timer = FakeJukeboxSvc(), FakeTimer()
+        pool = make_pool(jukeboxsvc, timer)
+        assert launch(pool, "a", ["eu-central-1", "us-west-1"], times=2) == [None, None]
+        launch(pool, "b", ["eu-central-1"])  # not hot enough
+        launch(pool, "c", ["us-west-1"], times=3)
+        pool.refill()
+        assert sorted(jukeboxsvc.running.values()) == [("a", "eu-central-1"), ("c", "us-west-1")]
+        pool.refill()  # the pool is full
+        assert jukeboxsvc.starts == 2
+
+        # DCs in order of preference
+        c = pool.claim("a", ["us-west-1", "eu-central-1"])
+        assert c.release_uuid == "a" and c.dc == "eu-central-1" and c.container.node_id == "n-eu-central-1"
+        assert pool.claim("a", ["eu-central-1"]) is None
+        assert pool.claim("c", ["eu-central-1"]) is None
+        assert pool.stats() | {"memory_budget": 0} == {
+            "size": 1,
+            "memory_used": GB,
+            "memory_budget": 0,
+            "hits": 1,
+            "misses": 8,
+            "hit_rate": 1 / 9,
+            "started": 2,
+            "start_failures": 0,
+            "expired": 0,
+            "evicted": 0,
+            "releases_tracked": 5,
+        }
+        # claimed containers are the launches' ones now (not stopped by the pool)
+        pool.refill()
+        assert jukeboxsvc.starts == 3 and len(jukeboxsvc.running) == 3
+
+    def test_memory_budget(self):
+        jukeboxsvc, timer = FakeJukeboxSvc(), FakeTimer()
+        jukeboxsvc.memory.update({"a": 3 * GB, "b": 2 * GB, "c": GB})
+        pool = make_pool(jukeboxsvc, timer, hot=3)
+        launch(pool, "a", ["eu-central-1"], times=5)
+        launch(pool, "b", ["eu-central-1"], times=4)
+        launch(pool, "c", ["eu-central-1"], times=3)
+        pool.refill()
+        # hotter releases first, smaller containers fill the rest of the budget
+        assert sorted(jukeboxsvc.running.values()) == [("a", "eu-central-1"), ("c", "eu-central-1")]
+        assert pool.stats()["memory_used"] == 4 * GB
+
+    def test_expiry(self):
+        jukeboxsvc, timer = FakeJukeboxSvc(), FakeTimer()
+        pool = make_pool(jukeboxsvc, timer, ttl=600, half_life=600)
+        launch(pool, "a", ["eu-central-1"], times=2)
+        launch(pool, "b", ["eu-central-1"], times=8)
+        pool.refill()
+        assert len(jukeboxsvc.running) == 2
+
+        timer.now = 600
+        # expired containers are not claimed, the ones of hot releases are replaced
+        assert pool.claim("b", ["eu-central-1"]) is None
+        pool.refill()
+        stats = pool.stats()
+        assert stats["expired"] == 1 and stats["evicted"] == 1  # a: 1 launch left
+        assert list(jukeboxsvc.running.values()) == [("b", "eu-central-1")]
+        assert stats["size"] == 1 and stats["memory_used"] == GB
+
+        pool.clear()
+        assert not jukeboxsvc.running and pool.stats()["memory_used"] == 0
+
+    def test_start_failures(self):
+        jukeboxsvc, timer = FakeJukeboxSvc(), FakeTimer()
+        jukeboxsvc.failing.add("us-west-1")
+        pool = make_pool(jukeboxsvc, timer)
+        launch(pool, "a", ["us-west-1"], times=2)
+        pool.refill()
+        stats = pool.stats()
+        assert stats["start_failures"] == 1 and stats["size"] == 0 and stats["memory_used"] == 0
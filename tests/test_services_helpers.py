@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+import pytest
+import requests
+from test_biz_cache import FakeTimer
+
+from appsvc.services.helpers import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HttpClient,
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.server.requests.append(self.client_address)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/slow":
+            time.sleep(0.5)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+@pytest.fixture(name="stub_server")
+def fixture_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/echo"
+
+
+@pytest.mark.unit
+class TestHttpClient:
+    def test_connection_reuse(self, stub_server):
+        client = HttpClient(timeout=(1, 5), pool_size=2)
+        for i in range(10):
+            res = client.post(stub_url(stub_server), data=str(i))
+            assert res.status_code == 200 and res.text == str(i)
+        # all requests are sent over the same connection (client port)
+        assert len(stub_server.requests) == 10
+        assert len(set(stub_server.requests)) == 1
+        assert client.stats() == {
+            "pools": 1,
+            "pool_size": 2,
+            "connections_opened": 1,
+            "requests": 10,
+            "idle_connections": 1,
+        }
+        client.close()
+
+    def test_threads_share_pool(self, stub_server):
+        client = HttpClient(timeout=(1, 5), pool_size=4)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(5):
+                res = list(executor.map(lambda i: client.post(stub_url(stub_server), data=str(i)).text, range(4)))
+                assert res == ["0", "1", "2", "3"]
+        # connections are not bound to threads: at most one per concurrent request
+        assert len(stub_server.requests) == 20
+        assert len(set(stub_server.requests)) <= 4
+        assert client.stats()["connections_opened"] == len(set(stub_server.requests))
+        client.close()
+
+    def test_add_callers(self, stub_server):
+        client = HttpClient(timeout=(1, 5), pool_size=1)
+        client.add_callers(3)
+        slow_url = stub_url(stub_server).replace("/echo", "/slow")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for _ in range(2):
+                assert list(executor.map(lambda i: client.post(slow_url, data=str(i)).text, range(4))) == list("0123")
+        # the connections of all the concurrent requests are kept alive (and reused)
+        assert len(set(stub_server.requests)) == 4
+        assert client.stats() == {
+            "pools": 1,
+            "pool_size": 4,
+            "connections_opened": 4,
+            "requests": 8,
+            "idle_connections": 4,
+        }
+        client.close()
+
+    def test_timeout(self, stub_server):
+        client = HttpClient(timeout=(1, 5))
+        slow_url = stub_url(stub_server).replace("/echo", "/slow")
+        assert client.post(slow_url, data="x").text == "x"
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client.post(slow_url, data="x", timeout=(1, 0.1))
+        client.close()
+
+
+def make_breaker(timer: FakeTimer) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test",
+        window=10,
+        min_calls=4,
+        error_rate=0.5,
+        slow_call=1,
+        slow_rate=0.75,
+        open_for=5,
+        probes=2,
+        timer=timer,
+    )
+
+
+def call(breaker: CircuitBreaker, ok: bool | None, latency: float = 0.1) -> None:
+    breaker.acquire()
+    breaker.release(ok, latency)
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    def test_error_rate(self):
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+        for ok in (True, False, True, False):
+            assert breaker.state == "closed"
+            call(breaker, ok)
+        stats = breaker.stats()
+        assert stats["state"] == "open" and stats["opened"] == 1 and stats["health"] == 0
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_slow_rate(self):
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+        for latency in (2, 2, 0.1):
+            call(breaker, True, latency)
+        assert breaker.stats() == {
+            "state": "closed",
+            "calls": 3,
+            "error_rate": 0,
+            "slow_rate": 0.667,
+            "avg_latency_s": 1.367,
+            "health": 0.333,
+            "opened": 0,
+            "rejected": 0,
+        }
+        call(breaker, True, 2)
+        assert breaker.state == "open"
+
+    def test_window(self):
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+        for _ in range(3):
+            call(breaker, False)
+        timer.now = 10  # the failures roll out of the window
+        for ok in (False, True, True, True):
+            call(breaker, ok)
+        assert breaker.stats()["state"] == "closed" and breaker.stats()["calls"] == 4
+
+    def test_half_open(self):
+        timer = FakeTimer()
+        breaker = make_breaker(timer)
+        for _ in range(4):
+            call(breaker, False)
+        timer.now = 5
+        # probes are let through one at a time
+        breaker.acquire()
+        breaker.acquire()
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire()
+        breaker.release(None)  # the call was not made
+        breaker.release(True)
+        breaker.acquire()
+        breaker.release(False)
+        assert breaker.state == "open" and breaker.stats()["opened"] == 2
+
+        timer.now = 10
+        call(breaker, True)
+        call(breaker, True)
+        assert breaker.state == "closed" and breaker.stats()["calls"] == 0
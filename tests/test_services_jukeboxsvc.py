@@ -0,0 +1,75 @@
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from appsvc.biz.app import stop_apps
+from appsvc.biz.dto import (
+    ContainerOpDescr,
+    ContainersOpRequestDTO,
+)
+from appsvc.biz.errors import (
+    ContainerNotFoundException,
+    JukeboxSvcException,
+)
+from appsvc.services import jukeboxsvc
+from appsvc.services.helpers import HttpClient
+
+MIN_CALLS = jukeboxsvc.JUKEBOXSVC_BREAKER_MIN_CALLS
+
+
+@pytest.mark.unit
+class TestCircuitBreakers:
+    def test_failing_node(self, jukeboxsvc_stub):
+        jukeboxsvc_stub.failing_nodes.add("n1")
+        min_calls = jukeboxsvc.JUKEBOXSVC_BREAKER_MIN_CALLS
+        for _ in range(min_calls):
+            with pytest.raises(JukeboxSvcException, match="node n1 failed"):
+                jukeboxsvc.pause_container(ContainerOpDescr(id="c1", node_id="n1"))
+        assert jukeboxsvc.op_breakers.stats()["node:n1"]["state"] == "open"
+
+        # fails fast: jukeboxsvc is not called
+        with pytest.raises(JukeboxSvcException, match="circuit node:n1 is open"):
+            jukeboxsvc.stop_container(ContainerOpDescr(id="c1", node_id="n1"))
+        assert jukeboxsvc_stub.requests == 0
+        # other nodes are not affected: failures of the node don't count against the endpoints
+        jukeboxsvc.pause_container(ContainerOpDescr(id="c2", node_id="n2"))
+        assert jukeboxsvc_stub.paused == [("n2", "c2")]
+        stats = jukeboxsvc.op_breakers.stats()
+        assert stats["pause"]["state"] == "closed" and stats["pause"]["error_rate"] == 0
+        assert stats["node:n1"]["rejected"] == 1
+
+    def test_drain_with_failing_node(self, jukeboxsvc_stub):
+        """Bulk stops keep stopping containers of the healthy nodes while one node fails."""
+        jukeboxsvc_stub.failing_nodes.add("n1")
+        # mostly containers of the failing node
+        containers = [ContainerOpDescr(id=f"c{i}", node_id="n2" if i % 4 == 0 else "n1") for i in range(8 * MIN_CALLS)]
+        res = stop_apps(ContainersOpRequestDTO(containers=containers))
+        failed = {item.container.node_id for item in res.containers if item.error is not None}
+        assert failed == {"n1"}
+        assert len(jukeboxsvc_stub.stopped) == 2 * MIN_CALLS
+        stats = jukeboxsvc.op_breakers.stats()
+        assert stats["node:n1"]["state"] == "open" and stats["stop"]["state"] == "closed"
+
+    def test_unreachable_jukeboxsvc(self, jukeboxsvc_stub):
+        with (
+            patch.object(jukeboxsvc, "JUKEBOXSVC_URL", "http://127.0.0.1:1"),
+            patch.object(jukeboxsvc, "ops_client", HttpClient(timeout=(1, 1))),  # no retries
+        ):
+            for _ in range(MIN_CALLS):
+                with pytest.raises(requests.ConnectionError):
+                    jukeboxsvc.stop_container(ContainerOpDescr(id="c1", node_id="n1"))
+        stats = jukeboxsvc.op_breakers.stats()
+        # the endpoint's failure, not the node's
+        assert stats["stop"]["state"] == "open" and stats["node:n1"]["calls"] == 0
+        with pytest.raises(JukeboxSvcException, match="circuit stop is open"):
+            jukeboxsvc.stop_container(ContainerOpDescr(id="c2", node_id="n2"))
+
+    def test_not_found_is_no_failure(self, jukeboxsvc_stub):
+        jukeboxsvc_stub.failing_nodes.add("n1")
+        with pytest.raises(JukeboxSvcException):
+            jukeboxsvc.stop_container(ContainerOpDescr(id="c1", node_id="n1"))
+        assert jukeboxsvc.op_breakers.stats()["node:n1"]["error_rate"] == 1
+        with pytest.raises(ContainerNotFoundException):
+            jukeboxsvc.stop_container(ContainerOpDescr(id="gone", node_id="n2"))
+        assert jukeboxsvc.op_breakers.stats()["node:n2"]["error_rate"] == 0